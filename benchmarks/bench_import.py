@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Measure the cold-start cost of importing python-zillow: each statement is
+run in a fresh interpreter, and the time above a bare interpreter start is
+reported, along with the heavy modules it pulled in.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --json > import.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATEMENTS = [
+    'import zillow',
+    'from zillow import Place, ValuationApi, ZillowError',
+    'import zillow; zillow.ValuationApi()',
+    'import zillow.aio',
+]
+
+# Modules worth knowing about when they are imported.
+HEAVY = ('requests', 'urllib3', 'xmltodict', 'pkg_resources', 'sqlite3', 'concurrent.futures', 'lxml',
+         'aiohttp', 'numpy')
+
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(repr((elapsed, [m for m in %r if m in sys.modules])))
+'''
+
+
+def measure(statement, repeat):
+    """
+    :return: The best time in seconds of running statement in a fresh interpreter, and the heavy modules it loaded.
+    """
+    best = None
+    modules = None
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', PROBE % (statement, HEAVY)], cwd=ROOT, env=env)
+        elapsed, modules = eval(output.decode('ascii'))
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the import time of python-zillow.')
+    parser.add_argument('--repeat', type=int, default=7, help='fresh interpreters per statement; the best is kept')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = []
+    for statement in STATEMENTS:
+        try:
+            seconds, modules = measure(statement, args.repeat)
+        except subprocess.CalledProcessError:
+            # e.g. zillow.aio without aiohttp
+            continue
+        results.append({'statement': statement, 'ms': seconds * 1e3, 'heavy_modules': modules})
+
+    if args.json:
+        print(json.dumps({'suite': 'python-zillow import', 'python': sys.version.split()[0],
+                          'results': results}, indent=2, sort_keys=True))
+        return
+    print('%-56s %8s  %s' % ('statement', 'ms', 'heavy modules loaded'))
+    for row in results:
+        print('%-56s %8.1f  %s' % (row['statement'], row['ms'], ', '.join(row['heavy_modules']) or '-'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Compare eager and lazy places when only a few fields are read, and when
+every field is.
+
+    python benchmarks/bench_lazy.py
+"""
+
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from zillow.parser import COMPS_COMP, COMPS_PRINCIPAL, iter_records  # noqa: E402
+from zillow.place import Place  # noqa: E402
+
+
+def read(name):
+    with open(os.path.join(ROOT, 'testdata', name), 'rb') as f:
+        return f.read()
+
+
+def zpid_and_amount(place):
+    return place.zpid, place.zestimate.amount
+
+
+def everything(place):
+    return place.get_dict()
+
+
+def build(sections, lazy, use):
+    for section in sections:
+        place = Place(lazy=lazy)
+        place.set_data(section)
+        use(place)
+
+
+def main():
+    # parse once, so only building the places and reading them is timed
+    sections = [record for _, record in iter_records(read('get_deep_comps.xml'), (COMPS_PRINCIPAL, COMPS_COMP))]
+    number = 2000
+    print('%-24s %12s %12s %8s' % ('fields read', 'eager us', 'lazy us', 'speedup'))
+    for name, use in [('zpid, zestimate.amount', zpid_and_amount), ('get_dict()', everything)]:
+        eager = min(timeit.repeat(lambda: build(sections, False, use), number=number, repeat=5))
+        lazy = min(timeit.repeat(lambda: build(sections, True, use), number=number, repeat=5))
+        per_place = number * len(sections) / 1e6
+        print('%-24s %12.2f %12.2f %7.2fx' % (name, eager / per_place, lazy / per_place, eager / lazy))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Measure the memory a Place holds on to, in bytes per place, for places read
+from the testdata fixtures. Each place is built from a freshly parsed
+section, so the strings it keeps are counted and nothing else is.
+
+    python benchmarks/bench_memory.py
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import xmltodict  # noqa: E402
+
+from zillow import Place  # noqa: E402
+
+
+def read(name):
+    with open(os.path.join(ROOT, 'testdata', name), 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def sections(name):
+    data = xmltodict.parse(read(name))
+    if name.endswith('comps.xml'):
+        return data['Comps:comps']['response']['properties']['comparables']['comp']
+    if name == 'get_zestimate.xml':
+        return [data['Zestimate:zestimate']['response']]
+    return [data['SearchResults:searchresults']['response']['results']['result']]
+
+
+def bytes_per_place(name, has_extended_data, count=5000):
+    places = []
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    while len(places) < count:
+        # parse again each time so no two places share strings
+        fresh = sections(name)
+        for section in fresh:
+            place = Place(has_extended_data=has_extended_data)
+            place.set_data(section)
+            places.append(place)
+        del fresh
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / float(len(places))
+
+
+def main():
+    print('%-30s %16s' % ('fixture', 'bytes per place'))
+    for name, has_extended_data in [('get_zestimate.xml', False),
+                                    ('get_deep_search_results.xml', True),
+                                    ('get_comps.xml', False),
+                                    ('get_deep_comps.xml', False)]:
+        print('%-30s %16.0f' % (name, bytes_per_place(name, has_extended_data)))
+
+
+if __name__ == '__main__':
+    main()
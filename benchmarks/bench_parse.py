@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Compare the streaming parser with the xmltodict path it replaced, on each
+testdata fixture and on a comps document scaled up to many comps, then
+compare the parser backends with each other.
+
+    python benchmarks/bench_parse.py
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import xmltodict  # noqa: E402
+
+from zillow import Place  # noqa: E402
+from zillow.parser import (SEARCH_RESULT, ZESTIMATE, available_backends,  # noqa: E402
+                           get_backend, parse_comps, parse_place)
+
+
+def read(name):
+    with open(os.path.join(ROOT, 'testdata', name), 'rb') as f:
+        return f.read()
+
+
+def scale_comps(content, count):
+    """Repeat the comps in a comps document until it holds count of them."""
+    head, rest = content.split(b'<comp ', 1)
+    comps, tail = rest.rsplit(b'</comp>', 1)
+    comps = (b'<comp ' + comps + b'</comp>').split(b'</comp>')[:-1]
+    body = b''.join(comps[i % len(comps)] + b'</comp>' for i in range(count))
+    return head + body + tail
+
+
+def xmltodict_place(content, path, has_extended_data=False):
+    data = xmltodict.parse(content.decode('utf-8'))
+    for name in path:
+        data = data[name]
+    place = Place(has_extended_data=has_extended_data)
+    place.set_data(data)
+    return place
+
+
+def xmltodict_comps(content):
+    data = xmltodict.parse(content.decode('utf-8'))['Comps:comps']['response']['properties']
+    principal = Place()
+    principal.set_data(data['principal'])
+    comps = []
+    for datum in data['comparables']['comp']:
+        place = Place()
+        place.set_data(datum)
+        comps.append(place)
+    return {'principal': principal, 'comps': comps}
+
+
+def cases():
+    yield ('place.xml',
+           lambda c: xmltodict_place(c, SEARCH_RESULT),
+           lambda c, backend=None: parse_place(c, SEARCH_RESULT, backend=backend),
+           read('place.xml'))
+    yield ('get_zestimate.xml',
+           lambda c: xmltodict_place(c, ZESTIMATE),
+           lambda c, backend=None: parse_place(c, ZESTIMATE, backend=backend),
+           read('get_zestimate.xml'))
+    yield ('get_deep_search_results.xml',
+           lambda c: xmltodict_place(c, SEARCH_RESULT, True),
+           lambda c, backend=None: parse_place(c, SEARCH_RESULT, True, backend=backend),
+           read('get_deep_search_results.xml'))
+    for name in ('get_comps.xml', 'get_deep_comps.xml'):
+        yield name, xmltodict_comps, parse_comps, read(name)
+    yield 'get_deep_comps.xml x 250 comps', xmltodict_comps, parse_comps, scale_comps(read('get_deep_comps.xml'), 250)
+
+
+def peak_bytes(func, content):
+    tracemalloc.start()
+    func(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    print('%-32s %14s %14s %8s %14s %14s' % ('fixture', 'xmltodict us', 'streaming us', 'speedup',
+                                             'xmltodict peak', 'streaming peak'))
+    for name, old, new, content in cases():
+        number = max(1, 20000 // len(content))
+        old_time = min(timeit.repeat(lambda: old(content), number=number, repeat=5)) / number
+        new_time = min(timeit.repeat(lambda: new(content), number=number, repeat=5)) / number
+        print('%-32s %14.1f %14.1f %7.2fx %14d %14d' % (
+            name, old_time * 1e6, new_time * 1e6, old_time / new_time,
+            peak_bytes(old, content), peak_bytes(new, content)))
+
+    backends = [get_backend(name) for name in available_backends()]
+    print('')
+    print('%-32s' % 'fixture' + ''.join('%12s us' % backend.name for backend in backends))
+    for name, _, new, content in cases():
+        number = max(1, 20000 // len(content))
+        row = '%-32s' % name
+        for backend in backends:
+            seconds = min(timeit.repeat(lambda: parse_with(new, content, backend), number=number, repeat=5))
+            row += '%15.1f' % (seconds / number * 1e6)
+        print(row)
+
+
+def parse_with(parse, content, backend):
+    if parse is parse_comps:
+        return parse_comps(content, backend=backend)
+    return parse(content, backend)
+
+
+if __name__ == '__main__':
+    main()
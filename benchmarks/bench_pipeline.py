@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Throughput of GetDeepComps lookups from many fetch threads, parsing in the
+fetch threads and in ParsePools of growing size. The responses come from a
+stub server, in a process of its own, serving get_deep_comps.xml scaled up
+to many comps so that parsing outweighs the HTTP round trip.
+
+    python benchmarks/bench_pipeline.py [requests] [comps] [threads]
+
+Parsing in the fetch threads stays at about one core whatever the number
+of threads; a ParsePool should scale with its workers up to the number of
+cores (and the stub server's own throughput).
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.suite import read, scale_comps  # noqa: E402
+from tests.stub_server import StubServer  # noqa: E402
+from zillow import ValuationApi  # noqa: E402
+from zillow.batch import run_batch  # noqa: E402
+from zillow.pipeline import ParsePool  # noqa: E402
+
+
+def serve(comps, ports, stop):
+    with StubServer() as server:
+        server.bodies['GetDeepComps.htm'] = scale_comps(read('get_deep_comps.xml'), comps)
+        ports.put(server.server_address[1])
+        stop.wait()
+
+
+def run(base_url, requests, threads, pool):
+    with ValuationApi(cache=None, pool_maxsize=threads, parse_pool=pool) as api:
+        api.base_url = base_url
+
+        def call(zpid):
+            return api.GetDeepComps('key', zpid, count=25)
+
+        # warm up the connections and the pool's workers
+        for outcome in run_batch(call, range(threads), workers=threads):
+            outcome.result
+        start = time.time()
+        for outcome in run_batch(call, range(requests), workers=threads, ordered=False):
+            if not outcome.ok:
+                raise outcome.error
+        return requests / (time.time() - start)
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    comps = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    cores = multiprocessing.cpu_count()
+
+    ports = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(comps, ports, stop))
+    server.start()
+    try:
+        base_url = 'http://127.0.0.1:%d/webservice' % ports.get()
+        print('%d requests of %d comps, %d fetch threads, %d cores' % (requests, comps, threads, cores))
+        print('%-24s %12s %10s' % ('parsing', 'requests/s', 'speedup'))
+        baseline = run(base_url, requests, threads, None)
+        print('%-24s %12.1f %10.2f' % ('fetch threads', baseline, 1.0))
+        workers = 1
+        while workers <= max(cores, 1):
+            with ParsePool(workers) as pool:
+                rate = run(base_url, requests, threads, pool)
+            print('%-24s %12.1f %10.2f' % ('ParsePool(%d)' % workers, rate, rate / baseline))
+            workers *= 2
+    finally:
+        stop.set()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Compare snapshot files with the JSON dumps of Place.get_dict they replace:
+file size, write time, the time to open the file, and the time to read
+every place or one place by zpid.
+
+    python benchmarks/bench_snapshot.py [count]
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from zillow import Place  # noqa: E402
+from zillow.parser import parse_comps  # noqa: E402
+from zillow.snapshot import Snapshot, write_snapshot  # noqa: E402
+
+
+def places(count):
+    with open(os.path.join(ROOT, 'testdata', 'get_deep_comps.xml'), 'rb') as f:
+        comps = parse_comps(f.read())
+    templates = [comps['principal']] + comps['comps']
+    for i in range(count):
+        place = templates[i % len(templates)].copy()
+        place.zpid = str(10000000 + i)
+        yield place
+
+
+def timed(func):
+    start = time.time()
+    result = func()
+    return time.time() - start, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    tmp = tempfile.mkdtemp()
+    try:
+        json_path = os.path.join(tmp, 'places.json')
+        snap_path = os.path.join(tmp, 'places.snap')
+        middle = str(10000000 + count // 2)
+
+        def write_json():
+            with open(json_path, 'w') as f:
+                json.dump([p.get_dict() for p in places(count)], f)
+
+        def read_json():
+            with open(json_path) as f:
+                loaded = []
+                for data in json.load(f):
+                    place = Place()
+                    place.set_values_from_dict(data)
+                    loaded.append(place)
+                return loaded
+
+        def find_json():
+            return [p for p in read_json() if p.zpid == middle][0]
+
+        json_write, _ = timed(write_json)
+        json_read, _ = timed(read_json)
+        json_find, _ = timed(find_json)
+
+        snap_write, _ = timed(lambda: write_snapshot(snap_path, places(count)))
+        snap_open, snapshot = timed(lambda: Snapshot(snap_path))
+        snap_read, _ = timed(lambda: [p.zestimate.amount for p in snapshot])
+        snap_eager, _ = timed(lambda: list(Snapshot(snap_path, lazy=False)))
+        snap_find, _ = timed(lambda: snapshot.get(middle).zestimate.amount)
+        snapshot.close()
+
+        print('%d places' % count)
+        print('%-34s %12s %12s' % ('', 'json', 'snapshot'))
+        print('%-34s %12d %12d' % ('file bytes', os.path.getsize(json_path), os.path.getsize(snap_path)))
+        print('%-34s %12.3f %12.3f' % ('write s', json_write, snap_write))
+        print('%-34s %12s %12.6f' % ('open s', '-', snap_open))
+        print('%-34s %12.3f %12.3f' % ('read all s (snapshot: amounts)', json_read, snap_read))
+        print('%-34s %12s %12.3f' % ('read all s (snapshot: eager)', '-', snap_eager))
+        print('%-34s %12.3f %12.6f' % ('find one zpid s', json_find, snap_find))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
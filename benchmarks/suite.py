@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""
+Benchmark parsing and the Place model on the testdata fixtures and on comps
+documents scaled up to many comps, and write the results as JSON so runs on
+different commits can be compared.
+
+For each case it measures, per place: XML parse time, Place.set_data time,
+get_dict time, the time of the whole parse_place or parse_comps call, and
+the memory blocks and bytes a Place adds to its parsed section; and per
+response, the peak memory of parsing it.
+
+    python benchmarks/suite.py --output before.json
+    git checkout other-branch
+    python benchmarks/suite.py --output after.json --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from zillow import Place  # noqa: E402
+from zillow.parser import (COMPS_COMP, COMPS_PRINCIPAL, SEARCH_RESULT, ZESTIMATE,  # noqa: E402
+                           get_backend, iter_records, parse_comps, parse_place)
+
+# Metrics where a higher value is worse, compared by --compare.
+METRICS = ('parse_us', 'set_data_us', 'get_dict_us', 'total_us', 'blocks_per_place',
+           'bytes_per_place', 'peak_bytes')
+
+
+def read(name):
+    with open(os.path.join(ROOT, 'testdata', name), 'rb') as f:
+        return f.read()
+
+
+def scale_comps(content, count):
+    """Repeat the comps in a comps document until it holds count of them."""
+    head, rest = content.split(b'<comp ', 1)
+    comps, tail = rest.rsplit(b'</comp>', 1)
+    comps = (b'<comp ' + comps + b'</comp>').split(b'</comp>')[:-1]
+    body = b''.join(comps[i % len(comps)] + b'</comp>' for i in range(count))
+    return head + body + tail
+
+
+class Case(object):
+    def __init__(self, name, content, paths, has_extended_data, parse):
+        self.name = name
+        self.content = content
+        self.paths = paths
+        self.has_extended_data = has_extended_data
+        self.parse = parse
+
+
+def cases(scales):
+    yield Case('place.xml', read('place.xml'), (SEARCH_RESULT,), False,
+               lambda c: parse_place(c, SEARCH_RESULT))
+    yield Case('get_zestimate.xml', read('get_zestimate.xml'), (ZESTIMATE,), False,
+               lambda c: parse_place(c, ZESTIMATE))
+    yield Case('get_deep_search_results.xml', read('get_deep_search_results.xml'), (SEARCH_RESULT,), True,
+               lambda c: parse_place(c, SEARCH_RESULT, True))
+    for name in ('get_comps.xml', 'get_deep_comps.xml'):
+        yield Case(name, read(name), (COMPS_PRINCIPAL, COMPS_COMP), False, parse_comps)
+    for count in scales:
+        yield Case('get_deep_comps.xml x %d' % count, scale_comps(read('get_deep_comps.xml'), count),
+                   (COMPS_PRINCIPAL, COMPS_COMP), False, parse_comps)
+
+
+def best(func, number, repeat):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def retained(func):
+    """
+    :return: The number of memory blocks and bytes held by what func returns, and the peak bytes while it ran.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = func()
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    del result
+    return blocks, size, peak
+
+
+def run_case(case, repeat, budget):
+    content = case.content
+    records = [record for _, record in iter_records(content, case.paths)]
+    count = len(records)
+    number = max(1, int(budget // len(content)))
+
+    def build():
+        places = []
+        for record in records:
+            place = Place(has_extended_data=case.has_extended_data)
+            place.set_data(record)
+            places.append(place)
+        return places
+
+    places = build()
+    parse = best(lambda: list(iter_records(content, case.paths)), number, repeat)
+    set_data = best(build, number, repeat)
+    get_dict = best(lambda: [place.get_dict() for place in places], number, repeat)
+    total = best(lambda: case.parse(content), number, repeat)
+    blocks, size, _ = retained(build)
+    _, _, peak = retained(lambda: case.parse(content))
+    return {
+        'case': case.name,
+        'bytes': len(content),
+        'places': count,
+        'parse_us': parse / count * 1e6,
+        'set_data_us': set_data / count * 1e6,
+        'get_dict_us': get_dict / count * 1e6,
+        'total_us': total / count * 1e6,
+        'blocks_per_place': blocks / float(count),
+        'bytes_per_place': size / float(count),
+        'peak_bytes': peak,
+    }
+
+
+def commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.STDOUT).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each metric against the baseline run.
+    :return: The number of metrics that got worse by more than threshold.
+    """
+    old = dict((row['case'], row) for row in baseline['results'])
+    regressions = 0
+    print('%-32s %-18s %14s %14s %8s' % ('case', 'metric', 'baseline', 'current', 'change'))
+    for row in results:
+        before = old.get(row['case'])
+        if before is None:
+            continue
+        for metric in METRICS:
+            if not before.get(metric):
+                continue
+            change = row[metric] / float(before[metric]) - 1
+            flag = ''
+            if change > threshold:
+                regressions += 1
+                flag = '  REGRESSION'
+            print('%-32s %-18s %14.1f %14.1f %+7.1f%%%s' % (
+                row['case'], metric, before[metric], row[metric], change * 100, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--output', help='write the results to this JSON file (default: stdout)')
+    parser.add_argument('--compare', help='a JSON file from an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='the relative slowdown counted as a regression (default: 0.10)')
+    parser.add_argument('--scale', type=int, action='append',
+                        help='the number of comps of a scaled-up comps case; repeatable (default: 100 and 1000)')
+    parser.add_argument('--repeat', type=int, default=5, help='timing repeats; the best is kept')
+    parser.add_argument('--budget', type=float, default=20000,
+                        help='bytes of XML parsed per timing repeat (default: 20000)')
+    args = parser.parse_args(argv)
+
+    results = [run_case(case, args.repeat, args.budget) for case in cases(args.scale or [100, 1000])]
+    report = {
+        'suite': 'python-zillow parse',
+        'commit': commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'backend': get_backend().name,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@ The setup and build script for the python-zillow library.
 """
 
 import os
+import re
 
 from setuptools import setup, find_packages
 
@@ -13,9 +14,15 @@ def read(*paths):
         return f.read()
 
 
+def version():
+    """Read __version__ from zillow/_version.py without importing the package."""
+    match = re.search(r"^__version__ = '([^']+)'", read('zillow', '_version.py'), re.M)
+    return match.group(1)
+
+
 setup(
     name='python-zillow',
-    version='0.3.0',
+    version=version(),
     author='The Python-Zillow Developers',
     author_email='python-zillow@googlegroups.com',
     license='Apache License 2.0',
@@ -27,7 +34,16 @@ setup(
     install_requires=[
         'requests',
         'xmltodict',
+        'futures; python_version < "3"',
     ],
+    entry_points={
+        'console_scripts': ['zillow-bulk = zillow.cli:main'],
+    },
+    extras_require={
+        'async': ['aiohttp'],
+        'lxml': ['lxml'],
+        'numpy': ['numpy'],
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
@@ -0,0 +1,53 @@
+"""Shared fixtures for the python-zillow tests."""
+
+import os
+
+TESTDATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'testdata')
+
+# The fixture served for each web service endpoint.
+ENDPOINT_FIXTURES = {
+    'GetSearchResults.htm': 'place.xml',
+    'GetZestimate.htm': 'get_zestimate.xml',
+    'GetDeepSearchResults.htm': 'get_deep_search_results.xml',
+    'GetComps.htm': 'get_comps.xml',
+    'GetDeepComps.htm': 'get_deep_comps.xml',
+}
+
+
+def read_fixture(name):
+    with open(os.path.join(TESTDATA, name), 'rb') as f:
+        return f.read()
+
+
+class FakeResponse(object):
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+
+class FakeSession(object):
+    """
+    Stands in for a requests.Session, answering every GET with the fixture
+    for the requested endpoint and recording the urls it was asked for.
+    """
+    def __init__(self, fixtures=None):
+        self.fixtures = fixtures or ENDPOINT_FIXTURES
+        self.urls = []
+        self.closed = False
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        endpoint = url.split('?')[0].rsplit('/', 1)[-1]
+        return FakeResponse(read_fixture(self.fixtures[endpoint]))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock(object):
+    """A clock for the time-based classes that stands still until a test moves now."""
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
@@ -0,0 +1,76 @@
+"""A local HTTP server answering web service requests with the testdata fixtures."""
+
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from .helpers import ENDPOINT_FIXTURES, read_fixture
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.paths.append(self.path)
+            status, delay = server.script.pop(0) if server.script else (200, server.delay)
+        if delay:
+            time.sleep(delay)
+        endpoint = self.path.split('?')[0].rsplit('/', 1)[-1]
+        body = server.bodies.get(endpoint)
+        if status != 200:
+            self.send_response(status)
+            body = b'<html>Service Unavailable</html>'
+        elif body is None:
+            self.send_response(404)
+            body = b''
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/xml;charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """
+    Serve the fixture for each endpoint on a free local port.
+    Example usage:
+        >>> with StubServer() as server:
+        ...     api.base_url = server.base_url
+    """
+    daemon_threads = True
+
+    def __init__(self, delay=0):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.delay = delay
+        self.paths = []
+        # (status, delay) of the next requests, in turn, before falling back to the fixtures
+        self.script = []
+        self.lock = threading.Lock()
+        self.bodies = dict((endpoint, read_fixture(name))
+                           for endpoint, name in ENDPOINT_FIXTURES.items())
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+
+    @property
+    def base_url(self):
+        return 'http://127.0.0.1:%d/webservice' % self.server_address[1]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,138 @@
+import unittest
+
+from zillow import AddressIndex, Place, ValuationApi
+from zillow.address import canonical_address, canonical_citystatezip
+
+from .helpers import FakeSession
+
+
+class TestCanonicalAddress(unittest.TestCase):
+
+    def test_variants_share_a_canonical_form(self):
+        variants = ['3400 Pacific Ave APT 201', '3400 PACIFIC AVENUE, Apt. #201', '3400 pacific ave. #201',
+                    '  3400 Pacific   Avenue Unit 201 ']
+        self.assertEqual(set(['3400 PACIFIC AVE APT 201']), set(canonical_address(v) for v in variants))
+
+    def test_suffixes_and_directionals(self):
+        self.assertEqual('123 N MAIN ST', canonical_address('123 North Main Street'))
+        self.assertEqual('123 MAIN ST NE', canonical_address('123 Main St. N.E.'))
+        self.assertEqual('10 PARK AVE S', canonical_address('10 Park Avenue South'))
+        # street names that are also suffixes or directionals are kept
+        self.assertEqual('55 COURT ST', canonical_address('55 Court Street'))
+        self.assertEqual('7 NORTH ST', canonical_address('7 North St'))
+        self.assertEqual('1 AVENUE OF THE AMERICAS', canonical_address('1 Avenue of the Americas'))
+        self.assertEqual('12-14 W 3RD ST STE 5', canonical_address('12-14 W. 3rd St., Suite 5'))
+        self.assertEqual('3400 PACIFIC AVE MARINA DEL REY CA',
+                         canonical_address('3400 Pacific Ave., Marina Del Rey, CA'))
+
+    def test_abbreviated_post_directionals(self):
+        variants = ['1600 Pennsylvania Avenue NW', '1600 Pennsylvania Ave NW', '1600 Pennsylvania Avenue Northwest',
+                    '1600 Pennsylvania Ave. N.W.']
+        self.assertEqual(set(['1600 PENNSYLVANIA AVE NW']), set(canonical_address(v) for v in variants))
+        self.assertEqual('500 PINE ST N', canonical_address('500 Pine Street N'))
+        self.assertEqual('500 PINE ST N', canonical_address('500 Pine St N'))
+        self.assertEqual('8 N MAIN ST', canonical_address('8 N Main Street'))
+        self.assertEqual('100 AVENUE E', canonical_address('100 Avenue E'))
+
+    def test_street_names_that_are_unit_designators(self):
+        self.assertEqual('123 NO NAME RD', canonical_address('123 No Name Rd'))
+        self.assertEqual('1 SPACE PARK DR', canonical_address('1 Space Park Dr'))
+        self.assertEqual('10 LOT RD', canonical_address('10 Lot Rd'))
+        self.assertEqual('55 UNIT RD APT 3', canonical_address('55 Unit Rd, Unit 3'))
+        self.assertEqual('1 MAIN ST LOT 5', canonical_address('1 Main St Lot 5'))
+        self.assertEqual('9 MAIN ST APT B', canonical_address('9 Main St Apt B'))
+
+    def test_citystatezip(self):
+        self.assertEqual('90292', canonical_citystatezip('90292-1234'))
+        self.assertEqual('98101', canonical_citystatezip('Seattle, WA 98101-2345'))
+        self.assertEqual('MARINA DEL REY CA', canonical_citystatezip('Marina del Rey, California'))
+        self.assertEqual('NEW YORK NY', canonical_citystatezip('new york, New York'))
+        self.assertIsNone(canonical_citystatezip(None))
+
+
+class TestAddressIndex(unittest.TestCase):
+
+    def place(self):
+        place = Place()
+        place.zpid = '2100641621'
+        place.full_address.street = '3400 Pacific Ave APT 201'
+        place.full_address.zipcode = '90292'
+        place.full_address.city = 'Marina Del Rey'
+        place.full_address.state = 'CA'
+        return place
+
+    def test_learns_searched_and_returned_addresses(self):
+        index = AddressIndex()
+        index.learn('3400 Pacific Ave., Marina Del Rey, CA', '90292', self.place())
+        self.assertEqual('2100641621', index.lookup('3400 PACIFIC AVE., MARINA DEL REY, CA', '90292-0001'))
+        self.assertEqual('2100641621', index.lookup('3400 Pacific Avenue #201', '90292'))
+        self.assertEqual('2100641621', index.lookup('3400 Pacific Avenue #201', 'Marina Del Rey, California'))
+        self.assertIsNone(index.lookup('3400 Pacific Avenue #202', '90292'))
+        self.assertEqual(('3400 PACIFIC AVE MARINA DEL REY CA', '90292'), index.address('2100641621'))
+        self.assertEqual({'entries': 3, 'hits': 3, 'misses': 1}, index.stats())
+
+    def test_searched_address_same_as_found(self):
+        index = AddressIndex()
+        index.learn('3400 Pacific Ave Apt 201', '90292', self.place())
+        self.assertEqual(('3400 PACIFIC AVE APT 201', '90292'), index.address('2100641621'))
+        index.learn('3400 Pacific Avenue, Apt 201', '90292', self.place())
+        self.assertEqual(('3400 PACIFIC AVE APT 201', '90292'), index.address('2100641621'))
+        self.assertEqual(2, len(index))
+
+    def test_bounded(self):
+        index = AddressIndex(max_entries=2)
+        index.learn('3400 Pacific Ave', '90292', self.place())
+        self.assertEqual(2, len(index))
+        other = Place()
+        other.zpid = '1'
+        index.learn('1 Main St', '90292', other)
+        index.learn('2 Main St', '90292', other)
+        self.assertEqual(2, len(index))
+        self.assertIsNone(index.address('2100641621'))
+        self.assertEqual(('1 MAIN ST', '90292'), index.address('1'))
+
+
+class TestValuationApiAddresses(unittest.TestCase):
+
+    def test_variants_share_one_call(self):
+        session = FakeSession()
+        with ValuationApi(session=session) as api:
+            first = api.GetSearchResults('key', '3400 Pacific Avenue', '90292')
+            second = api.GetSearchResults('key', '3400 PACIFIC AVE.', '90292-1234')
+        self.assertEqual(first.get_dict(), second.get_dict())
+        self.assertEqual(1, len(session.urls))
+        self.assertIn('address=3400+PACIFIC+AVE&', session.urls[0] + '&')
+
+    def test_addresses_sent_as_given(self):
+        session = FakeSession()
+        with ValuationApi(session=session, canonical_addresses=False) as api:
+            api.GetSearchResults('key', '3400 Pacific Avenue', '90292')
+        self.assertIn('address=3400+Pacific+Avenue', session.urls[0])
+
+    def test_known_address_is_looked_up_by_zpid(self):
+        session = FakeSession()
+        index = AddressIndex()
+        with ValuationApi(session=session, cache=None, address_index=index) as api:
+            found = api.GetSearchResults('key', '3400 Pacific Ave., Marina Del Rey, CA', '90292')
+            again = api.GetSearchResults('key', '3400 Pacific Ave Apt 201', 'Marina Del Rey, CA')
+            deep = api.GetDeepSearchResults('key', '3400 PACIFIC AVENUE #201', '90292')
+        self.assertEqual(found.zpid, again.zpid)
+        self.assertEqual(found.zestimate.amount, again.zestimate.amount)
+        self.assertEqual(['GetSearchResults.htm', 'GetZestimate.htm', 'GetDeepSearchResults.htm'],
+                         [url.split('?')[0].rsplit('/', 1)[-1] for url in session.urls])
+        self.assertIn('zpid=2100641621', session.urls[1])
+        # the deep search is sent with the spelling the zpid was first found with
+        self.assertIn('address=3400+PACIFIC+AVE+MARINA+DEL+REY+CA', session.urls[2])
+        self.assertEqual(found.zpid, deep.zpid)
+
+    def test_repeat_deep_search_of_a_known_address(self):
+        session = FakeSession()
+        with ValuationApi(session=session, cache=None, address_index=AddressIndex()) as api:
+            first = api.GetDeepSearchResults('key', '3400 Pacific Ave Apt 201', '90292')
+            second = api.GetDeepSearchResults('key', '3400 Pacific Avenue, Apt 201', '90292')
+        self.assertEqual(first.get_dict(), second.get_dict())
+        self.assertIn('address=3400+PACIFIC+AVE+APT+201', session.urls[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+
+try:
+    import asyncio
+    from zillow.aio import AsyncValuationApi
+except (ImportError, SyntaxError):
+    AsyncValuationApi = None
+
+from zillow import RecordStore, ValuationApi, ZillowError
+
+from .stub_server import StubServer
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@unittest.skipIf(AsyncValuationApi is None, 'aiohttp is not installed')
+class TestAsyncValuationApi(unittest.TestCase):
+
+    def test_same_results_as_sync_api(self):
+        async def lookups(base_url):
+            async with AsyncValuationApi(cache=None) as api:
+                api.base_url = base_url
+                return await asyncio.gather(
+                    api.GetSearchResults('key', '3400 Pacific Ave', '90292'),
+                    api.GetZEstimate('key', '2100641621'),
+                    api.GetDeepSearchResults('key', '3400 Pacific Ave', '90292'),
+                    api.GetComps('key', '2100641621', count=10),
+                    api.GetDeepComps('key', '2100641621', count=10))
+
+        with StubServer() as server:
+            results = run(lookups(server.base_url))
+            with ValuationApi(cache=None) as api:
+                api.base_url = server.base_url
+                expected = [
+                    api.GetSearchResults('key', '3400 Pacific Ave', '90292'),
+                    api.GetZEstimate('key', '2100641621'),
+                    api.GetDeepSearchResults('key', '3400 Pacific Ave', '90292'),
+                    api.GetComps('key', '2100641621', count=10),
+                    api.GetDeepComps('key', '2100641621', count=10)]
+
+        for got, want in zip(results[:3], expected[:3]):
+            self.assertEqual(want.get_dict(), got.get_dict())
+        for got, want in zip(results[3:], expected[3:]):
+            self.assertEqual(want['principal'].get_dict(), got['principal'].get_dict())
+            self.assertEqual([p.get_dict() for p in want['comps']],
+                             [p.get_dict() for p in got['comps']])
+
+    def test_concurrency_is_bounded(self):
+        async def lookups(base_url):
+            async with AsyncValuationApi(concurrency=2, cache=None) as api:
+                api.base_url = base_url
+                await asyncio.gather(*[api.GetZEstimate('key', zpid) for zpid in range(6)])
+                return api._semaphore
+
+        with StubServer(delay=0.05) as server:
+            semaphore = run(lookups(server.base_url))
+            self.assertEqual(6, len(server.paths))
+        self.assertFalse(semaphore.locked())
+
+    def test_timeout(self):
+        async def lookup(base_url):
+            async with AsyncValuationApi(timeout=0.05, cache=None) as api:
+                api.base_url = base_url
+                await api.GetZEstimate('key', '2100641621')
+
+        with StubServer(delay=0.5) as server:
+            self.assertRaises(ZillowError, run, lookup(server.base_url))
+
+    def test_batch(self):
+        async def lookups(base_url):
+            async with AsyncValuationApi(concurrency=2, cache=None) as api:
+                api.base_url = base_url
+                pairs = [('3400 Pacific Ave', '90292'), ('', '90292'), ('1 Main St', '90292')]
+                return [r async for r in api.GetSearchResultsBatch('key', pairs)]
+
+        with StubServer() as server:
+            results = run(lookups(server.base_url))
+        self.assertEqual([0, 1, 2], [r.index for r in results])
+        self.assertEqual([True, False, True], [r.ok for r in results])
+
+    def test_scheduler(self):
+        from zillow import QuotaScheduler
+
+        async def lookups(base_url, scheduler):
+            async with AsyncValuationApi(cache=None, scheduler=scheduler) as api:
+                api.base_url = base_url
+                return [r async for r in api.GetZEstimateBatch('key', ['1', '2', '3'])]
+
+        scheduler = QuotaScheduler(rate=100, burst=1)
+        with StubServer() as server:
+            results = run(lookups(server.base_url, scheduler))
+        self.assertTrue(all(r.ok for r in results))
+        stats = scheduler.stats('key')
+        self.assertEqual(3, stats['granted']['batch'])
+        self.assertEqual(0, stats['waiting']['batch'])
+
+    def test_concurrent_calls_are_coalesced(self):
+        async def lookups(base_url):
+            async with AsyncValuationApi(cache=None) as api:
+                api.base_url = base_url
+                places = await asyncio.gather(*[api.GetZEstimate('key', '2100641621') for _ in range(4)])
+                return places, api.flights.stats.get_dict()
+
+        with StubServer(delay=0.05) as server:
+            places, stats = run(lookups(server.base_url))
+            self.assertEqual(1, len(server.paths))
+        self.assertEqual({'calls': 4, 'leaders': 1, 'coalesced': 3}, stats)
+        self.assertEqual(4, len(set(id(p) for p in places)))
+
+    def test_record_store(self):
+        async def lookups(base_url):
+            async with AsyncValuationApi(cache=None, record_store=RecordStore()) as api:
+                api.base_url = base_url
+                comps = await api.GetComps('key', '2100641621', count=10)
+                return await asyncio.gather(*[api.GetZEstimate('key', place.zpid) for place in comps['comps']])
+
+        with StubServer() as server:
+            places = run(lookups(server.base_url))
+            self.assertEqual(1, len(server.paths))
+        self.assertEqual(10, len(places))
@@ -0,0 +1,63 @@
+import threading
+import time
+import unittest
+
+from zillow import ValuationApi, ZillowError
+from zillow.batch import run_batch
+
+from .helpers import FakeResponse, FakeSession
+
+
+class SlowSession(FakeSession):
+    """Answers zpid 0 last, and with an error for zpid 'bad'."""
+    def __init__(self):
+        FakeSession.__init__(self)
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        if 'zpid=bad' in url:
+            return FakeResponse(b'<error/>')
+        if 'zpid=0&' in url or url.endswith('zpid=0'):
+            time.sleep(0.1)
+        with self.lock:
+            return FakeSession.get(self, url, **kwargs)
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_ordered_results_and_errors(self):
+        api = ValuationApi(session=SlowSession(), cache=None)
+        results = list(api.GetZEstimateBatch('key', [0, 'bad', 2, 3], workers=4))
+
+        self.assertEqual([0, 'bad', 2, 3], [r.item for r in results])
+        self.assertEqual([True, False, True, True], [r.ok for r in results])
+        self.assertIsInstance(results[1].error, ZillowError)
+        self.assertRaises(ZillowError, results[1].get)
+        self.assertEqual('2100641621', results[0].get().zpid)
+
+    def test_unordered_results(self):
+        api = ValuationApi(session=SlowSession(), cache=None)
+        results = list(api.GetZEstimateBatch('key', [0, 1, 2, 3], workers=4, ordered=False))
+        self.assertEqual(0, results[-1].item)
+        self.assertEqual([0, 1, 2, 3], sorted(r.index for r in results))
+
+    def test_search_results_batch(self):
+        session = SlowSession()
+        api = ValuationApi(session=session, cache=None)
+        pairs = [('3400 Pacific Ave', '90292'), ('1 Main St', '90292')]
+        results = list(api.GetSearchResultsBatch('key', pairs, workers=2))
+        self.assertEqual(pairs, [r.item for r in results])
+        self.assertEqual(2, len(session.urls))
+
+    def test_window_bounds_items_read_ahead(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+
+        results = run_batch(lambda i: i * 2, items(), workers=2, window=4)
+        self.assertEqual(0, next(results).result)
+        self.assertTrue(len(consumed) <= 5)
+        results.close()
@@ -0,0 +1,153 @@
+import unittest
+
+from zillow import Place, RecordStore, ResponseCache, ValuationApi
+from zillow.cache import make_key
+from zillow.metrics import Metrics
+
+from .helpers import FakeClock, FakeSession
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_key_ignores_zws_id_and_case(self):
+        a = make_key('GetSearchResults', {'zws-id': 'a', 'address': '3400 Pacific  Ave', 'citystatezip': '90292'})
+        b = make_key('GetSearchResults', {'zws-id': 'b', 'address': '3400 pacific ave', 'citystatezip': '90292 '})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, make_key('GetDeepSearchResults', {'address': '3400 pacific ave', 'citystatezip': '90292'}))
+
+    def test_ttl_per_endpoint(self):
+        clock = FakeClock(1000.0)
+        cache = ResponseCache(ttl=60, ttls={'GetComps': 3600}, clock=clock)
+        cache.set(('GetZEstimate', ()), 'zestimate')
+        cache.set(('GetComps', ()), 'comps')
+        clock.now += 120
+        self.assertIsNone(cache.get(('GetZEstimate', ())))
+        self.assertEqual('comps', cache.get(('GetComps', ())))
+        self.assertEqual(1, cache.stats.expirations)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2, max_bytes=100)
+        cache.set(('a', ()), 1, size=10)
+        cache.set(('b', ()), 2, size=10)
+        cache.get(('a', ()))
+        cache.set(('c', ()), 3, size=10)
+        self.assertIsNone(cache.get(('b', ())))
+        self.assertEqual(1, cache.get(('a', ())))
+
+        cache.set(('d', ()), 4, size=95)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(95, cache.size_bytes)
+        self.assertEqual(3, cache.stats.evictions)
+
+
+class TestApiCache(unittest.TestCase):
+
+    def test_repeat_lookup_is_served_from_cache(self):
+        session = FakeSession()
+        api = ValuationApi(session=session)
+
+        first = api.GetZEstimate('key', '2100641621')
+        second = api.GetZEstimate('other-key', '2100641621')
+
+        self.assertEqual(1, len(session.urls))
+        self.assertEqual(first.get_dict(), second.get_dict())
+        self.assertEqual(1, api.cache.stats.hits)
+
+        # hits are copies, so changing one doesn't change the cache
+        second.zestimate.amount = 0
+        self.assertEqual(1723665, api.GetZEstimate('key', '2100641621').zestimate.amount)
+
+    def test_bypass_and_refresh(self):
+        session = FakeSession()
+        api = ValuationApi(session=session)
+
+        api.GetComps('key', '2100641621', count=10)
+        api.GetComps('key', '2100641621', count=10, use_cache=False)
+        api.GetComps('key', '2100641621', count=10, refresh_cache=True)
+        comps = api.GetComps('key', '2100641621', count=10)
+
+        self.assertEqual(3, len(session.urls))
+        self.assertEqual(10, len(comps['comps']))
+
+    def test_cache_disabled(self):
+        session = FakeSession()
+        api = ValuationApi(session=session, cache=None)
+        api.GetZEstimate('key', '2100641621')
+        api.GetZEstimate('key', '2100641621')
+        self.assertEqual(2, len(session.urls))
+
+
+def make_place(zpid, amount):
+    place = Place()
+    place.zpid = zpid
+    place.zestimate.amount = amount
+    place.similarity_score = 15.0
+    return place
+
+
+class TestRecordStore(unittest.TestCase):
+
+    def test_freshness_per_endpoint(self):
+        clock = FakeClock(1000.0)
+        store = RecordStore(ttl=60, ttls={'GetComps': 10}, clock=clock)
+        store.load({'principal': make_place('1', 100), 'comps': [make_place('2', 200)]}, 'GetComps')
+        store.load(make_place('3', 300), 'GetZEstimate')
+        self.assertEqual(3, len(store))
+        self.assertIsNone(store.get('2').similarity_score)
+        self.assertEqual(('GetComps', 1000.0), store.record('2')[1:])
+        clock.now += 30
+        self.assertIsNone(store.get('1'))
+        self.assertEqual(300, store.get('3').zestimate.amount)
+        self.assertEqual(100, store.get('1', max_age=60).zestimate.amount)
+        self.assertEqual({'hits': 3, 'misses': 1, 'evictions': 0, 'expirations': 1}, store.stats.get_dict())
+
+    def test_newer_records_win_and_lru_eviction(self):
+        clock = FakeClock(1000.0)
+        store = RecordStore(max_entries=2, clock=clock)
+        store.put(make_place('1', 100), 'GetComps', fetched=1000.0)
+        store.put(make_place('1', 50), 'GetDeepComps', fetched=900.0)
+        self.assertEqual(100, store.get('1').zestimate.amount)
+        store.put(make_place('2', 200), 'GetComps')
+        store.get('1')
+        store.put(make_place('3', 300), 'GetComps')
+        self.assertIn('1', store)
+        self.assertNotIn('2', store)
+        # the store holds copies
+        place = store.get('3')
+        place.zestimate.amount = 0
+        self.assertEqual(300, store.get('3').zestimate.amount)
+
+
+class TestApiRecordStore(unittest.TestCase):
+
+    def test_comps_answer_zestimate_lookups(self):
+        session = FakeSession()
+        store = RecordStore()
+        metrics = Metrics()
+        with ValuationApi(session=session, cache=None, record_store=store) as api:
+            metrics.install(api)
+            comps = api.GetDeepComps('key', '2100641621')
+            zpids = [comps['principal'].zpid] + [place.zpid for place in comps['comps']]
+            places = [api.GetZEstimate('key', zpid) for zpid in zpids]
+            refreshed = api.GetZEstimate('key', zpids[1], refresh_cache=True)
+        self.assertEqual(['GetDeepComps.htm', 'GetZestimate.htm'],
+                         [url.split('?')[0].rsplit('/', 1)[-1] for url in session.urls])
+        self.assertEqual(zpids, [place.zpid for place in places])
+        self.assertEqual(comps['comps'][0].zestimate.get_dict(), places[1].zestimate.get_dict())
+        self.assertEqual(comps['comps'][0].full_address.get_dict(), places[1].full_address.get_dict())
+        self.assertIsNone(places[1].similarity_score)
+        self.assertEqual(refreshed.zpid, store.record(refreshed.zpid).place.zpid)
+        self.assertEqual('GetZEstimate', store.record(refreshed.zpid).endpoint)
+        sources = dict((series['source'], series['value']) for series in metrics.get_dict()
+                       if series['metric'] == 'requests' and series['endpoint'] == 'GetZEstimate')
+        self.assertEqual({'records': len(zpids), 'network': 1}, sources)
+
+    def test_stale_records_are_fetched(self):
+        clock = FakeClock(1000.0)
+        session = FakeSession()
+        store = RecordStore(ttl=60, clock=clock)
+        with ValuationApi(session=session, cache=None, record_store=store) as api:
+            api.GetComps('key', '2100641621')
+            clock.now += 61
+            api.GetZEstimate('key', '2100641621')
+        self.assertEqual(2, len(session.urls))
@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from zillow import ValuationApi
+from zillow.cli import bulk, completed, main, read_rows
+
+from .helpers import FakeSession
+
+CSV = (u'address,citystatezip,zpid\n'
+       u'3400 Pacific Ave,90292,\n'
+       u',,2100641621\n'
+       u',,\n'
+       u'3400 Pacific Avenue,Marina Del Rey CA,\n')
+
+
+class TestBulk(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.input = os.path.join(self.tmp, 'rows.csv')
+        with io.open(self.input, 'w') as f:
+            f.write(CSV)
+        self.output = os.path.join(self.tmp, 'places.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def read_output(self):
+        with open(self.output) as f:
+            return [json.loads(line) for line in f]
+
+    def test_read_rows(self):
+        rows = list(read_rows(io.StringIO(CSV)))
+        self.assertEqual(4, len(rows))
+        self.assertEqual('2100641621', rows[1]['zpid'])
+        rows = list(read_rows(io.StringIO(u'{"zpid": "1"}\n\n{"zpid": "2"}\n'), 'jsonl'))
+        self.assertEqual([{'zpid': '1'}, {'zpid': '2'}], rows)
+
+    def test_writes_a_line_per_row_in_input_order(self):
+        session = FakeSession()
+        status = main([self.input, '-o', self.output, '--key', 'key', '--workers', '2', '--stats', '0'],
+                      session=session)
+        self.assertEqual(0, status)
+        entries = self.read_output()
+        self.assertEqual([0, 1, 2, 3], [entry['index'] for entry in entries])
+        self.assertEqual('2100641621', entries[0]['place']['zpid'])
+        self.assertEqual('2100641621', entries[1]['place']['zpid'])
+        self.assertIn('error', entries[2])
+        self.assertEqual({'address': '', 'citystatezip': '', 'zpid': ''}, entries[2]['input'])
+        self.assertEqual(['GetSearchResults.htm', 'GetSearchResults.htm', 'GetZestimate.htm'],
+                         sorted(url.split('?')[0].rsplit('/', 1)[-1] for url in session.urls))
+
+    def test_resume_skips_written_rows_and_drops_a_cut_line(self):
+        with open(self.output, 'w') as f:
+            f.write(json.dumps({'index': 0, 'place': {}}) + '\n')
+            f.write(json.dumps({'index': 2, 'place': {}}) + '\n')
+            f.write('{"index": 3, "pla')
+        self.assertEqual((1, set([2]), set()), completed(self.output))
+        session = FakeSession()
+        main([self.input, '-o', self.output, '--key', 'key', '--resume', '--unordered', '--stats', '0'],
+             session=session)
+        self.assertEqual(set([0, 1, 2, 3]), set(entry['index'] for entry in self.read_output()))
+        self.assertEqual(2, len(session.urls))
+        self.assertEqual((4, set(), set()), completed(self.output))
+
+    def test_resume_looks_up_failed_rows_again(self):
+        with open(self.output, 'w') as f:
+            f.write(json.dumps({'index': 0, 'place': {}}) + '\n')
+            f.write(json.dumps({'index': 1, 'error': {'message': 'timed out'}}) + '\n')
+            f.write(json.dumps({'index': 3, 'place': {}}) + '\n')
+        self.assertEqual((2, set([3]), set([1])), completed(self.output))
+        session = FakeSession()
+        main([self.input, '-o', self.output, '--key', 'key', '--resume', '--stats', '0'], session=session)
+        entries = self.read_output()
+        self.assertEqual([0, 1, 3, 1, 2], [entry['index'] for entry in entries])
+        self.assertEqual('2100641621', entries[3]['place']['zpid'])
+        self.assertEqual(['GetZestimate.htm'], [url.split('?')[0].rsplit('/', 1)[-1] for url in session.urls])
+        # row 2 has neither a zpid nor an address: it fails again, and is tried again on the next resume
+        self.assertEqual((4, set(), set([2])), completed(self.output))
+
+    def test_window_bounds_the_rows_read_ahead(self):
+        out = io.StringIO()
+        ahead = []
+
+        def rows():
+            for index in range(100):
+                ahead.append(index - len(out.getvalue().splitlines()))
+                yield {'zpid': str(2100641621 + index)}
+
+        reports = []
+        with ValuationApi(session=FakeSession(), cache=None) as api:
+            progress = bulk(api, 'key', rows(), out, workers=2, window=4, report=reports.append, interval=0.001)
+        self.assertEqual(100, progress.ok)
+        self.assertEqual(100, len(out.getvalue().splitlines()))
+        self.assertLessEqual(max(ahead), 4)
+        self.assertTrue(reports)
+        self.assertIsNotNone(progress.quantile(0.99))
+
+    def test_progress_is_reported_while_a_slow_row_holds_back_the_writes(self):
+        out = io.StringIO()
+        reported = threading.Event()
+        written = []
+
+        class SlowFirstSession(FakeSession):
+            def get(self, url, **kwargs):
+                if 'zpid=2100641621&' in url + '&':
+                    reported.wait(5)
+                return FakeSession.get(self, url, **kwargs)
+
+        def report(line):
+            written.append(len(out.getvalue().splitlines()))
+            reported.set()
+
+        rows = [{'zpid': str(2100641621 + index)} for index in range(8)]
+        with ValuationApi(session=SlowFirstSession(), cache=None) as api:
+            bulk(api, 'key', rows, out, workers=2, window=4, report=report, interval=0.01)
+        self.assertTrue(reported.is_set())
+        self.assertEqual(0, written[0])
+        self.assertEqual(8, len(out.getvalue().splitlines()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from zillow import ValuationApi
+from zillow.crawl import CompCrawler, CrawlEdge, CrawlError, CrawlNode
+
+from .helpers import FakeResponse, read_fixture
+
+FIXTURE = read_fixture('get_deep_comps.xml').decode('utf-8')
+PRINCIPAL = re.search(r'<principal>.*?</principal>', FIXTURE, re.S).group(0)
+COMP = re.search(r'<comp score="19.0">.*?</comp>', FIXTURE, re.S).group(0)
+HEAD = FIXTURE[:FIXTURE.index('<principal>')]
+TAIL = FIXTURE[FIXTURE.rindex('</comparables>'):]
+
+
+def comps_body(zpid, comps):
+    parts = [HEAD, PRINCIPAL.replace('2100641621', zpid), '<comparables>']
+    for i, comp in enumerate(comps):
+        parts.append(COMP.replace('20440534', comp).replace('19.0', str(10.0 + i)))
+    parts.append(TAIL)
+    return ''.join(parts).encode('utf-8')
+
+
+class GraphSession(object):
+    """Answers GetDeepComps from an adjacency dict, failing for unknown zpids."""
+    def __init__(self, graph):
+        self.graph = graph
+        self.zpids = []
+
+    def get(self, url, **kwargs):
+        zpid = re.search(r'zpid=(\d+)', url).group(1)
+        self.zpids.append(zpid)
+        if zpid not in self.graph:
+            return FakeResponse(b'<error/>')
+        return FakeResponse(comps_body(zpid, self.graph[zpid]))
+
+    def close(self):
+        pass
+
+
+GRAPH = {
+    '1': ['2', '3'],
+    '2': ['1', '4'],
+    '3': ['4', '5'],
+    '4': ['6'],
+    '5': ['1'],
+}
+
+
+class TestCompCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.tmp, 'crawl.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def crawl(self, session, **kwargs):
+        api = ValuationApi(session=session, cache=None)
+        crawler = CompCrawler(api, 'key', workers=2, **kwargs)
+        return crawler, list(crawler.crawl(['1']))
+
+    def test_breadth_first_to_max_depth(self):
+        session = GraphSession(GRAPH)
+        crawler, items = self.crawl(session, max_depth=2)
+        nodes = dict((n.zpid, n.depth) for n in items if isinstance(n, CrawlNode))
+        edges = set((e.source, e.target) for e in items if isinstance(e, CrawlEdge))
+
+        self.assertEqual({'1': 0, '2': 1, '3': 1, '4': 2, '5': 2}, nodes)
+        self.assertEqual({('1', '2'), ('1', '3'), ('2', '1'), ('2', '4'), ('3', '4'), ('3', '5')}, edges)
+        self.assertEqual(['1', '2', '3'], sorted(session.zpids))
+        self.assertEqual(3, crawler.expanded)
+        score = [e.similarity_score for e in items if isinstance(e, CrawlEdge) and e.target == '3'][0]
+        self.assertEqual(11.0, score)
+
+    def test_node_budget(self):
+        crawler, items = self.crawl(GraphSession(GRAPH), max_depth=5, max_nodes=3)
+        nodes = [n.zpid for n in items if isinstance(n, CrawlNode)]
+        self.assertEqual(['1', '2', '3'], sorted(nodes))
+        self.assertEqual(3, crawler.seen)
+        for edge in items:
+            if isinstance(edge, CrawlEdge):
+                self.assertIn(edge.target, nodes)
+
+    def test_errors_are_reported(self):
+        graph = dict(GRAPH)
+        del graph['3']
+        _, items = self.crawl(GraphSession(graph), max_depth=2)
+        errors = [e for e in items if isinstance(e, CrawlError)]
+        self.assertEqual(['3'], [e.zpid for e in errors])
+
+    def test_resume_from_checkpoint(self):
+        session = GraphSession(GRAPH)
+        api = ValuationApi(session=session, cache=None)
+        crawler = CompCrawler(api, 'key', max_depth=3, workers=1, checkpoint=self.checkpoint)
+        stream = crawler.crawl(['1'])
+        for item in stream:
+            if isinstance(item, CrawlEdge) and item.source == '2':
+                break
+        stream.close()
+        # a crash may leave half a line behind
+        with open(self.checkpoint, 'a') as f:
+            f.write('{"zpid": "9')
+
+        session.zpids = []
+        crawler = CompCrawler(api, 'key', max_depth=3, workers=1, checkpoint=self.checkpoint)
+        items = list(crawler.crawl(['1']))
+        self.assertNotIn('1', session.zpids)
+        self.assertEqual(['2', '3', '4', '5'], sorted(session.zpids))
+        nodes = set(n.zpid for n in items if isinstance(n, CrawlNode))
+        self.assertEqual({'2', '3', '4', '5', '6'}, nodes)
+        self.assertEqual(6, crawler.seen)
+
+
+if __name__ == '__main__':
+    unittest.main()
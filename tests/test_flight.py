@@ -0,0 +1,117 @@
+import threading
+import unittest
+
+from zillow import ValuationApi, ZillowError
+from zillow.flight import SingleFlight
+
+from .helpers import FakeResponse, FakeSession
+
+
+class GatedSession(FakeSession):
+    """Holds every request until the gate opens."""
+    def __init__(self, body=None):
+        FakeSession.__init__(self)
+        self.gate = threading.Event()
+        self.body = body
+
+    def get(self, url, **kwargs):
+        self.gate.wait(5)
+        if self.body is not None:
+            self.urls.append(url)
+            return FakeResponse(self.body)
+        return FakeSession.get(self, url, **kwargs)
+
+
+def run_threads(count, target):
+    outcomes = [None] * count
+
+    def run(i):
+        try:
+            outcomes[i] = target()
+        except ZillowError as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def wait_for_waiters(self, flights, count):
+        for _ in range(500):
+            if flights.stats.calls >= count:
+                return
+            threading.Event().wait(0.01)
+
+    def test_concurrent_calls_share_one_request(self):
+        session = GatedSession()
+        api = ValuationApi(session=session, cache=None)
+        threads, outcomes = run_threads(5, lambda: api.GetZEstimate('key', '2100641621'))
+        self.wait_for_waiters(api.flights, 5)
+        session.gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(session.urls))
+        self.assertEqual({'calls': 5, 'leaders': 1, 'coalesced': 4}, api.flights.stats.get_dict())
+        self.assertEqual(1, len(set(p.zestimate.amount for p in outcomes)))
+        self.assertEqual(5, len(set(id(p) for p in outcomes)))
+        self.assertEqual(0, len(api.flights))
+
+    def test_waiters_get_the_same_error(self):
+        session = GatedSession(body=b'<error/>')
+        api = ValuationApi(session=session, cache=None)
+        threads, outcomes = run_threads(3, lambda: api.GetComps('key', '2100641621'))
+        self.wait_for_waiters(api.flights, 3)
+        session.gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, len(session.urls))
+        self.assertTrue(all(isinstance(o, ZillowError) for o in outcomes))
+        self.assertEqual(1, len(set(id(o) for o in outcomes)))
+
+    def test_different_requests_are_not_coalesced(self):
+        session = GatedSession()
+        session.gate.set()
+        api = ValuationApi(session=session, cache=None)
+        api.GetZEstimate('key', '1')
+        api.GetZEstimate('key', '2')
+        self.assertEqual(2, len(session.urls))
+        self.assertEqual(0, api.flights.stats.coalesced)
+
+    def test_coalesce_off(self):
+        api = ValuationApi(session=FakeSession(), coalesce=False)
+        self.assertIsNone(api.flights)
+        api.GetZEstimate('key', '2100641621')
+
+    def test_interrupted_leader(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def interrupted():
+            started.set()
+            release.wait(5)
+            raise KeyboardInterrupt()
+
+        def leader():
+            try:
+                flights.do('key', interrupted)
+            except KeyboardInterrupt:
+                pass
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        started.wait(5)
+        threads, outcomes = run_threads(1, lambda: flights.do('key', lambda: 'retried'))
+        self.wait_for_waiters(flights, 2)
+        release.set()
+        thread.join()
+        threads[0].join()
+        self.assertEqual(['retried'], outcomes)
+
+
+if __name__ == '__main__':
+    unittest.main()
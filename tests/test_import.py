@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import zillow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def loaded_after(statement):
+    """Run statement in a fresh interpreter and return the modules it loaded."""
+    code = '%s\nimport sys\nprint(" ".join(sorted(sys.modules)))' % statement
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return set(subprocess.check_output([sys.executable, '-c', code], cwd=ROOT, env=env).decode().split())
+
+
+class TestImport(unittest.TestCase):
+
+    def test_version(self):
+        with open(os.path.join(ROOT, 'zillow', '_version.py')) as f:
+            self.assertIn("'%s'" % zillow.__version__, f.read())
+
+    @unittest.skipIf(sys.version_info < (3, 7), 'lazy imports need module __getattr__')
+    def test_import_is_light(self):
+        modules = loaded_after('import zillow')
+        for heavy in ('requests', 'pkg_resources', 'xmltodict', 'sqlite3', 'concurrent.futures'):
+            self.assertNotIn(heavy, modules)
+
+    def test_lazy_names(self):
+        modules = loaded_after('from zillow import Place, ValuationApi, ZillowError, SQLiteCache, KeyPool')
+        self.assertIn('zillow.api', modules)
+        self.assertIs(zillow.ValuationApi, zillow.api.ValuationApi)
+        self.assertIn('ValuationApi', dir(zillow))
+        self.assertRaises(AttributeError, getattr, zillow, 'NoSuchThing')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+
+from zillow import KeyPool, QuotaScheduler, ValuationApi, ZillowError
+from zillow.parser import parse_message
+from zillow.quota import PRIORITY_BATCH
+
+from .helpers import FakeClock, FakeResponse, FakeSession, read_fixture
+
+
+def error_body(code, text):
+    return (b'<?xml version="1.0" encoding="utf-8"?>'
+            b'<Zestimate:zestimate xmlns:Zestimate="http://www.zillow.com/static/xsd/Zestimate.xsd">'
+            b'<request><zpid>1</zpid></request>'
+            b'<message><text>' + text + b'</text><code>' + code + b'</code></message>'
+            b'</Zestimate:zestimate>')
+
+
+class KeyedSession(FakeSession):
+    """Answers with an error for the zws-ids in errors."""
+    def __init__(self, errors):
+        FakeSession.__init__(self)
+        self.errors = errors
+
+    def get(self, url, **kwargs):
+        for zws_id, body in self.errors.items():
+            if 'zws-id=%s&' % zws_id in url or url.endswith('zws-id=%s' % zws_id):
+                self.urls.append(url)
+                return FakeResponse(body)
+        return FakeSession.get(self, url, **kwargs)
+
+
+class TestKeyPool(unittest.TestCase):
+
+    def test_least_loaded_key(self):
+        pool = KeyPool(['a', 'b'])
+        self.assertEqual('a', pool.checkout())
+        self.assertEqual('b', pool.checkout())
+        pool.checkin('b')
+        self.assertEqual('b', pool.checkout())
+        pool.checkin('a')
+        pool.checkin('b')
+        self.assertEqual({'a': 1, 'b': 2}, dict((k, v['calls']) for k, v in pool.stats().items()))
+
+    def test_eject_on_key_errors(self):
+        clock = FakeClock()
+        pool = KeyPool(['a', 'b', 'c'], quota_cooldown=60, clock=clock)
+        for key, code in (('a', 2), ('b', 7)):
+            self.assertEqual(key, pool.checkout())
+            self.assertTrue(pool.checkin(key, ZillowError({'message': 'rejected', 'code': code})))
+        self.assertEqual(['c'], pool.healthy_keys())
+        stats = pool.stats()
+        self.assertEqual('invalid', stats['a']['ejected'])
+        self.assertEqual('quota', stats['b']['ejected'])
+        clock.now = 60
+        self.assertEqual(['b', 'c'], pool.healthy_keys())
+
+    def test_other_errors_keep_the_key(self):
+        pool = KeyPool(['a'])
+        pool.checkout()
+        self.assertFalse(pool.checkin('a', ZillowError({'message': 'timed out'})))
+        self.assertEqual(['a'], pool.healthy_keys())
+        self.assertEqual(1, pool.stats()['a']['errors'])
+
+    def test_no_usable_key(self):
+        pool = KeyPool(['a'])
+        pool.eject('a')
+        self.assertRaises(ZillowError, pool.checkout)
+        pool.restore('a')
+        self.assertEqual('a', pool.checkout())
+
+
+class TestApiKeyPool(unittest.TestCase):
+
+    def test_parse_message(self):
+        self.assertEqual((0, 'Request successfully processed'), parse_message(read_fixture('get_zestimate.xml')))
+        self.assertEqual((7, 'limit'), parse_message(error_body(b'7', b'limit')))
+
+    def test_errors_carry_the_code(self):
+        session = KeyedSession({'bad': error_body(b'2', b'invalid')})
+        api = ValuationApi(session=session, cache=None)
+        try:
+            api.GetZEstimate('bad', '1')
+            self.fail('an invalid key should raise')
+        except ZillowError as e:
+            self.assertEqual(2, e.message['code'])
+
+    def test_calls_move_to_a_healthy_key(self):
+        session = KeyedSession({'spent': error_body(b'7', b'limit'), 'bad': error_body(b'2', b'invalid')})
+        pool = KeyPool(['spent', 'bad', 'good'])
+        api = ValuationApi(session=session, cache=None, key_pool=pool)
+        place = api.GetZEstimate('ignored', '2100641621')
+        self.assertEqual('2100641621', place.zpid)
+        api.GetComps('ignored', '2100641621')
+        self.assertEqual(4, len(session.urls))
+        self.assertIn('zws-id=good', session.urls[-1])
+        stats = pool.stats()
+        self.assertEqual(['good'], pool.healthy_keys())
+        self.assertEqual(2, stats['good']['calls'])
+        self.assertEqual(0, stats['good']['in_flight'])
+
+    def test_all_keys_rejected(self):
+        session = KeyedSession({'bad': error_body(b'2', b'invalid')})
+        api = ValuationApi(session=session, cache=None, key_pool=KeyPool(['bad']))
+        self.assertRaises(ZillowError, api.GetZEstimate, None, '1')
+        self.assertRaises(ZillowError, api.GetZEstimate, None, '1')
+        self.assertEqual(1, len(session.urls))
+
+    def test_scheduler_refusals_keep_the_keys(self):
+        scheduler = QuotaScheduler(rate=100, burst=100, daily_limit=3, interactive_reserve=2, clock=FakeClock())
+        pool = KeyPool(['a', 'b'])
+        api = ValuationApi(session=FakeSession(), cache=None, scheduler=scheduler, key_pool=pool)
+        api.GetZEstimate(None, '1', priority=PRIORITY_BATCH)
+        api.GetZEstimate(None, '2', priority=PRIORITY_BATCH)
+        try:
+            api.GetZEstimate(None, '3', priority=PRIORITY_BATCH)
+            self.fail('the batch share of both keys should be used up')
+        except ZillowError as e:
+            self.assertTrue(e.message['throttled'])
+        self.assertEqual(['a', 'b'], sorted(pool.healthy_keys()))
+        # the interactive reserve is still there
+        self.assertEqual('2100641621', api.GetZEstimate(None, '2100641621').zpid)
+
+
+if __name__ == '__main__':
+    unittest.main()
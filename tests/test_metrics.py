@@ -0,0 +1,116 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from zillow import ValuationApi, ZillowError
+from zillow.metrics import Metrics, RequestLog
+
+from .helpers import FakeResponse, FakeSession
+
+
+class ErrorSession(FakeSession):
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return FakeResponse(b'<Zestimate:zestimate xmlns:Zestimate="z"><message><text>bad key</text>'
+                            b'<code>2</code></message></Zestimate:zestimate>', status_code=200)
+
+
+class TestHooks(unittest.TestCase):
+
+    def test_before_and_after(self):
+        api = ValuationApi(session=FakeSession())
+        seen = []
+        api.add_hook(before=lambda info: seen.append(('before', info.endpoint, info.zws_id)),
+                     after=lambda info: seen.append(('after', info.source, info.status)))
+        api.GetComps('key', '2100641621')
+        api.GetComps('key', '2100641621')
+        self.assertEqual([('before', 'GetComps', 'key'), ('after', 'network', 'ok'),
+                          ('before', 'GetComps', 'key'), ('after', 'memory', 'ok')], seen)
+
+    def test_phase_timings(self):
+        api = ValuationApi(session=FakeSession(), cache=None)
+        infos = []
+        api.add_hook(after=infos.append)
+        api.GetDeepComps('key', '2100641621')
+        info = infos[0]
+        self.assertEqual({'url', 'network', 'parse', 'model', 'total'}, set(info.timings))
+        self.assertTrue(all(seconds >= 0 for seconds in info.timings.values()))
+        self.assertGreaterEqual(info.timings['total'], info.timings['parse'] + info.timings['model'])
+        self.assertEqual(200, info.http_status)
+        self.assertGreater(info.bytes, 0)
+        self.assertNotIn('zws-id', info.parameters)
+
+    def test_errors(self):
+        api = ValuationApi(session=ErrorSession(), cache=None)
+        infos = []
+        api.add_hook(after=infos.append)
+        self.assertRaises(ZillowError, api.GetZEstimate, 'key', '1')
+        self.assertEqual(('error', 2), (infos[0].status, infos[0].code))
+
+    def test_remove_hook(self):
+        api = ValuationApi(session=FakeSession())
+        infos = []
+        api.add_hook(after=infos.append)
+        api.remove_hook(infos.append)
+        api.GetZEstimate('key', '2100641621')
+        self.assertEqual([], infos)
+        self.assertFalse(api._hooks)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.api = ValuationApi(session=FakeSession())
+        self.metrics = Metrics()
+        self.metrics.install(self.api)
+        self.api.GetZEstimate('key', '2100641621')
+        self.api.GetZEstimate('key', '2100641621')
+        self.api.GetComps('key', '2100641621')
+
+    def test_counters(self):
+        requests = dict(((s['endpoint'], s['source']), s['value'])
+                        for s in self.metrics.get_dict() if s['metric'] == 'requests')
+        self.assertEqual({('GetZEstimate', 'network'): 1, ('GetZEstimate', 'memory'): 1,
+                          ('GetComps', 'network'): 1}, requests)
+        latency = [s for s in self.metrics.get_dict()
+                   if s['metric'] == 'phase_seconds' and s['endpoint'] == 'GetZEstimate' and s['phase'] == 'total']
+        self.assertEqual(2, latency[0]['count'])
+        self.assertEqual(2, sum(latency[0]['buckets'].values()))
+
+    def test_prometheus(self):
+        text = self.metrics.prometheus()
+        self.assertIn('# TYPE zillow_requests_total counter', text)
+        self.assertIn('zillow_requests_total{endpoint="GetZEstimate",status="ok",source="memory"} 1', text)
+        self.assertIn('zillow_phase_seconds_bucket{endpoint="GetComps",phase="network",le="+Inf"} 1', text)
+        self.assertIn('zillow_phase_seconds_count{endpoint="GetZEstimate",phase="total"} 2', text)
+
+    def test_json_lines(self):
+        series = [json.loads(line) for line in self.metrics.json_lines().splitlines()]
+        self.assertEqual(len(self.metrics.get_dict()), len(series))
+        self.assertTrue(all('time' in s for s in series))
+
+    def test_write(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'zillow.prom')
+            self.metrics.write(path)
+            with open(path) as f:
+                self.assertEqual(self.metrics.prometheus(), f.read())
+            self.assertEqual(['zillow.prom'], os.listdir(tmp))
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_request_log(self):
+        stream = io.StringIO()
+        self.api.add_hook(after=RequestLog(stream))
+        self.api.GetComps('key', '2100641621', use_cache=False)
+        entry = json.loads(stream.getvalue())
+        self.assertEqual('GetComps', entry['endpoint'])
+        self.assertIn('network', entry['timings'])
+
+
+if __name__ == '__main__':
+    unittest.main()
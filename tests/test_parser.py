@@ -0,0 +1,59 @@
+import unittest
+
+import xmltodict
+
+from zillow import Place, ZillowError
+from zillow.parser import (COMPS_COMP, ExpatBackend, COMPS_PRINCIPAL, SEARCH_RESULT, ZESTIMATE,
+                           iter_comps, iter_records, parse_comps, parse_place)
+
+from .helpers import read_fixture
+
+
+def xmltodict_section(content, path):
+    data = xmltodict.parse(content.decode('utf-8'))
+    for name in path:
+        data = data[name]
+    return data
+
+
+class TestParser(unittest.TestCase):
+
+    def test_records_match_xmltodict(self):
+        for fixture, path in [('place.xml', SEARCH_RESULT),
+                              ('get_deep_search_results.xml', SEARCH_RESULT),
+                              ('get_zestimate.xml', ZESTIMATE),
+                              ('get_comps.xml', COMPS_PRINCIPAL),
+                              ('get_deep_comps.xml', COMPS_PRINCIPAL)]:
+            content = read_fixture(fixture)
+            records = [record for _, record in iter_records(content, (path,))]
+            self.assertEqual([xmltodict_section(content, path)], records, fixture)
+
+    def test_comps_match_xmltodict(self):
+        for fixture in ('get_comps.xml', 'get_deep_comps.xml'):
+            content = read_fixture(fixture)
+            records = [record for _, record in iter_records(content, (COMPS_COMP,), ExpatBackend(chunk_size=512))]
+            self.assertEqual(xmltodict_section(content, COMPS_COMP), records, fixture)
+
+    def test_places_match_set_data(self):
+        content = read_fixture('get_deep_search_results.xml')
+        expected = Place(has_extended_data=True)
+        expected.set_data(xmltodict_section(content, SEARCH_RESULT))
+        place = parse_place(content, SEARCH_RESULT, has_extended_data=True)
+        self.assertEqual(expected.get_dict(), place.get_dict())
+
+    def test_comps_are_yielded_one_at_a_time(self):
+        comps = iter_comps(read_fixture('get_comps.xml'))
+        self.assertEqual('principal', next(comps)[0])
+        kind, place = next(comps)
+        self.assertEqual('comp', kind)
+        self.assertEqual(9, len(list(comps)))
+
+        result = parse_comps(read_fixture('get_comps.xml'))
+        self.assertEqual('2100641621', result['principal'].zpid)
+        self.assertEqual(10, len(result['comps']))
+
+    def test_invalid_responses(self):
+        self.assertRaises(ZillowError, parse_place, b'', ZESTIMATE)
+        self.assertRaises(ZillowError, parse_place, b'<html>', ZESTIMATE)
+        self.assertRaises(ZillowError, parse_place, read_fixture('get_comps.xml'), ZESTIMATE)
+        self.assertRaises(ZillowError, parse_comps, read_fixture('place.xml'))
@@ -0,0 +1,44 @@
+import unittest
+
+from zillow import ValuationApi, ZillowError
+from zillow.parser import (SEARCH_RESULT, ZESTIMATE, available_backends, get_backend,
+                           parse_comps, parse_place)
+
+from .helpers import FakeSession, read_fixture
+
+
+def place_dicts(fixture, backend):
+    content = read_fixture(fixture)
+    if fixture in ('get_comps.xml', 'get_deep_comps.xml'):
+        result = parse_comps(content, backend=backend)
+        return [result['principal'].get_dict()] + [place.get_dict() for place in result['comps']]
+    path = ZESTIMATE if fixture == 'get_zestimate.xml' else SEARCH_RESULT
+    has_extended_data = fixture == 'get_deep_search_results.xml'
+    return [parse_place(content, path, has_extended_data, backend=backend).get_dict()]
+
+
+class TestBackendConformance(unittest.TestCase):
+
+    FIXTURES = ('place.xml', 'get_zestimate.xml', 'get_deep_search_results.xml',
+                'get_comps.xml', 'get_deep_comps.xml')
+
+    def test_backends_agree(self):
+        backends = available_backends()
+        self.assertIn('expat', backends)
+        self.assertIn('xmltodict', backends)
+        for fixture in self.FIXTURES:
+            expected = place_dicts(fixture, 'xmltodict')
+            for backend in backends:
+                self.assertEqual(expected, place_dicts(fixture, backend), '%s with %s' % (fixture, backend))
+
+    def test_backends_reject_bad_xml(self):
+        for backend in available_backends():
+            self.assertRaises(ZillowError, parse_place, b'<html>', ZESTIMATE, backend=backend)
+
+    def test_default_and_override(self):
+        self.assertEqual(available_backends()[0], get_backend().name)
+        self.assertRaises(ZillowError, get_backend, 'nope')
+
+        api = ValuationApi(session=FakeSession(), parser='xmltodict')
+        self.assertEqual('xmltodict', api.parser.name)
+        self.assertEqual('2100641621', api.GetZEstimate('key', '2100641621').zpid)
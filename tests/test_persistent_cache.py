@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from zillow import RecordStore, SQLiteCache, ValuationApi
+from zillow.cache import make_key
+
+from .helpers import FakeSession
+
+
+class TestSQLiteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_shared_between_connections(self):
+        key = make_key('GetZEstimate', {'zws-id': 'key', 'zpid': '2100641621'})
+        writer = SQLiteCache(self.path)
+        reader = SQLiteCache(self.path)
+        writer.set(key, b'<xml/>')
+        self.assertEqual(b'<xml/>', reader.get(key))
+        writer.close()
+        reader.close()
+
+    def test_ttl_and_size_bound(self):
+        now = [1000.0]
+        cache = SQLiteCache(self.path, ttl=10, max_bytes=25, evict_interval=1, clock=lambda: now[0])
+        for zpid in range(3):
+            now[0] += 1
+            cache.set(make_key('GetZEstimate', {'zpid': zpid}), b'x' * 10)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get(make_key('GetZEstimate', {'zpid': 0})))
+        self.assertEqual(b'x' * 10, cache.get(make_key('GetZEstimate', {'zpid': 2})))
+
+        now[0] += 60
+        self.assertIsNone(cache.get(make_key('GetZEstimate', {'zpid': 2})))
+        cache.close()
+
+    def test_warm_start_reads_index(self):
+        key = make_key('GetComps', {'zpid': '2100641621', 'count': 10})
+        cache = SQLiteCache(self.path)
+        cache.set(key, b'<comps/>')
+        cache.close()
+
+        warm = SQLiteCache(self.path, warm_start=True)
+        late = SQLiteCache(self.path)
+        late.set(make_key('GetComps', {'zpid': '1', 'count': 10}), b'<comps/>')
+
+        self.assertEqual(b'<comps/>', warm.get(key))
+        self.assertIsNone(warm.get(make_key('GetComps', {'zpid': '1', 'count': 10})))
+        warm.reload_index()
+        self.assertEqual(b'<comps/>', warm.get(make_key('GetComps', {'zpid': '1', 'count': 10})))
+        warm.close()
+        late.close()
+
+    def test_api_reuses_bodies_across_runs(self):
+        for _ in range(2):
+            session = FakeSession()
+            cache = SQLiteCache(self.path)
+            with ValuationApi(session=session, persistent_cache=cache) as api:
+                comps = api.GetDeepComps('key', '2100641621', count=10)
+            cache.close()
+        self.assertEqual([], session.urls)
+        self.assertEqual('2100641621', comps['principal'].zpid)
+
+    def test_disk_hits_are_not_side_loaded(self):
+        cache = SQLiteCache(self.path)
+        with ValuationApi(session=FakeSession(), persistent_cache=cache) as api:
+            comps = api.GetDeepComps('key', '2100641621')
+        cache.close()
+        zpid = comps['comps'][0].zpid
+        session = FakeSession()
+        store = RecordStore()
+        cache = SQLiteCache(self.path)
+        with ValuationApi(session=session, cache=None, persistent_cache=cache, record_store=store) as api:
+            api.GetDeepComps('key', '2100641621')
+            # the comps came off the disk, of an unknown age: the record store cannot vouch for them
+            self.assertIsNone(store.record(zpid))
+            self.assertEqual([], session.urls)
+            place = api.GetZEstimate('key', zpid)
+        cache.close()
+        self.assertEqual(['GetZestimate.htm'], [url.split('?')[0].rsplit('/', 1)[-1] for url in session.urls])
+        self.assertEqual('GetZEstimate', store.record(place.zpid).endpoint)
@@ -0,0 +1,63 @@
+import unittest
+
+from zillow import ValuationApi, ZillowError
+from zillow.parser import SEARCH_RESULT, ZESTIMATE, parse_comps, parse_place
+from zillow.pipeline import ParsePool, from_row, to_row
+
+from .helpers import FakeSession, read_fixture
+
+
+class TestRows(unittest.TestCase):
+
+    def test_round_trip(self):
+        places = [
+            parse_place(read_fixture('get_zestimate.xml'), ZESTIMATE),
+            parse_place(read_fixture('get_deep_search_results.xml'), SEARCH_RESULT, has_extended_data=True),
+        ] + parse_comps(read_fixture('get_deep_comps.xml'))['comps']
+        for place in places:
+            copy = from_row(to_row(place))
+            self.assertEqual(place.get_dict(), copy.get_dict())
+            self.assertEqual(place.similarity_score, copy.similarity_score)
+
+
+class TestParsePool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = ParsePool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def calls(self, api):
+        return [
+            api.GetSearchResults('key', '3400 Pacific Ave', '90292'),
+            api.GetZEstimate('key', '2100641621'),
+            api.GetDeepSearchResults('key', '3400 Pacific Ave', '90292'),
+        ]
+
+    def test_results_match_parsing_in_the_thread(self):
+        with ValuationApi(session=FakeSession(), cache=None) as api:
+            expected = [place.get_dict() for place in self.calls(api)]
+            expected_comps = api.GetDeepComps('key', '2100641621')
+        with ValuationApi(session=FakeSession(), cache=None, parse_pool=self.pool) as api:
+            self.assertEqual(expected, [place.get_dict() for place in self.calls(api)])
+            comps = api.GetDeepComps('key', '2100641621')
+            plain = api.GetComps('key', '2100641621')
+        self.assertEqual(expected_comps['principal'].get_dict(), comps['principal'].get_dict())
+        self.assertEqual([place.get_dict() for place in expected_comps['comps']],
+                         [place.get_dict() for place in comps['comps']])
+        self.assertEqual(10, len(plain['comps']))
+
+    def test_errors_cross_from_the_workers(self):
+        error = b'<SearchResults:searchresults><message><text>Error: no exact match found</text>' \
+                b'<code>508</code></message></SearchResults:searchresults>'
+        with self.assertRaises(ZillowError) as raised:
+            self.pool.parse_place(error, SEARCH_RESULT)
+        self.assertEqual(508, raised.exception.message['code'])
+        self.assertRaises(ZillowError, self.pool.parse_comps, read_fixture('place.xml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
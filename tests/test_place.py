@@ -0,0 +1,104 @@
+import re
+import unittest
+import warnings
+
+from zillow import Place, ValuationApi, ZillowError
+from zillow.parser import SEARCH_RESULT, ZESTIMATE, parse_comps, parse_place
+
+from .helpers import FakeResponse, read_fixture
+
+
+class TestPlace(unittest.TestCase):
+
+    def setUp(self):
+        self.place = parse_place(read_fixture('get_deep_search_results.xml'), SEARCH_RESULT,
+                                 has_extended_data=True)
+
+    def test_records_have_no_instance_dict(self):
+        for record in (self.place, self.place.links, self.place.full_address, self.place.zestimate,
+                       self.place.local_realestate, self.place.extended_data):
+            self.assertFalse(hasattr(record, '__dict__'), type(record).__name__)
+
+    def test_numeric_fields_are_typed(self):
+        self.assertEqual(33.9781, self.place.full_address.latitude)
+        self.assertEqual(-118.4643, self.place.full_address.longitude)
+        self.assertEqual(3.0, self.place.extended_data.bathrooms)
+        self.assertEqual(2, self.place.extended_data.bedrooms)
+        self.assertEqual(1729341, self.place.zestimate.amount)
+        self.assertEqual("2100641621", self.place.zpid)
+
+        comps = parse_comps(read_fixture('get_comps.xml'))['comps']
+        self.assertEqual(15.0, comps[0].similarity_score)
+
+    def test_dict_round_trip(self):
+        other = Place()
+        other.set_values_from_dict(self.place.get_dict())
+        self.assertEqual(self.place.get_dict(), other.get_dict())
+        self.assertTrue(other.has_extended_data)
+
+    def test_copy(self):
+        other = self.place.copy()
+        other.zestimate.amount = 1
+        self.assertEqual(1729341, self.place.zestimate.amount)
+        self.assertEqual(self.place.links.get_dict(), other.links.get_dict())
+
+    def test_zestiamte_still_warns(self):
+        place = parse_place(read_fixture('get_zestimate.xml'), ZESTIMATE)
+        with warnings.catch_warnings(record=True) as warning:
+            warnings.simplefilter('always', DeprecationWarning)
+            self.assertIs(place.zestimate, place.zestiamte)
+            self.assertTrue(issubclass(warning[0].category, DeprecationWarning))
+
+
+class TestLazyPlace(unittest.TestCase):
+
+    FIXTURES = [('place.xml', SEARCH_RESULT, False),
+                ('get_zestimate.xml', ZESTIMATE, False),
+                ('get_deep_search_results.xml', SEARCH_RESULT, True)]
+
+    def test_same_values_as_eager(self):
+        for fixture, path, has_extended_data in self.FIXTURES:
+            content = read_fixture(fixture)
+            eager = parse_place(content, path, has_extended_data)
+            lazy = parse_place(content, path, has_extended_data, lazy=True)
+            self.assertEqual(eager.get_dict(), lazy.get_dict(), fixture)
+
+        eager = parse_comps(read_fixture('get_comps.xml'))
+        lazy = parse_comps(read_fixture('get_comps.xml'), lazy=True)
+        self.assertEqual([p.get_dict() for p in eager['comps']], [p.get_dict() for p in lazy['comps']])
+
+    def test_records_are_decoded_on_first_access(self):
+        place = parse_place(read_fixture('get_zestimate.xml'), ZESTIMATE, lazy=True)
+        self.assertEqual("2100641621", place.zpid)
+        self.assertIsNone(place._zestimate)
+        self.assertEqual(1723665, place.zestimate.amount)
+        self.assertIs(place.zestimate, place._zestimate)
+        self.assertIsNone(place._links)
+
+        place.get_dict()
+        self.assertIsNone(place._source)
+
+    def test_malformed_sections_fail_at_parse_time(self):
+        content = re.sub(br'<zestimate>.*?</zestimate>', b'', read_fixture('get_zestimate.xml'), flags=re.S)
+        self.assertRaises(ZillowError, parse_place, content, ZESTIMATE)
+        self.assertRaises(ZillowError, parse_place, content, ZESTIMATE, lazy=True)
+
+        class Session(object):
+            def get(self, url, **kwargs):
+                return FakeResponse(content)
+
+        with ValuationApi(session=Session(), lazy_places=True) as api:
+            self.assertRaises(ZillowError, api.GetZEstimate, 'key', '2100641621')
+            self.assertEqual(0, len(api.cache))
+
+    def test_missing_fields_fail_at_parse_time(self):
+        content = re.sub(br'<latitude>.*?</latitude>', b'', read_fixture('get_zestimate.xml'), flags=re.S)
+        self.assertRaises(ZillowError, parse_place, content, ZESTIMATE)
+        self.assertRaises(ZillowError, parse_place, content, ZESTIMATE, lazy=True)
+
+    def test_copy_of_lazy_place(self):
+        place = parse_place(read_fixture('get_zestimate.xml'), ZESTIMATE, lazy=True)
+        other = place.copy()
+        self.assertEqual(place.get_dict(), other.get_dict())
+        other.zestimate.amount = 1
+        self.assertEqual(1723665, place.zestimate.amount)
@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+
+from zillow import QuotaScheduler, ValuationApi, ZillowError
+from zillow.quota import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+from .helpers import FakeClock, FakeSession
+
+
+class TestQuotaScheduler(unittest.TestCase):
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        scheduler = QuotaScheduler(rate=1, burst=2, clock=clock)
+        self.assertEqual(0, scheduler.try_acquire('key')[1])
+        self.assertEqual(0, scheduler.try_acquire('key')[1])
+        ticket, wait = scheduler.try_acquire('key')
+        self.assertAlmostEqual(1.0, wait)
+        clock.now = 0.5
+        self.assertAlmostEqual(0.5, scheduler.try_acquire('key', ticket=ticket)[1])
+        clock.now = 1.0
+        self.assertEqual(0, scheduler.try_acquire('key', ticket=ticket)[1])
+        self.assertEqual(3, scheduler.stats('key')['used'])
+
+    def test_keys_are_independent(self):
+        scheduler = QuotaScheduler(rate=1, burst=1, clock=FakeClock())
+        self.assertEqual(0, scheduler.try_acquire('a')[1])
+        self.assertEqual(0, scheduler.try_acquire('b')[1])
+        self.assertNotEqual(0, scheduler.try_acquire('a')[1])
+
+    def test_interactive_calls_go_first(self):
+        clock = FakeClock()
+        scheduler = QuotaScheduler(rate=1, burst=1, clock=clock)
+        scheduler.try_acquire('key')
+        batch, _ = scheduler.try_acquire('key', PRIORITY_BATCH)
+        interactive, _ = scheduler.try_acquire('key', PRIORITY_INTERACTIVE)
+        clock.now = 1.0
+        self.assertIsNone(scheduler.try_acquire('key', ticket=batch)[1])
+        self.assertEqual(0, scheduler.try_acquire('key', ticket=interactive)[1])
+        clock.now = 2.0
+        self.assertEqual(0, scheduler.try_acquire('key', ticket=batch)[1])
+
+    def test_queue_is_bounded(self):
+        scheduler = QuotaScheduler(rate=1, burst=0, max_waiting=2, clock=FakeClock())
+        scheduler.try_acquire('key')
+        scheduler.try_acquire('key')
+        self.assertRaises(ZillowError, scheduler.try_acquire, 'key')
+        self.assertEqual(1, scheduler.stats('key')['rejected'])
+        self.assertEqual(2, scheduler.stats('key')['waiting']['interactive'])
+
+    def test_release_leaves_the_queue(self):
+        scheduler = QuotaScheduler(rate=1, burst=0, clock=FakeClock())
+        ticket, _ = scheduler.try_acquire('key', PRIORITY_BATCH)
+        scheduler.release(ticket, timed_out=True)
+        stats = scheduler.stats('key')
+        self.assertEqual(0, stats['waiting']['batch'])
+        self.assertEqual(1, stats['timed_out'])
+
+    def test_interactive_reserve(self):
+        clock = FakeClock()
+        scheduler = QuotaScheduler(rate=100, burst=100, daily_limit=3, interactive_reserve=1,
+                                   period=10, clock=clock)
+        scheduler.try_acquire('key', PRIORITY_BATCH)
+        scheduler.try_acquire('key', PRIORITY_BATCH)
+        self.assertRaises(ZillowError, scheduler.try_acquire, 'key', PRIORITY_BATCH)
+        self.assertEqual(0, scheduler.try_acquire('key', PRIORITY_INTERACTIVE)[1])
+        try:
+            scheduler.try_acquire('key', PRIORITY_INTERACTIVE)
+            self.fail('the daily budget should be used up')
+        except ZillowError as e:
+            # a local refusal, not the web service's daily limit code
+            self.assertTrue(e.message['throttled'])
+            self.assertNotIn('code', e.message)
+        self.assertEqual(0, scheduler.stats('key')['remaining'])
+        clock.now = 10
+        self.assertEqual(3, scheduler.stats('key')['remaining'])
+
+    def test_per_key_limits(self):
+        scheduler = QuotaScheduler(daily_limit=10, limits={'big': {'daily_limit': 100}}, clock=FakeClock())
+        self.assertEqual(100, scheduler.stats('big')['remaining'])
+        self.assertEqual(10, scheduler.stats('small')['remaining'])
+
+    def test_acquire_waits(self):
+        scheduler = QuotaScheduler(rate=20, burst=1)
+        started = time.time()
+        for _ in range(3):
+            scheduler.acquire('key')
+        self.assertGreaterEqual(time.time() - started, 0.09)
+
+    def test_acquire_times_out(self):
+        scheduler = QuotaScheduler(rate=0.1, burst=1, timeout=0.05)
+        scheduler.acquire('key')
+        self.assertRaises(ZillowError, scheduler.acquire, 'key')
+        stats = scheduler.stats('key')
+        self.assertEqual(1, stats['timed_out'])
+        self.assertEqual(0, stats['waiting']['interactive'])
+
+    def test_threads_share_the_rate(self):
+        scheduler = QuotaScheduler(rate=50, burst=1)
+        started = time.time()
+        threads = [threading.Thread(target=scheduler.acquire, args=('key',)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.time() - started, 0.07)
+        self.assertEqual(5, scheduler.stats('key')['granted']['interactive'])
+
+
+class TestApiScheduling(unittest.TestCase):
+
+    def test_calls_wait_on_the_scheduler(self):
+        scheduler = QuotaScheduler(daily_limit=2, clock=FakeClock(), rate=100, burst=100)
+        api = ValuationApi(session=FakeSession(), scheduler=scheduler)
+        api.GetZEstimate('key', '2100641621')
+        # cached results do not use quota
+        api.GetZEstimate('key', '2100641621')
+        api.GetComps('key', '2100641621', priority=PRIORITY_BATCH)
+        self.assertRaises(ZillowError, api.GetZEstimate, 'key', '2100641621', use_cache=False)
+        stats = scheduler.stats('key')
+        self.assertEqual({'interactive': 1, 'batch': 1}, stats['granted'])
+
+    def test_batches_use_batch_priority(self):
+        scheduler = QuotaScheduler(rate=100, burst=100, clock=FakeClock())
+        api = ValuationApi(session=FakeSession(), scheduler=scheduler)
+        results = list(api.GetZEstimateBatch('key', ['1', '2', '3']))
+        self.assertTrue(all(r.ok for r in results))
+        self.assertEqual(3, scheduler.stats('key')['granted']['batch'])
+
+
+if __name__ == '__main__':
+    unittest.main()
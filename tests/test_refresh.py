@@ -0,0 +1,145 @@
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from zillow import Place, ValuationApi
+from zillow.refresh import (Change, RefreshError, Revaluer, StalenessPolicy, Unchanged, apply_changes, parse_date,
+                            write_change)
+from zillow.snapshot import Snapshot, write_snapshot
+
+from .helpers import FakeResponse, read_fixture
+
+FIXTURE = read_fixture('get_zestimate.xml').decode('utf-8')
+TODAY = date(2016, 1, 10)
+
+
+class ZestimateSession(object):
+    """Answers GetZestimate with the fixture for the zpid asked about, and fails for zpid 0."""
+    def __init__(self):
+        self.zpids = []
+
+    def get(self, url, **kwargs):
+        zpid = re.search(r'zpid=(\d+)', url).group(1)
+        self.zpids.append(zpid)
+        if zpid == '0':
+            return FakeResponse(b'<error/>')
+        return FakeResponse(FIXTURE.replace('2100641621', zpid).encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+def make_place(zpid, amount=1723665, last_updated='01/03/2016'):
+    place = Place()
+    place.zpid = str(zpid)
+    place.full_address.street = '%d Main St' % zpid
+    place.zestimate.amount = amount
+    place.zestimate.amount_last_updated = last_updated
+    place.zestimate.amount_change_30days = 108687
+    place.zestimate.valuation_range_low = 1551299
+    place.zestimate.valuation_range_high = 1878795
+    return place
+
+
+class TestStalenessPolicy(unittest.TestCase):
+
+    def test_due(self):
+        policy = StalenessPolicy(max_age=7, recheck=2, rules=[(lambda p: p.zestimate.amount > 2000000, 3)])
+        self.assertTrue(policy.due(make_place(1, last_updated='01/03/2016'), TODAY))
+        self.assertFalse(policy.due(make_place(1, last_updated='01/04/2016'), TODAY))
+        self.assertTrue(policy.due(make_place(1, amount=3000000, last_updated='01/06/2016'), TODAY))
+        self.assertTrue(policy.due(make_place(1, last_updated=None), TODAY))
+        # checked yesterday: not asked again yet
+        self.assertFalse(policy.due(make_place(1, last_updated='01/03/2016'), TODAY, date(2016, 1, 9)))
+        self.assertTrue(policy.due(make_place(1, last_updated='01/03/2016'), TODAY, date(2016, 1, 8)))
+
+    def test_parse_date(self):
+        self.assertEqual(date(2016, 1, 3), parse_date('01/03/2016'))
+        self.assertIsNone(parse_date('soon'))
+        self.assertIsNone(parse_date(None))
+
+
+class TestRevaluer(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.session = ZestimateSession()
+        self.api = ValuationApi(session=self.session, cache=None)
+
+    def tearDown(self):
+        self.api.close()
+        shutil.rmtree(self.tmp)
+
+    def portfolio(self):
+        return [
+            make_place(1, last_updated='12/01/2015'),                   # due, unchanged
+            make_place(2, amount=1600000, last_updated='12/01/2015'),   # due, changed
+            make_place(3, amount=1600000, last_updated='01/08/2016'),   # fresh: not fetched
+            make_place(0, last_updated='12/01/2015'),                   # due, fails
+        ]
+
+    def test_fetches_only_due_places_and_reports_changes(self):
+        revaluer = Revaluer(self.api, 'key', workers=2)
+        items = list(revaluer.refresh(self.portfolio(), today=TODAY))
+        self.assertEqual(['0', '1', '2'], sorted(self.session.zpids))
+        changes = [item for item in items if isinstance(item, Change)]
+        errors = [item for item in items if isinstance(item, RefreshError)]
+        self.assertEqual(['2'], [change.zpid for change in changes])
+        self.assertEqual({'amount': (1600000, 1723665)}, changes[0].changes)
+        self.assertEqual(1723665, changes[0].place.zestimate.amount)
+        self.assertEqual('2 Main St', changes[0].place.full_address.street)
+        self.assertEqual(['0'], [error.zpid for error in errors])
+        self.assertEqual({'places': 4, 'due': 3, 'changed': 1, 'failed': 1}, revaluer.stats)
+
+        out = io.StringIO()
+        write_change(out, changes[0])
+        self.assertEqual({'zpid': '2', 'amount_last_updated': '01/03/2016', 'changes': {'amount': [1600000, 1723665]}},
+                         json.loads(out.getvalue()))
+
+    def test_state_skips_recently_checked_places(self):
+        state = os.path.join(self.tmp, 'revalue.state')
+        list(Revaluer(self.api, 'key', state=state).refresh(self.portfolio(), today=TODAY))
+        self.session.zpids = []
+        list(Revaluer(self.api, 'key', state=state).refresh(self.portfolio(), today=TODAY))
+        # only the failed lookup is tried again
+        self.assertEqual(['0'], self.session.zpids)
+        self.session.zpids = []
+        list(Revaluer(self.api, 'key', state=state).refresh(self.portfolio(), today=date(2016, 1, 11)))
+        self.assertEqual(['0', '1', '2'], sorted(self.session.zpids))
+
+    def test_changes_applied_to_a_snapshot(self):
+        path = os.path.join(self.tmp, 'portfolio.zsnp')
+        write_snapshot(path, self.portfolio())
+        with Snapshot(path) as places:
+            changes = dict((item.zpid, item) for item in Revaluer(self.api, 'key').refresh(places, today=TODAY)
+                           if isinstance(item, Change))
+            write_snapshot(path + '.new', apply_changes(places, changes))
+        with Snapshot(path + '.new') as places:
+            self.assertEqual([1723665, 1723665, 1600000, 1723665], [p.zestimate.amount for p in places])
+            self.assertEqual('01/03/2016', places.get('2').zestimate.amount_last_updated)
+
+    def test_unchanged_places_are_written_back(self):
+        today = date(2016, 1, 5)
+        path = os.path.join(self.tmp, 'portfolio.zsnp')
+        write_snapshot(path, self.portfolio()[:3])
+        with Snapshot(path) as places:
+            items = list(Revaluer(self.api, 'key').refresh(places, today=today))
+            self.assertEqual(['1'], [item.zpid for item in items if isinstance(item, Unchanged)])
+            write_snapshot(path + '.new', apply_changes(places, dict((item.zpid, item) for item in items)))
+        self.assertEqual(['1', '2'], sorted(self.session.zpids))
+        self.session.zpids = []
+        with Snapshot(path + '.new') as places:
+            self.assertEqual('01/03/2016', places.get('1').zestimate.amount_last_updated)
+            revaluer = Revaluer(self.api, 'key')
+            self.assertEqual([], list(revaluer.refresh(places, today=today)))
+        self.assertEqual([], self.session.zpids)
+        self.assertEqual(0, revaluer.stats['due'])
+
+
+if __name__ == '__main__':
+    unittest.main()
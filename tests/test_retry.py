@@ -0,0 +1,204 @@
+import threading
+import time
+import unittest
+
+import requests
+
+try:
+    import asyncio
+    from zillow.aio import AsyncValuationApi
+except (ImportError, SyntaxError):
+    AsyncValuationApi = None
+
+from zillow import RetryPolicy, ValuationApi, ZillowError
+
+from .helpers import FakeResponse, FakeSession, read_fixture
+from .stub_server import StubServer
+
+
+UNAVAILABLE = (b'<?xml version="1.0" encoding="utf-8"?><Zestimate:zestimate><message>'
+               b'<text>Error: the web services are currently unavailable</text><code>3</code>'
+               b'</message></Zestimate:zestimate>')
+INVALID_KEY = UNAVAILABLE.replace(b'<code>3</code>', b'<code>2</code>')
+
+
+class ScriptedSession(FakeSession):
+    """Answers with the scripted responses in turn, then with the fixtures. An exception in the script is raised."""
+    def __init__(self, script, delays=None):
+        FakeSession.__init__(self)
+        self.script = list(script)
+        self.delays = list(delays or [])
+        self.timeouts = []
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.urls.append(url)
+            self.timeouts.append(kwargs.get('timeout'))
+            delay = self.delays.pop(0) if self.delays else 0
+            step = self.script.pop(0) if self.script else None
+        if delay:
+            time.sleep(delay)
+        if isinstance(step, Exception):
+            raise step
+        if step is not None:
+            return step
+        endpoint = url.split('?')[0].rsplit('/', 1)[-1]
+        return FakeResponse(read_fixture(self.fixtures[endpoint]))
+
+
+def no_jitter(**kwargs):
+    kwargs.setdefault('backoff', 0.001)
+    return RetryPolicy(jitter=False, **kwargs)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_retryable(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.retryable(ZillowError({'message': 'reset', 'network': True})))
+        self.assertTrue(policy.retryable(ZillowError({'message': 'unavailable', 'code': 3})))
+        self.assertTrue(policy.retryable(ZillowError({'message': 'bad gateway', 'http_status': 502})))
+        self.assertFalse(policy.retryable(ZillowError({'message': 'invalid key', 'code': 2})))
+        self.assertFalse(policy.retryable(ZillowError({'message': 'not found', 'http_status': 404})))
+        self.assertFalse(policy.retryable(ZillowError('plain')))
+        self.assertFalse(RetryPolicy(network=False).retryable(ZillowError({'message': 'x', 'network': True})))
+
+    def test_backoff_is_capped_and_jittered(self):
+        policy = RetryPolicy(backoff=1, multiplier=2, max_backoff=5, jitter=False)
+        self.assertEqual([1, 2, 4, 5, 5], [policy.delay(n) for n in range(1, 6)])
+        jittered = RetryPolicy(backoff=1, multiplier=2, max_backoff=5, random=lambda: 0.5)
+        self.assertEqual(2, jittered.delay(3))
+
+    def test_attempts_and_deadline(self):
+        now = [0.0]
+        policy = RetryPolicy(attempts=3, backoff=1, jitter=False, deadline=2.5, clock=lambda: now[0])
+        error = ZillowError({'message': 'unavailable', 'code': 3})
+        started = policy.start()
+        self.assertEqual(1, policy.next_delay(1, error, started))
+        now[0] = 1.0
+        # a 2 second wait would end past the deadline
+        self.assertIsNone(policy.next_delay(2, error, started))
+        self.assertIsNone(policy.next_delay(3, error, started))
+        self.assertEqual({'retries': 1, 'gave_up': 1, 'hedges': 0, 'hedge_wins': 0}, policy.stats())
+        self.assertEqual(1.5, policy.timeout(started, None))
+        self.assertEqual(1.0, policy.timeout(started, 1.0))
+
+    def test_hedge_delay_from_percentile(self):
+        policy = RetryPolicy(hedge_percentile=90, hedge_window=100, hedge_min_samples=10, hedge_after=0.5)
+        self.assertEqual(0.5, policy.hedge_delay())
+        for n in range(200):
+            policy.observe(n / 1000.0)
+        # only the last 100 response times count
+        self.assertAlmostEqual(0.19, policy.hedge_delay())
+
+
+class TestValuationApiRetry(unittest.TestCase):
+
+    def test_retries_transient_failures(self):
+        session = ScriptedSession([requests.ConnectionError('reset'), FakeResponse(b'oops', status_code=503),
+                                   FakeResponse(UNAVAILABLE)])
+        with ValuationApi(session=session, cache=None, retry=no_jitter(attempts=4)) as api:
+            infos = []
+            api.add_hook(after=infos.append)
+            place = api.GetZEstimate('key', '2100641621')
+        self.assertEqual('2100641621', place.zpid)
+        self.assertEqual(4, len(session.urls))
+        self.assertEqual(4, infos[0].attempts)
+        self.assertEqual(3, api.retry.stats()['retries'])
+
+    def test_gives_up_after_attempts(self):
+        session = ScriptedSession([FakeResponse(b'oops', status_code=503)] * 5)
+        with ValuationApi(session=session, cache=None, retry=no_jitter(attempts=2)) as api:
+            with self.assertRaises(ZillowError) as context:
+                api.GetZEstimate('key', '2100641621')
+        self.assertEqual(503, context.exception.message['http_status'])
+        self.assertEqual(2, len(session.urls))
+
+    def test_does_not_retry_permanent_errors(self):
+        session = ScriptedSession([FakeResponse(INVALID_KEY)])
+        with ValuationApi(session=session, cache=None, retry=no_jitter()) as api:
+            with self.assertRaises(ZillowError) as context:
+                api.GetZEstimate('key', '2100641621')
+        self.assertEqual(2, context.exception.message['code'])
+        self.assertEqual(1, len(session.urls))
+
+    def test_deadline_limits_retries_and_timeouts(self):
+        session = ScriptedSession([requests.Timeout('slow')] * 10)
+        policy = RetryPolicy(attempts=10, backoff=0.05, jitter=False, multiplier=1, deadline=0.12)
+        with ValuationApi(session=session, cache=None, timeout=5, retry=policy) as api:
+            self.assertRaises(ZillowError, api.GetZEstimate, 'key', '2100641621')
+        self.assertTrue(2 <= len(session.urls) <= 3)
+        self.assertTrue(all(timeout <= 0.12 for timeout in session.timeouts))
+        self.assertEqual(1, policy.stats()['gave_up'])
+
+    def test_hedged_request_answers_first(self):
+        session = ScriptedSession([], delays=[0.5])
+        policy = RetryPolicy(hedge_after=0.02)
+        with ValuationApi(session=session, cache=None, retry=policy) as api:
+            infos = []
+            api.add_hook(after=infos.append)
+            start = time.time()
+            place = api.GetZEstimate('key', '2100641621')
+            elapsed = time.time() - start
+        self.assertEqual('2100641621', place.zpid)
+        self.assertTrue(elapsed < 0.4)
+        self.assertEqual(2, len(session.urls))
+        self.assertEqual({'retries': 0, 'gave_up': 0, 'hedges': 1, 'hedge_wins': 1}, policy.stats())
+        self.assertEqual((2, 'network', 'ok'), (infos[0].attempts, infos[0].source, infos[0].status))
+
+    def test_no_hedge_for_fast_requests(self):
+        session = ScriptedSession([])
+        policy = RetryPolicy(hedge_after=0.5)
+        with ValuationApi(session=session, cache=None, retry=policy) as api:
+            api.GetZEstimate('key', '2100641621')
+        self.assertEqual(1, len(session.urls))
+        self.assertEqual(0, policy.stats()['hedges'])
+
+    def test_network_errors_are_flagged(self):
+        session = ScriptedSession([requests.ConnectionError('reset')])
+        with ValuationApi(session=session, cache=None) as api:
+            with self.assertRaises(ZillowError) as context:
+                api.GetZEstimate('key', '2100641621')
+        self.assertTrue(context.exception.message['network'])
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@unittest.skipIf(AsyncValuationApi is None, 'aiohttp is not installed')
+class TestAsyncRetry(unittest.TestCase):
+
+    def lookup(self, server, policy):
+        async def call():
+            async with AsyncValuationApi(cache=None, retry=policy) as api:
+                api.base_url = server.base_url
+                return await api.GetZEstimate('key', '2100641621')
+        return run(call())
+
+    def test_retries_server_errors(self):
+        with StubServer() as server:
+            server.script = [(503, 0), (502, 0)]
+            place = self.lookup(server, no_jitter())
+            self.assertEqual(3, len(server.paths))
+        self.assertEqual('2100641621', place.zpid)
+
+    def test_hedged_request_answers_first(self):
+        policy = RetryPolicy(hedge_after=0.02)
+        with StubServer() as server:
+            server.script = [(200, 0.5)]
+            start = time.time()
+            place = self.lookup(server, policy)
+            self.assertTrue(time.time() - start < 0.4)
+            self.assertEqual(2, len(server.paths))
+        self.assertEqual('2100641621', place.zpid)
+        self.assertEqual(1, policy.stats()['hedge_wins'])
+
+
+if __name__ == '__main__':
+    unittest.main()
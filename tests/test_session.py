@@ -0,0 +1,42 @@
+import unittest
+
+import requests
+
+from zillow import ValuationApi, ZillowError
+
+from .helpers import FakeSession
+
+
+class TestSession(unittest.TestCase):
+
+    def test_endpoints_use_injected_session(self):
+        session = FakeSession()
+        api = ValuationApi(session=session)
+
+        api.GetSearchResults('key', '3400 Pacific Ave', '90292')
+        api.GetZEstimate('key', '2100641621')
+        api.GetDeepSearchResults('key', '3400 Pacific Ave', '90292')
+        api.GetComps('key', '2100641621', count=10)
+        api.GetDeepComps('key', '2100641621', count=10)
+
+        self.assertEqual(5, len(session.urls))
+
+    def test_injected_session_is_left_open(self):
+        session = FakeSession()
+        with ValuationApi(session=session) as api:
+            api.GetZEstimate('key', '2100641621')
+        self.assertFalse(session.closed)
+        self.assertRaises(ZillowError, api.GetZEstimate, 'key', '2100641621', use_cache=False)
+
+    def test_pool_settings(self):
+        api = ValuationApi(pool_connections=3, pool_maxsize=7, keep_alive=False)
+        adapter = api.session.get_adapter('https://www.zillow.com/webservice')
+        self.assertEqual(7, adapter._pool_maxsize)
+        self.assertEqual(3, adapter._pool_connections)
+        api.close()
+        self.assertIsNone(api.session)
+
+    def test_custom_adapter(self):
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=2)
+        with ValuationApi(adapter=adapter) as api:
+            self.assertIs(adapter, api.session.get_adapter('https://www.zillow.com'))
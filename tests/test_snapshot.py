@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from zillow import ZillowError
+from zillow.parser import SEARCH_RESULT, parse_comps, parse_place
+from zillow.snapshot import Snapshot, SnapshotWriter, write_snapshot
+
+from .helpers import read_fixture
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'places.snap')
+        comps = parse_comps(read_fixture('get_deep_comps.xml'))
+        deep = parse_place(read_fixture('get_deep_search_results.xml'), SEARCH_RESULT, has_extended_data=True)
+        self.places = [comps['principal']] + comps['comps'] + [deep]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.places), write_snapshot(self.path, self.places))
+        for lazy in (True, False):
+            with Snapshot(self.path, lazy=lazy) as snapshot:
+                self.assertEqual(len(self.places), len(snapshot))
+                loaded = list(snapshot)
+                self.assertEqual([p.get_dict() for p in self.places], [p.get_dict() for p in loaded])
+                self.assertEqual([p.has_extended_data for p in self.places],
+                                 [p.has_extended_data for p in loaded])
+
+    def test_random_access(self):
+        write_snapshot(self.path, self.places)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(self.places[3].zpid, snapshot[3].zpid)
+            self.assertEqual(self.places[-1].zpid, snapshot[-1].zpid)
+            self.assertEqual([p.zpid for p in self.places[2:5]], [p.zpid for p in snapshot[2:5]])
+            wanted = self.places[5]
+            self.assertEqual(wanted.get_dict(), snapshot.get(wanted.zpid).get_dict())
+            self.assertIn(int(wanted.zpid), snapshot)
+            self.assertIsNone(snapshot.get('1'))
+            self.assertRaises(IndexError, snapshot.__getitem__, len(self.places))
+
+    def test_lazy_records(self):
+        write_snapshot(self.path, self.places)
+        with Snapshot(self.path) as snapshot:
+            place = snapshot[0]
+            self.assertTrue(place.lazy)
+            self.assertIsNone(place._zestimate)
+            self.assertEqual(self.places[0].zestimate.amount, place.zestimate.amount)
+            self.assertIsNone(place._full_address)
+            # strings of low-cardinality fields are shared between places
+            self.assertIs(snapshot[1].full_address.state, snapshot[2].full_address.state)
+
+    def test_streaming_write(self):
+        with SnapshotWriter(self.path) as writer:
+            for i in range(100):
+                place = self.places[i % len(self.places)].copy()
+                place.zpid = str(1000 + i)
+                writer.write(place)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(100, len(snapshot))
+            self.assertEqual(57, snapshot.position('1057'))
+
+    def test_not_a_snapshot(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot at all, just some bytes ' * 4)
+        self.assertRaises(ZillowError, Snapshot, self.path)
+        open(self.path, 'wb').close()
+        self.assertRaises(ZillowError, Snapshot, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
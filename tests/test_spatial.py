@@ -0,0 +1,104 @@
+import random
+import unittest
+
+from zillow import Place
+from zillow.parser import parse_comps
+from zillow.spatial import SpatialIndex, distance_km
+
+from .helpers import read_fixture
+
+
+def make_place(zpid, lat, lon, amount=None, bedrooms=None):
+    place = Place()
+    place.zpid = str(zpid)
+    place.full_address.latitude = lat
+    place.full_address.longitude = lon
+    place.zestimate.amount = amount
+    place.extended_data.bedrooms = bedrooms
+    return place
+
+
+def brute_force(places, lat, lon):
+    return sorted((distance_km(lat, lon, p.full_address.latitude, p.full_address.longitude), p.zpid)
+                  for p in places)
+
+
+class TestDistance(unittest.TestCase):
+
+    def test_known_distance(self):
+        # Los Angeles to New York
+        self.assertAlmostEqual(3936, distance_km(34.0522, -118.2437, 40.7128, -74.0060), delta=5)
+        self.assertEqual(0, distance_km(33.9, -118.4, 33.9, -118.4))
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.places = [make_place(i, 33.9 + rng.uniform(-0.2, 0.2), -118.4 + rng.uniform(-0.2, 0.2),
+                                  amount=rng.randrange(200000, 3000000), bedrooms=rng.randrange(1, 6))
+                       for i in range(500)]
+        self.index = SpatialIndex(self.places, cell_km=2.0)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in ((33.9, -118.4), (33.75, -118.2), (34.3, -118.9)):
+            expected = brute_force(self.places, lat, lon)[:7]
+            found = self.index.nearest(lat, lon, k=7)
+            self.assertEqual([zpid for _, zpid in expected], [p.zpid for _, p in found])
+            self.assertAlmostEqual(expected[-1][0], found[-1][0])
+
+    def test_within_matches_brute_force(self):
+        expected = [zpid for d, zpid in brute_force(self.places, 33.95, -118.35) if d <= 3.5]
+        found = self.index.within(33.95, -118.35, 3.5)
+        self.assertEqual(expected, [p.zpid for _, p in found])
+
+    def test_filters(self):
+        found = self.index.nearest(33.9, -118.4, k=20, min_amount=1000000, max_amount=2000000, min_bedrooms=3)
+        self.assertEqual(20, len(found))
+        for _, place in found:
+            self.assertTrue(1000000 <= place.zestimate.amount <= 2000000)
+            self.assertTrue(place.extended_data.bedrooms >= 3)
+        kept = [p for p in self.places
+                if 1000000 <= p.zestimate.amount <= 2000000 and p.extended_data.bedrooms >= 3]
+        self.assertEqual([zpid for _, zpid in brute_force(kept, 33.9, -118.4)[:20]],
+                         [p.zpid for _, p in found])
+        odd = self.index.within(33.9, -118.4, 5, where=lambda p: int(p.zpid) % 2)
+        self.assertTrue(odd)
+        self.assertTrue(all(int(p.zpid) % 2 for _, p in odd))
+
+    def test_fewer_places_than_k_and_max_km(self):
+        self.assertEqual(500, len(self.index.nearest(33.9, -118.4, k=1000)))
+        found = self.index.nearest(33.9, -118.4, k=1000, max_km=2)
+        self.assertEqual(len(self.index.within(33.9, -118.4, 2)), len(found))
+        self.assertEqual([], SpatialIndex().nearest(33.9, -118.4))
+
+    def test_incremental_insert_and_replace(self):
+        index = SpatialIndex()
+        self.assertTrue(index.insert(make_place(1, 33.9, -118.4)))
+        self.assertFalse(index.insert(Place()))
+        index.insert(make_place(2, 40.7, -74.0))
+        self.assertEqual('1', index.nearest(34.0, -118.0, k=1)[0][1].zpid)
+        # the same zpid, moved
+        index.insert(make_place(1, 40.71, -74.01))
+        self.assertEqual(2, len(index))
+        self.assertEqual([], index.within(33.9, -118.4, 50))
+        self.assertTrue(index.remove('2'))
+        self.assertFalse(index.remove('2'))
+        self.assertNotIn('2', index)
+        self.assertEqual(['1'], [p.zpid for _, p in index.nearest(34.0, -118.0, k=5)])
+
+    def test_near_comps(self):
+        comps = parse_comps(read_fixture('get_deep_comps.xml'))
+        places = [comps['principal']] + comps['comps']
+        index = SpatialIndex(places)
+        principal = comps['principal']
+        found = index.near(principal, k=3)
+        self.assertEqual(3, len(found))
+        self.assertNotIn(principal.zpid, [p.zpid for _, p in found])
+        lat, lon = principal.full_address.latitude, principal.full_address.longitude
+        expected = [zpid for _, zpid in brute_force(places, lat, lon) if zpid != principal.zpid][:3]
+        self.assertEqual(expected, [p.zpid for _, p in found])
+
+
+if __name__ == '__main__':
+    unittest.main()
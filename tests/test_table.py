@@ -0,0 +1,94 @@
+import unittest
+
+from zillow import ZillowError
+from zillow.parser import parse_comps
+from zillow.table import PlaceTable
+
+from .helpers import read_fixture
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class TestPlaceTable(unittest.TestCase):
+
+    def setUp(self):
+        comps = parse_comps(read_fixture('get_comps.xml'))
+        self.places = [comps['principal']] + comps['comps']
+        self.table = PlaceTable(self.places)
+
+    def test_columns_hold_place_values(self):
+        self.assertEqual(11, len(self.table))
+        self.assertEqual([int(p.zpid) for p in self.places], self.table['zpid'].to_list())
+        self.assertEqual([p.zestimate.amount for p in self.places], self.table['amount'].to_list())
+        self.assertEqual(self.places[3].full_address.zipcode, self.table.row(3)['zipcode'])
+
+    def test_missing_values(self):
+        column = self.table['finished_sqft']
+        self.assertEqual(0, column.count())
+        self.assertEqual([None] * 11, column.to_list())
+        self.assertIsNone(column.median())
+        self.assertEqual(11, len(self.table.filter(column.isnull())))
+        self.assertEqual(0, len(self.table.filter(column > 0)))
+
+    def test_filters_and_aggregations(self):
+        amounts = sorted(p.zestimate.amount for p in self.places if p.zestimate.amount is not None)
+        self.assertEqual(len(amounts), self.table['amount'].count())
+        median = self.table['amount'].median()
+        self.assertTrue(amounts[0] <= median <= amounts[-1])
+
+        cheap = self.table['amount'] < median
+        expensive = self.table['amount'] >= median
+        self.assertEqual(len([a for a in amounts if a < median]), len(self.table.filter(cheap)))
+        self.assertEqual(len(amounts), len(self.table.filter(cheap | expensive)))
+        # a missing amount is neither cheap nor expensive, so it is in ~cheap only
+        self.assertEqual(11 - len(self.table.filter(cheap)), len(self.table.filter(~cheap)))
+
+        spread = self.table['valuation_range_high'] - self.table['valuation_range_low']
+        self.assertEqual(self.places[0].zestimate.valuation_range_high - self.places[0].zestimate.valuation_range_low,
+                         spread[0])
+
+    def test_column_operations(self):
+        table = PlaceTable(self.places[:3], columns=['zpid', 'amount', 'finished_sqft', 'zipcode'])
+        table['amount'].values[1] = 0
+        ratio = table['zpid'] / table['amount']
+        self.assertEqual([float(self.places[0].zpid) / self.places[0].zestimate.amount, None,
+                          float(self.places[2].zpid) / self.places[2].zestimate.amount], ratio.to_list())
+        self.assertEqual([None] * 3, (table['amount'] / table['finished_sqft']).to_list())
+        self.assertEqual([1, 0, 0], list(table['zpid'].isin([int(self.places[0].zpid)])))
+        zipcode = self.places[0].full_address.zipcode
+        self.assertEqual([p.full_address.zipcode == zipcode for p in self.places[:3]],
+                         [bool(b) for b in table['zipcode'] == zipcode])
+        self.assertEqual([0, 1, 1], list(~(table['zpid'] == int(self.places[0].zpid))))
+
+    def test_group_by(self):
+        groups = self.table.group_by('zipcode')
+        sizes = groups.size()
+        self.assertEqual(11, sum(sizes.values()))
+        medians = groups.agg('amount', 'median')
+        for zipcode, table in groups:
+            self.assertEqual(table['amount'].median(), medians[zipcode])
+        self.assertRaises(ZillowError, groups.agg, 'amount', 'mode')
+
+    def test_add_response(self):
+        table = PlaceTable(columns=['zpid', 'amount'])
+        self.assertEqual(11, table.add_response(read_fixture('get_deep_comps.xml')))
+        self.assertEqual(1, table.add_response(read_fixture('get_zestimate.xml')))
+        self.assertEqual(['zpid', 'amount'], table.columns)
+        self.assertRaises(ZillowError, PlaceTable, columns=['nope'])
+        # a property without its address is a ZillowError, as for parse_place
+        malformed = (b'<Zestimate:zestimate xmlns:Zestimate="http://www.zillow.com/static/xsd/Zestimate.xsd">'
+                     b'<response><zpid>1</zpid></response></Zestimate:zestimate>')
+        self.assertRaises(ZillowError, table.add_response, malformed)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_to_numpy_shares_memory(self):
+        amounts = self.table['amount'].to_numpy()
+        self.assertEqual(numpy.int64, amounts.dtype)
+        self.table['amount'].values[0] = 1
+        self.assertEqual(1, amounts[0])
+
+        sqft = self.table['finished_sqft'].to_numpy(masked=True)
+        self.assertTrue(sqft.mask.all())
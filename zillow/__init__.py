@@ -2,25 +2,58 @@
 
 from __future__ import absolute_import
 
-import os as _os
-import pkg_resources as _pkg_resources
+import sys as _sys
 
+from ._version import __version__  # noqa: F401
 from .error import ZillowError  # noqa: F401
 from .place import Place  # noqa: F401
-from .api import ValuationApi  # noqa: F401
 
 
 __author__ = 'python-zillow@googlegroups.com'
 
 
-try:
-    _dist = _pkg_resources.get_distribution('python-' + __package__)
-    if not _os.path.abspath(__file__).startswith(
-            _os.path.join(_dist.location, __package__)):
-        # Manually raise the exception if there is a distribution but
-        # it's installed from elsewhere.
-        raise _pkg_resources.DistributionNotFound
-except _pkg_resources.DistributionNotFound:
-    __version__ = 'development'
-else:
-    __version__ = _dist.version
+# Names imported from submodules on first use, so that ``import zillow``
+# does not pay for requests, sqlite3 or the thread pool until they are needed.
+_LAZY = {
+    'AddressIndex': 'address',
+    'BatchResult': 'batch',
+    'PersistentCache': 'cache',
+    'ResponseCache': 'cache',
+    'SQLiteCache': 'cache',
+    'RecordStore': 'cache',
+    'QuotaScheduler': 'quota',
+    'KeyPool': 'keys',
+    'RetryPolicy': 'retry',
+    'ValuationApi': 'api',
+}
+
+_SUBMODULES = frozenset(['address', 'aio', 'api', 'batch', 'cache', 'cli', 'crawl', 'error', 'flight', 'keys',
+                         'metrics', 'parser', 'pipeline', 'place', 'quota', 'refresh', 'retry', 'snapshot',
+                         'spatial', 'table'])
+
+
+def __getattr__(name):
+    import importlib
+    if name in _LAZY:
+        value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
+
+
+if _sys.version_info < (3, 7):
+    # no module __getattr__ (PEP 562) before python 3.7
+    from .address import AddressIndex  # noqa: F401
+    from .batch import BatchResult  # noqa: F401
+    from .cache import PersistentCache, RecordStore, ResponseCache, SQLiteCache  # noqa: F401
+    from .quota import QuotaScheduler  # noqa: F401
+    from .keys import KeyPool  # noqa: F401
+    from .retry import RetryPolicy  # noqa: F401
+    from .api import ValuationApi  # noqa: F401
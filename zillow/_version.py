@@ -0,0 +1,3 @@
+"""The version of python-zillow, kept apart so it can be read without importing anything."""
+
+__version__ = '0.3.0'
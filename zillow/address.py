@@ -0,0 +1,255 @@
+"""
+Canonical forms of the addresses GetSearchResults and GetDeepSearchResults
+are asked about.
+
+The web service resolves "3400 Pacific Ave., Marina Del Rey, CA" and
+"3400 PACIFIC AVENUE" to the same property, but as request parameters they
+are different calls and different cache entries. canonical_address and
+canonical_citystatezip write addresses the way the USPS does: upper case,
+without punctuation, with standard street suffix, directional and unit
+abbreviations, and a 5 digit ZIP code.
+
+An AddressIndex remembers the zpid each canonical address resolved to,
+along with the address the web service gave back for it, so that any known
+spelling of an address can be answered by zpid without searching again.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+
+# USPS Publication 28 street suffix abbreviations.
+STREET_SUFFIXES = {
+    'ALLEY': 'ALY', 'ANNEX': 'ANX', 'ARCADE': 'ARC', 'AVENUE': 'AVE', 'AV': 'AVE', 'AVEN': 'AVE',
+    'AVENU': 'AVE', 'AVN': 'AVE', 'AVNUE': 'AVE', 'BAYOU': 'BYU', 'BEACH': 'BCH', 'BEND': 'BND',
+    'BLUFF': 'BLF', 'BOULEVARD': 'BLVD', 'BOUL': 'BLVD', 'BOULV': 'BLVD', 'BRANCH': 'BR', 'BRIDGE': 'BRG',
+    'BROOK': 'BRK', 'BYPASS': 'BYP', 'CANYON': 'CYN', 'CAUSEWAY': 'CSWY', 'CENTER': 'CTR', 'CENTRE': 'CTR',
+    'CIRCLE': 'CIR', 'CIRC': 'CIR', 'CLIFF': 'CLF', 'CLUB': 'CLB', 'COMMON': 'CMN', 'CORNER': 'COR',
+    'COURSE': 'CRSE', 'COURT': 'CT', 'COVE': 'CV', 'CREEK': 'CRK', 'CRESCENT': 'CRES', 'CROSSING': 'XING',
+    'DRIVE': 'DR', 'DRV': 'DR', 'ESTATE': 'EST', 'ESTATES': 'ESTS', 'EXPRESSWAY': 'EXPY', 'EXTENSION': 'EXT',
+    'FALLS': 'FLS', 'FERRY': 'FRY', 'FIELD': 'FLD', 'FIELDS': 'FLDS', 'FOREST': 'FRST', 'FORK': 'FRK',
+    'FORT': 'FT', 'FREEWAY': 'FWY', 'GARDEN': 'GDN', 'GARDENS': 'GDNS', 'GATEWAY': 'GTWY', 'GLEN': 'GLN',
+    'GREEN': 'GRN', 'GROVE': 'GRV', 'HARBOR': 'HBR', 'HAVEN': 'HVN', 'HEIGHTS': 'HTS', 'HIGHWAY': 'HWY',
+    'HILL': 'HL', 'HILLS': 'HLS', 'HOLLOW': 'HOLW', 'ISLAND': 'IS', 'JUNCTION': 'JCT', 'KNOLL': 'KNL',
+    'LAKE': 'LK', 'LAKES': 'LKS', 'LANDING': 'LNDG', 'LANE': 'LN', 'LOOP': 'LOOP', 'MANOR': 'MNR',
+    'MEADOW': 'MDW', 'MEADOWS': 'MDWS', 'MILL': 'ML', 'MOUNT': 'MT', 'MOUNTAIN': 'MTN', 'ORCHARD': 'ORCH',
+    'PARKWAY': 'PKWY', 'PARKWY': 'PKWY', 'PKY': 'PKWY', 'PASSAGE': 'PSGE', 'PIKE': 'PIKE', 'PINE': 'PNE',
+    'PINES': 'PNES', 'PLACE': 'PL', 'PLAIN': 'PLN', 'PLAINS': 'PLNS', 'PLAZA': 'PLZ', 'POINT': 'PT',
+    'POINTE': 'PT', 'PORT': 'PRT', 'PRAIRIE': 'PR', 'RANCH': 'RNCH', 'RIDGE': 'RDG', 'RIVER': 'RIV',
+    'ROAD': 'RD', 'ROUTE': 'RTE', 'SHORE': 'SHR', 'SHORES': 'SHRS', 'SKYWAY': 'SKWY', 'SPRING': 'SPG',
+    'SPRINGS': 'SPGS', 'SQUARE': 'SQ', 'STATION': 'STA', 'STREET': 'ST', 'STR': 'ST', 'SUMMIT': 'SMT',
+    'TERRACE': 'TER', 'TRACE': 'TRCE', 'TRAIL': 'TRL', 'TURNPIKE': 'TPKE', 'VALLEY': 'VLY', 'VIEW': 'VW',
+    'VILLAGE': 'VLG', 'VISTA': 'VIS', 'WALK': 'WALK', 'WAY': 'WAY', 'WELLS': 'WLS',
+}
+
+# Directionals, with the abbreviations as well so that 'AVENUE NW' and 'AVENUE NORTHWEST' are read alike.
+DIRECTIONALS = {
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+    'N': 'N', 'S': 'S', 'E': 'E', 'W': 'W', 'NE': 'NE', 'NW': 'NW', 'SE': 'SE', 'SW': 'SW',
+}
+
+# Secondary unit designators. The spellings of a residential unit number all become APT. A designator
+# is only read as one just before the unit number that ends the street line, since several of them
+# (SPACE, FLOOR, LOT) are also street names.
+UNITS = {
+    'APARTMENT': 'APT', 'APT': 'APT', 'UNIT': 'APT', '#': 'APT',
+    'SUITE': 'STE', 'STE': 'STE', 'BUILDING': 'BLDG', 'BLDG': 'BLDG', 'FLOOR': 'FL', 'FL': 'FL',
+    'ROOM': 'RM', 'RM': 'RM', 'SPACE': 'SPC', 'SPC': 'SPC', 'LOT': 'LOT', 'PENTHOUSE': 'PH', 'PH': 'PH',
+    'TRAILER': 'TRLR', 'TRLR': 'TRLR',
+}
+
+STATES = {
+    'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR', 'CALIFORNIA': 'CA', 'COLORADO': 'CO',
+    'CONNECTICUT': 'CT', 'DELAWARE': 'DE', 'DISTRICT OF COLUMBIA': 'DC', 'FLORIDA': 'FL', 'GEORGIA': 'GA',
+    'HAWAII': 'HI', 'IDAHO': 'ID', 'ILLINOIS': 'IL', 'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS',
+    'KENTUCKY': 'KY', 'LOUISIANA': 'LA', 'MAINE': 'ME', 'MARYLAND': 'MD', 'MASSACHUSETTS': 'MA',
+    'MICHIGAN': 'MI', 'MINNESOTA': 'MN', 'MISSISSIPPI': 'MS', 'MISSOURI': 'MO', 'MONTANA': 'MT',
+    'NEBRASKA': 'NE', 'NEVADA': 'NV', 'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM',
+    'NEW YORK': 'NY', 'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK',
+    'OREGON': 'OR', 'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC', 'SOUTH DAKOTA': 'SD',
+    'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT', 'VERMONT': 'VT', 'VIRGINIA': 'VA', 'WASHINGTON': 'WA',
+    'WEST VIRGINIA': 'WV', 'WISCONSIN': 'WI', 'WYOMING': 'WY',
+}
+
+# Punctuation other than the # of a unit, the - of a house number range and the / of a fraction.
+_PUNCTUATION = re.compile(r"[^\w\s#/.-]+")
+# Abbreviation periods, dropped so that N.E. becomes NE; a decimal point stays.
+_PERIODS = re.compile(r"(?<!\d)\.|\.(?!\d)")
+_HASH = re.compile(r'#\s*')
+# A unit number: anything with a digit, or a single letter.
+_UNIT_NUMBER = re.compile(r'^(?:[\w/-]*\d[\w/-]*|[A-Z])$')
+_ZIP = re.compile(r'\b(\d{5})(?:-?\d{4})?\b')
+_STATE = re.compile(r'\b(%s)$' % '|'.join(sorted(STATES, key=len, reverse=True)))
+
+
+def _Words(text):
+    return _PERIODS.sub('', _PUNCTUATION.sub(' ', _HASH.sub(' # ', text.upper()))).split()
+
+
+def _Unit(words):
+    """
+    :return: Where the unit designator and number that end a street line's words start, or len(words) if there are none.
+    """
+    end = len(words)
+    if end < 3 or not _UNIT_NUMBER.match(words[-1]):
+        return end
+    start = end - 2
+    if words[start] == '#' and words[start - 1] in UNITS:
+        # 'APT # 201'
+        start -= 1
+    # the house number and a street name come first
+    if start < 2 or words[start] not in UNITS:
+        return end
+    return start
+
+
+def _Street(words):
+    """Abbreviate the suffix, directionals and unit designator of a street line's words."""
+    unit = _Unit(words)
+    street, rest = words[:unit], words[unit:]
+    if rest:
+        rest[0] = UNITS[rest[0]]
+        if len(rest) > 2 and rest[1] == '#':
+            del rest[1]
+    # a directional is part of the name in '7 North St'
+    if len(street) > 3 and street[1] in DIRECTIONALS:
+        street[1] = DIRECTIONALS[street[1]]
+    if len(street) > 2 and street[-1] in DIRECTIONALS:
+        street[-1] = DIRECTIONALS[street[-1]]
+        suffix = len(street) - 2
+    else:
+        suffix = len(street) - 1
+    # the first word is the house number, and a street needs a name before its suffix
+    if suffix > 1 and street[suffix] in STREET_SUFFIXES:
+        street[suffix] = STREET_SUFFIXES[street[suffix]]
+    return street + rest
+
+
+def canonical_address(address):
+    """
+    :param address: A street address, e.g. '3400 Pacific Avenue, Apt. #201'.
+    :return: Its canonical form, e.g. '3400 PACIFIC AVE APT 201'. Anything after a comma that is not a unit, such as a city, is kept as is but for case and punctuation.
+    """
+    if address is None:
+        return None
+    lines = str(address).split(',')
+    words = _Words(lines[0])
+    extra = []
+    for line in lines[1:]:
+        more = _Words(line)
+        # a unit on a line of its own, as in '3400 Pacific Ave, Apt 201'
+        if not extra and more and _Unit(words + more) == len(words):
+            words.extend(more)
+        else:
+            extra.extend(more)
+    return ' '.join(_Street(words) + extra)
+
+
+def canonical_citystatezip(citystatezip):
+    """
+    :param citystatezip: A city and state, a ZIP code or both, e.g. 'Marina del Rey, California 90292-1234'.
+    :return: Its canonical form: the 5 digit ZIP code when there is one, else the city and the state abbreviation, e.g. 'MARINA DEL REY CA'.
+    """
+    if citystatezip is None:
+        return None
+    text = str(citystatezip)
+    match = _ZIP.search(text)
+    if match is not None:
+        return match.group(1)
+    text = ' '.join(_Words(text))
+    return _STATE.sub(lambda m: STATES[m.group(1)], text)
+
+
+class AddressIndex(object):
+    """
+    The zpids that addresses resolved to, learned from search results.
+    Example usage:
+        >>> index = zillow.AddressIndex()
+        >>> api = zillow.ValuationApi(address_index=index)
+        >>> api.GetSearchResults(key, '3400 Pacific Ave., Marina Del Rey, CA', '90292')
+        >>> api.GetSearchResults(key, '3400 PACIFIC AVENUE APT 201', '90292')  # a GetZEstimate for the known zpid
+
+    Each search that finds a property teaches the index the address asked
+    about, and the street address the web service gave back with both its
+    ZIP code and its city and state.
+    """
+    def __init__(self, max_entries=1000000):
+        """
+        :param max_entries: The maximum number of addresses remembered; the least recently used go first.
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (address, citystatezip) -> zpid
+        self._zpids = OrderedDict()
+        # zpid -> the first (address, citystatezip) it was found with, and the number of addresses leading to it
+        self._addresses = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._zpids)
+
+    def lookup(self, address, citystatezip):
+        """
+        :return: The zpid an address resolved to before, or None.
+        """
+        key = (canonical_address(address), canonical_citystatezip(citystatezip))
+        with self._lock:
+            zpid = self._zpids.pop(key, None)
+            if zpid is None:
+                self.misses += 1
+                return None
+            self._zpids[key] = zpid
+            self.hits += 1
+            return zpid
+
+    def address(self, zpid):
+        """
+        :return: The canonical (address, citystatezip) a zpid was first found with, or None.
+        """
+        return self._addresses.get(str(zpid))
+
+    def learn(self, address, citystatezip, place):
+        """
+        Remember the zpid of a place found by searching for an address.
+        :return: The place.
+        """
+        zpid = place.zpid
+        if zpid is None:
+            return place
+        searched = (canonical_address(address), canonical_citystatezip(citystatezip))
+        keys = [searched]
+        found = place.full_address
+        if found.street:
+            street = canonical_address(found.street)
+            if found.zipcode:
+                keys.append((street, canonical_citystatezip(found.zipcode)))
+            if found.city and found.state:
+                keys.append((street, canonical_citystatezip('%s %s' % (found.city, found.state))))
+        with self._lock:
+            self._addresses.setdefault(zpid, searched)
+            # the searched address is often the one given back
+            for key in OrderedDict.fromkeys(keys):
+                old = self._zpids.pop(key, None)
+                self._zpids[key] = zpid
+                if old != zpid:
+                    self._Forget(old)
+                    self._counts[zpid] = self._counts.get(zpid, 0) + 1
+            while len(self._zpids) > self.max_entries:
+                self._Forget(self._zpids.popitem(last=False)[1])
+        return place
+
+    def _Forget(self, zpid):
+        """Drop a zpid's first address once no address leads to it."""
+        if zpid is None:
+            return
+        self._counts[zpid] -= 1
+        if not self._counts[zpid]:
+            del self._counts[zpid]
+            del self._addresses[zpid]
+
+    def stats(self):
+        return {'entries': len(self._zpids), 'hits': self.hits, 'misses': self.misses}
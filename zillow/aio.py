@@ -0,0 +1,382 @@
+"""An asyncio interface to the Zillow API. Requires aiohttp."""
+
+import asyncio
+from collections import deque
+
+import aiohttp
+
+from .api import ValuationApi, _AddStatus, _CopyResult
+from .batch import BatchResult
+from .cache import make_key
+from .error import ZillowError
+from .flight import SingleFlight
+from .metrics import _clock
+from .quota import PRIORITY_BATCH
+
+# How often, in seconds, a coroutine waiting for quota checks its place in the queue.
+QUOTA_POLL_INTERVAL = 0.05
+
+
+async def acquire_quota(scheduler, zws_id, priority, timeout=None):
+    """
+    The asyncio counterpart of QuotaScheduler.acquire.
+    """
+    if timeout is None:
+        timeout = scheduler.timeout
+    loop = asyncio.get_event_loop()
+    deadline = None if timeout is None else loop.time() + timeout
+    ticket = None
+    try:
+        while True:
+            ticket, wait = scheduler.try_acquire(zws_id, priority, ticket)
+            if wait == 0:
+                return
+            wait = QUOTA_POLL_INTERVAL if wait is None else min(wait, QUOTA_POLL_INTERVAL)
+            if deadline is not None:
+                left = deadline - loop.time()
+                if left <= 0:
+                    scheduler.release(ticket, timed_out=True)
+                    raise ZillowError({'message': "Timed out waiting for quota on %s" % zws_id, 'throttled': True})
+                wait = min(wait, left)
+            await asyncio.sleep(wait)
+    except asyncio.CancelledError:
+        if ticket is not None:
+            scheduler.release(ticket)
+        raise
+
+
+class AsyncSingleFlight(SingleFlight):
+    """
+    The asyncio counterpart of SingleFlight: do awaits call, and
+    coroutines asking for the same key meanwhile await its outcome.
+    """
+    async def do(self, key, call, copy=None):
+        while True:
+            flight, leader = self._Join(key, asyncio.Event)
+            if leader:
+                break
+            await flight.done.wait()
+            if not flight.interrupted:
+                return self._Outcome(flight, copy)
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            self._Land(key, flight, interrupted=True)
+            flight.done.set()
+            raise
+        except Exception as e:
+            self._Land(key, flight, error=e)
+            flight.done.set()
+            raise
+        except BaseException:
+            self._Land(key, flight, interrupted=True)
+            flight.done.set()
+            raise
+        waiters = self._Land(key, flight, result)
+        flight.done.set()
+        if waiters and copy is not None:
+            return copy(result)
+        return result
+
+
+async def _Outcome(task, index, item):
+    try:
+        return BatchResult(index, item, result=await task)
+    except ZillowError as e:
+        return BatchResult(index, item, error=e)
+
+
+async def run_batch(call, items, window, ordered=True):
+    """
+    The asyncio counterpart of zillow.batch.run_batch: await call(item) for
+    every item, with at most window calls in flight.
+    :return: An async iterator of BatchResult.
+    """
+    items = enumerate(items)
+    pending = {}
+    order = deque()
+
+    def submit():
+        for index, item in items:
+            task = asyncio.ensure_future(call(item))
+            pending[task] = (index, item)
+            if ordered:
+                order.append(task)
+            return True
+        return False
+
+    try:
+        while len(pending) < window and submit():
+            pass
+        if ordered:
+            while order:
+                task = order.popleft()
+                index, item = pending.pop(task)
+                outcome = await _Outcome(task, index, item)
+                submit()
+                yield outcome
+        else:
+            while pending:
+                done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, item = pending.pop(task)
+                    submit()
+                    yield await _Outcome(task, index, item)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class AsyncValuationApi(ValuationApi):
+    """
+    An asyncio version of ValuationApi. Every endpoint method is a coroutine
+    and returns the same results as its ValuationApi counterpart.
+    Example usage:
+        >>> async with zillow.aio.AsyncValuationApi(concurrency=20) as api:
+        ...     places = await asyncio.gather(*[api.GetZEstimate(key, zpid) for zpid in zpids])
+    """
+    def __init__(self, session=None, limit=100, limit_per_host=10, concurrency=10,
+                 keepalive_timeout=15, timeout=None, cache=True, persistent_cache=None, parser=None,
+                 lazy_places=False, scheduler=None, key_pool=None, coalesce=True, retry=None,
+                 canonical_addresses=True, address_index=None, record_store=None):
+        """
+        :param session: An aiohttp.ClientSession to send requests with. When given, the Api does not close it.
+        :param limit: The maximum number of open connections in the Api's own pool.
+        :param limit_per_host: The maximum number of open connections to one host.
+        :param concurrency: The maximum number of requests in flight at once.
+        :param keepalive_timeout: Seconds an idle connection is kept open.
+        :param timeout: Seconds a request may take in total, including waiting for a connection.
+        :param cache: A ResponseCache, True for the default one (1 minute, 1024 entries) or None for no caching.
+        :param persistent_cache: A PersistentCache to keep raw responses in between runs. It is not closed with the Api.
+        :param parser: The parser backend, as for ValuationApi.
+        :param lazy_places: Return lazy Places, as for ValuationApi.
+        :param scheduler: A QuotaScheduler every call to the web service waits on.
+        :param key_pool: A KeyPool to pick the zws-id of each call from, as for ValuationApi.
+        :param coalesce: Let identical calls made at the same time share one request and parse (default: True).
+        :param retry: A RetryPolicy, as for ValuationApi.
+        :param canonical_addresses: Send addresses in their canonical form, as for ValuationApi (default: True).
+        :param address_index: An AddressIndex, as for ValuationApi.
+        :param record_store: A RecordStore, as for ValuationApi.
+        """
+        self._Configure(timeout, cache, persistent_cache, parser, lazy_places, scheduler, key_pool, coalesce,
+                        retry, canonical_addresses, address_index, record_store=record_store)
+        self._session = session
+        self._owns_session = session is None
+        self._closed = False
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+        self._concurrency = concurrency
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError('Use "async with" with AsyncValuationApi')
+
+    async def close(self):
+        """
+        Release pooled connections. A session passed in by the caller is left open.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._closed = True
+
+    def _Session(self):
+        # aiohttp sessions and asyncio semaphores belong to the running loop,
+        # so they are made on first use rather than in __init__.
+        if self._closed:
+            raise ZillowError({'message': "The Api has been closed."})
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit,
+                                             limit_per_host=self._limit_per_host,
+                                             keepalive_timeout=self._keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        return self._session
+
+    async def GetSearchResultsBatch(self, zws_id, addresses, retnzestimate=False, workers=None, ordered=True,
+                                    priority=PRIORITY_BATCH):
+        """
+        Run GetSearchResults for many addresses at once.
+        :param workers: The number of lookups started ahead of the results read (default: the Api's concurrency).
+        :return: An async iterator of BatchResult, as for ValuationApi.GetSearchResultsBatch.
+        """
+        async def call(address):
+            return await self.GetSearchResults(zws_id, address[0], address[1], retnzestimate, priority=priority)
+
+        async for outcome in run_batch(call, addresses, workers or self._concurrency, ordered):
+            yield outcome
+
+    async def GetZEstimateBatch(self, zws_id, zpids, retnzestimate=False, workers=None, ordered=True,
+                                priority=PRIORITY_BATCH):
+        """
+        Run GetZEstimate for many zpids at once.
+        :param workers: The number of lookups started ahead of the results read (default: the Api's concurrency).
+        :return: An async iterator of BatchResult, as for ValuationApi.GetZEstimateBatch.
+        """
+        async def call(zpid):
+            return await self.GetZEstimate(zws_id, zpid, retnzestimate, priority=priority)
+
+        async for outcome in run_batch(call, zpids, workers or self._concurrency, ordered):
+            yield outcome
+
+    async def _Call(self, endpoint, url, parameters, parse, use_cache=True, refresh_cache=False, priority=None):
+        if not self._hooks:
+            return await self._Resolve(endpoint, url, parameters, parse, use_cache, refresh_cache, priority)
+        info = self._hooks.start(endpoint, parameters, priority)
+        try:
+            result = await self._Resolve(endpoint, url, parameters, parse, use_cache, refresh_cache, priority, info)
+        except ZillowError as e:
+            self._hooks.finish(info, e)
+            raise
+        self._hooks.finish(info)
+        return result
+
+    async def _Resolve(self, endpoint, url, parameters, parse, use_cache, refresh_cache, priority, info=None):
+        key, result, body = self._Lookup(endpoint, parameters, use_cache, refresh_cache)
+        if result is not None:
+            if info is not None:
+                info.source = 'memory'
+            return result
+        if body is not None:
+            # not side-loaded: the body was fetched at some earlier time the disk cache does not keep
+            if info is not None:
+                info.source = 'disk'
+            return self._Store(key, self._Parse(parse, body, info), body, False)
+        if self._record_store is not None:
+            result = self._SideLoaded(endpoint, parameters, use_cache, refresh_cache)
+            if result is not None:
+                if info is not None:
+                    info.source = 'records'
+                return result
+            parse = self._SideLoading(parse, endpoint)
+
+        def fetch():
+            return self._Fetch(key, url, parameters, parse, priority, info)
+
+        if self._flights is None:
+            return await fetch()
+        return await self._flights.do(key or make_key(endpoint, parameters), fetch, copy=_CopyResult)
+
+    async def _Fetch(self, key, url, parameters, parse, priority, info=None):
+        retry = self._retry
+        started = None if retry is None else retry.start()
+        attempt = 0
+        while True:
+            zws_id = self._CheckOut(parameters)
+            attempt += 1
+            try:
+                body, result = await self._Attempt(url, parameters, parse, zws_id, priority, info, started)
+            except ZillowError as e:
+                if self._CheckIn(zws_id, e):
+                    continue
+                delay = None if retry is None else retry.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._CheckIn(zws_id)
+                raise
+            self._CheckIn(zws_id)
+            return self._Store(key, result, body, True)
+
+    async def _Attempt(self, url, parameters, parse, zws_id, priority, info, started):
+        if info is not None:
+            info.attempts += 1
+        retry = self._retry
+        if retry is None:
+            return await self._Request(url, parameters, parse, zws_id, priority, info)
+        timeout = retry.timeout(started, self._timeout)
+        delay = retry.hedge_delay() if retry.hedging else None
+        if delay is None:
+            return await self._Request(url, parameters, parse, zws_id, priority, info, timeout)
+        first = asyncio.ensure_future(self._Request(url, parameters, parse, zws_id, priority, info, timeout))
+        second = None
+        try:
+            done, _ = await asyncio.wait([first], timeout=delay)
+            if done:
+                return first.result()
+            if info is not None:
+                info.attempts += 1
+            second = asyncio.ensure_future(self._Request(url, parameters, parse, zws_id, priority, None, timeout))
+            pending = [first, second]
+            while True:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                answered = [task for task in (first, second) if task in done and task.exception() is None]
+                pending = [task for task in pending if not task.done()]
+                if answered or not pending:
+                    # the first to succeed, or the first request's error if both failed
+                    winner = answered[0] if answered else first
+                    break
+        finally:
+            # the slower request is not needed: cancelling it frees its connection
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+        won = winner is second and second.exception() is None
+        retry.hedged(won)
+        if won and info is not None:
+            info.source = 'network'
+        return winner.result()
+
+    async def _Request(self, url, parameters, parse, zws_id, priority, info, timeout=None):
+        if self._scheduler is not None:
+            start = _clock()
+            try:
+                await acquire_quota(self._scheduler, zws_id, self._Priority(priority))
+            finally:
+                if info is not None:
+                    info.add('queue', _clock() - start)
+        start = _clock()
+        status, body = await self._RequestBody(url, parameters, info, timeout)
+        if self._retry is not None:
+            self._retry.observe(_clock() - start)
+        try:
+            return body, self._Parse(parse, body, info)
+        except ZillowError as e:
+            _AddStatus(e, status)
+            raise
+
+    @staticmethod
+    def _NewFlights():
+        return AsyncSingleFlight()
+
+    async def _RequestBody(self, url, parameters, info=None, timeout=None):
+        """
+        GET a url, holding a concurrency slot only while the request runs.
+        :param info: A RequestInfo to record the url and network timings in, or None.
+        :param timeout: The request timeout, if not the Api's.
+        :return: A tuple of the HTTP status and the response body as bytes.
+        """
+        session = self._Session()
+        start = _clock()
+        url = self._BuildUrl(url, extra_params=parameters)
+        built = _clock()
+        timeout = aiohttp.ClientTimeout(total=self._timeout if timeout is None else timeout)
+        async with self._semaphore:
+            try:
+                # Leaving the response context releases the connection, even
+                # when the task is cancelled part way through the body.
+                async with session.get(url, headers=self._request_headers, timeout=timeout) as resp:
+                    body = await resp.read()
+                    if info is not None:
+                        info.source = 'network'
+                        info.http_status = resp.status
+                        info.bytes = len(body)
+                    return resp.status, body
+            except asyncio.TimeoutError:
+                raise ZillowError({'message': "Timed out requesting %s" % url, 'network': True})
+            except aiohttp.ClientError as e:
+                raise ZillowError({'message': str(e), 'network': True})
+            finally:
+                if info is not None:
+                    info.add('url', built - start)
+                    info.add('network', _clock() - built)
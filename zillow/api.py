@@ -1,5 +1,5 @@
-import requests
-import xmltodict
+import threading
+import time
 
 try:
     # python 3
@@ -8,14 +8,56 @@ except ImportError:
     from urlparse import urlparse, urlunparse
     from urllib import urlencode
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .address import canonical_address, canonical_citystatezip
+from .batch import run_batch
+from .cache import ResponseCache, make_key
 from .error import ZillowError
+from .flight import SingleFlight
+from .metrics import Hooks, _clock
+from .parser import SEARCH_RESULT, ZESTIMATE, get_backend, parse_comps, parse_place
 from .place import Place
+from .quota import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+# The endpoints a RecordStore answers: those that look a property up by zpid alone.
+SIDELOAD_ENDPOINTS = ('GetZEstimate',)
+
+
+def _Requests():
+    """
+    Import requests on first use: it is slow to import, and an Api given its
+    own session may never need it.
+    """
+    import requests
+    import requests.adapters
+    return requests
+
+
+def _CopyResult(result):
+    """Copy a parsed result so callers can't change what is cached."""
+    if isinstance(result, Place):
+        return result.copy()
+    return {
+        'principal': result['principal'].copy(),
+        'comps': [place.copy() for place in result['comps']],
+    }
+
+
+def _AddStatus(error, status):
+    """Note the HTTP status of a response that could not be parsed on its ZillowError."""
+    if status is not None and status != 200 and error.args and isinstance(error.message, dict):
+        error.message.setdefault('http_status', status)
 
 
 class ValuationApi(object):
     """
     A python interface into the Zillow API
-    By default, the Api caches results for 1 minute.
+    By default, the Api caches results for 1 minute. Pass a zillow.ResponseCache
+    to tune the cache, or cache=None to turn it off.
     Example usage:
       To create an instance of the zillow.ValuationApi class:
         >>> import zillow
@@ -24,15 +66,157 @@ class ValuationApi(object):
 
     All available methods include:
         >>> data = api.GetSearchResults("<your key here>", "<your address here>", "<your zip here>")
+
+    HTTP connections are pooled and kept alive between calls. Close the Api
+    when done with it, or use it as a context manager:
+        >>> with zillow.ValuationApi(pool_maxsize=20) as api:
+        ...     data = api.GetZEstimate("<your key here>", "<zpid>")
     """
-    def __init__(self):
-        self.base_url = "https://www.zillow.com/webservice"
-        self._input_encoding = None
-        self._request_headers=None
+    def __init__(self, session=None, adapter=None, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, keep_alive=True,
+                 timeout=None, cache=True, persistent_cache=None, parser=None,
+                 lazy_places=False, scheduler=None, key_pool=None, coalesce=True, retry=None,
+                 canonical_addresses=True, address_index=None, parse_pool=None, record_store=None):
+        """
+        :param session: A requests.Session (or compatible object) to send requests with. When given, the Api does not close it.
+        :param adapter: A transport adapter mounted on the Api's own session for http:// and https://. Ignored if session is given.
+        :param pool_connections: The number of per-host connection pools to keep.
+        :param pool_maxsize: The maximum number of connections kept alive per host.
+        :param pool_block: Block when all connections to a host are in use, instead of opening a throw-away connection.
+        :param keep_alive: Keep connections open between requests (default: True).
+        :param timeout: Seconds to wait for the server, passed to requests as is.
+        :param cache: A ResponseCache, True for the default one (1 minute, 1024 entries) or None for no caching.
+        :param persistent_cache: A PersistentCache, such as a SQLiteCache, to keep raw responses in between runs. It is not closed with the Api.
+        :param parser: The parser backend: 'expat', 'etree', 'lxml', 'xmltodict' or None for the fastest installed one.
+        :param lazy_places: Return lazy Places, which decode each record on first access (default: false).
+        :param scheduler: A QuotaScheduler every call to the web service waits on.
+        :param key_pool: A KeyPool to pick the zws-id of each call from, in place of the zws_id passed in.
+        :param coalesce: Let identical calls made at the same time share one request and parse (default: True).
+        :param retry: A RetryPolicy for retrying and hedging requests, or None to make one try.
+        :param canonical_addresses: Send addresses in their canonical form, so that spellings of the same address share cache entries and calls (default: True).
+        :param address_index: An AddressIndex to learn the zpids of searched addresses in, and to answer searches for known addresses by zpid.
+        :param parse_pool: A zillow.pipeline.ParsePool to parse responses in, off the threads that fetch them. Its places are never lazy.
+        :param record_store: A RecordStore to load every place parsed into, and to answer GetZEstimate from while its record is fresh.
+        """
+        self._Configure(timeout, cache, persistent_cache, parser, lazy_places, scheduler, key_pool, coalesce,
+                        retry, canonical_addresses, address_index, parse_pool, record_store)
         self.__auth = None
-        self._timeout = None
 
-    def GetSearchResults(self, zws_id, address, citystatezip, retnzestimate=False):
+        if session is None:
+            session = self._NewSession(adapter, pool_connections, pool_maxsize, pool_block)
+            self._owns_session = True
+        else:
+            self._owns_session = False
+        if not keep_alive:
+            self._request_headers = {'Connection': 'close'}
+        self._session = session
+
+    def _Configure(self, timeout, cache, persistent_cache, parser=None, lazy_places=False, scheduler=None,
+                   key_pool=None, coalesce=True, retry=None, canonical_addresses=True, address_index=None,
+                   parse_pool=None, record_store=None):
+        """Set up the options shared with AsyncValuationApi."""
+        self.base_url = "https://www.zillow.com/webservice"
+        self._input_encoding = None
+        self._request_headers = None
+        self._timeout = timeout
+
+        if cache is True:
+            cache = ResponseCache()
+        elif cache is False:
+            cache = None
+        self._cache = cache
+        self._persistent_cache = persistent_cache
+        self._parser = get_backend(parser)
+        self._lazy_places = lazy_places
+        self._scheduler = scheduler
+        self._key_pool = key_pool
+        self._flights = self._NewFlights() if coalesce else None
+        self._retry = retry
+        self._canonical_addresses = canonical_addresses
+        self._address_index = address_index
+        self._parse_pool = parse_pool
+        self._record_store = record_store
+        self._hooks = Hooks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def cache(self):
+        """The ResponseCache results are kept in, or None."""
+        return self._cache
+
+    @property
+    def persistent_cache(self):
+        """The PersistentCache raw responses are kept in, or None."""
+        return self._persistent_cache
+
+    @property
+    def parser(self):
+        """The parser backend responses are read with."""
+        return self._parser
+
+    @property
+    def scheduler(self):
+        """The QuotaScheduler calls wait on, or None."""
+        return self._scheduler
+
+    @property
+    def key_pool(self):
+        """The KeyPool calls take their zws-id from, or None."""
+        return self._key_pool
+
+    @property
+    def flights(self):
+        """The SingleFlight identical calls are coalesced with, or None. Its stats count the calls coalesced."""
+        return self._flights
+
+    @property
+    def retry(self):
+        """The RetryPolicy failed and slow requests are retried and hedged by, or None."""
+        return self._retry
+
+    @property
+    def address_index(self):
+        """The AddressIndex searched addresses are learned in, or None."""
+        return self._address_index
+
+    @property
+    def record_store(self):
+        """The RecordStore parsed places are side-loaded into, or None."""
+        return self._record_store
+
+    @property
+    def session(self):
+        """The session requests are sent through."""
+        return self._session
+
+    def close(self):
+        """
+        Release pooled connections. A session passed in by the caller is left open.
+        """
+        if self._owns_session and self._session is not None:
+            self._session.close()
+        self._session = None
+
+    @staticmethod
+    def _NewSession(adapter, pool_connections, pool_maxsize, pool_block):
+        requests = _Requests()
+        session = requests.Session()
+        if adapter is None:
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=pool_connections,
+                pool_maxsize=pool_maxsize,
+                pool_block=pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def GetSearchResults(self, zws_id, address, citystatezip, retnzestimate=False,
+                         use_cache=True, refresh_cache=False, priority=None):
         """
         The GetSearchResults API finds a property for a specified address.
         The content returned contains the address for the property or properties as well as the Zillow Property ID (ZPID) and current Zestimate.
@@ -42,32 +226,31 @@ class ValuationApi(object):
         :param address: The address of the property to search. This string should be URL encoded.
         :param citystatezip: The city+state combination and/or ZIP code for which to search. This string should be URL encoded. Note that giving both city and state is required. Using just one will not work.
         :param retnzestimat: Return Rent Zestimate information if available (boolean true/false, default: false)
+        :param use_cache: Look the result up in the Api's cache (default: true)
+        :param refresh_cache: Fetch the result even if it is cached, and cache the new one (default: false)
+        :param priority: The scheduling priority of the call when the Api has a QuotaScheduler (default: zillow.quota.PRIORITY_INTERACTIVE)
         :return:
         """
         url = '%s/GetSearchResults.htm' % (self.base_url)
         parameters = {'zws-id': zws_id}
         if address and citystatezip:
-            parameters['address'] = address
-            parameters['citystatezip'] = citystatezip
+            parameters['address'], parameters['citystatezip'] = self._Address(address, citystatezip)
         else:
             raise ZillowError({'message': "Specify address and citystatezip."})
         if retnzestimate:
             parameters['retnzestimate'] = 'true'
 
-        resp = self._RequestUrl(url, 'GET', data=parameters)
-        data = resp.content.decode('utf-8')
-
-        xmltodict_data = xmltodict.parse(data)
-
-        place = Place()
-        try:
-            place.set_data(xmltodict_data.get('SearchResults:searchresults', None)['response']['results']['result'])
-        except:
-            raise ZillowError({'message': "Zillow did not return a valid response: %s" % data})
-
-        return place
-
-    def GetZEstimate(self, zws_id, zpid, retnzestimate=False):
+        parse = self._ParseSearchResults
+        if self._address_index is not None:
+            zpid = self._address_index.lookup(address, citystatezip)
+            if zpid is not None:
+                # the same property data, keyed by zpid
+                return self.GetZEstimate(zws_id, zpid, retnzestimate, use_cache, refresh_cache, priority)
+            parse = self._Learning(parse, address, citystatezip)
+        return self._Call('GetSearchResults', url, parameters, parse, use_cache, refresh_cache, priority)
+
+    def GetZEstimate(self, zws_id, zpid, retnzestimate=False,
+                     use_cache=True, refresh_cache=False, priority=None):
         """
         The GetZestimate API will only surface properties for which a Zestimate exists.
         If a request is made for a property that has no Zestimate, an error code is returned.
@@ -77,6 +260,9 @@ class ValuationApi(object):
         :zws_id: The Zillow Web Service Identifier.
         :param zpid: The address of the property to search. This string should be URL encoded.
         :param retnzestimate: Return Rent Zestimate information if available (boolean true/false, default: false)
+        :param use_cache: Look the result up in the Api's cache (default: true)
+        :param refresh_cache: Fetch the result even if it is cached, and cache the new one (default: false)
+        :param priority: The scheduling priority of the call when the Api has a QuotaScheduler (default: zillow.quota.PRIORITY_INTERACTIVE)
         :return:
         """
         url = '%s/GetZestimate.htm' % (self.base_url)
@@ -85,20 +271,11 @@ class ValuationApi(object):
         if retnzestimate:
             parameters['retnzestimate'] = 'true'
 
-        resp = self._RequestUrl(url, 'GET', data=parameters)
-        data = resp.content.decode('utf-8')
-
-        xmltodict_data = xmltodict.parse(data)
+        return self._Call('GetZEstimate', url, parameters, self._ParseZEstimate,
+                          use_cache, refresh_cache, priority)
 
-        place = Place()
-        try:
-            place.set_data(xmltodict_data.get('Zestimate:zestimate', None)['response'])
-        except:
-            raise ZillowError({'message': "Zillow did not return a valid response: %s" % data})
-
-        return place
-
-    def GetDeepSearchResults(self, zws_id, address, citystatezip, retnzestimate=False):
+    def GetDeepSearchResults(self, zws_id, address, citystatezip, retnzestimate=False,
+                             use_cache=True, refresh_cache=False, priority=None):
         """
         The GetDeepSearchResults API finds a property for a specified address.
         The result set returned contains the full address(s), zpid and Zestimate data that is provided by the GetSearchResults API.
@@ -107,33 +284,33 @@ class ValuationApi(object):
         :param address: The address of the property to search. This string should be URL encoded.
         :param citystatezip: The city+state combination and/or ZIP code for which to search.
         :param retnzestimate: Return Rent Zestimate information if available (boolean true/false, default: false)
+        :param use_cache: Look the result up in the Api's cache (default: true)
+        :param refresh_cache: Fetch the result even if it is cached, and cache the new one (default: false)
+        :param priority: The scheduling priority of the call when the Api has a QuotaScheduler (default: zillow.quota.PRIORITY_INTERACTIVE)
         :return:
 
         Example:
         """
         url = '%s/GetDeepSearchResults.htm' % (self.base_url)
-        parameters = {'zws-id': zws_id,
-                      'address': address,
-                      'citystatezip': citystatezip
-                      }
+        parameters = {'zws-id': zws_id}
+        parameters['address'], parameters['citystatezip'] = self._Address(address, citystatezip)
 
         if retnzestimate:
             parameters['retnzestimate'] = 'true'
 
-        resp = self._RequestUrl(url, 'GET', data=parameters)
-        data = resp.content.decode('utf-8')
-
-        xmltodict_data = xmltodict.parse(data)
-
-        place = Place(has_extended_data=True)
-        try:
-            place.set_data(xmltodict_data.get('SearchResults:searchresults', None)['response']['results']['result'])
-        except:
-            raise ZillowError({'message': "Zillow did not return a valid response: %s" % data})
-
-        return place
+        parse = self._ParseDeepSearchResults
+        if self._address_index is not None:
+            zpid = self._address_index.lookup(address, citystatezip)
+            first = None if zpid is None else self._address_index.address(zpid)
+            if first is not None:
+                # search with the spelling the zpid was first found with, to share its cache entry
+                parameters['address'], parameters['citystatezip'] = first
+            else:
+                parse = self._Learning(parse, address, citystatezip)
+        return self._Call('GetDeepSearchResults', url, parameters, parse, use_cache, refresh_cache, priority)
 
-    def GetDeepComps(self, zws_id, zpid, count=10, rentzestimate=False):
+    def GetDeepComps(self, zws_id, zpid, count=10, rentzestimate=False,
+                     use_cache=True, refresh_cache=False, priority=None):
         """
         The GetDeepComps API returns a list of comparable recent sales for a specified property.
         The result set returned contains the address, Zillow property identifier, and Zestimate for the comparable
@@ -143,6 +320,9 @@ class ValuationApi(object):
         :param zpid: The address of the property to search. This string should be URL encoded.
         :param count: The number of comparable recent sales to obtain (integer between 1 and 25)
         :param rentzestimate: Return Rent Zestimate information if available (boolean true/false, default: false)
+        :param use_cache: Look the result up in the Api's cache (default: true)
+        :param refresh_cache: Fetch the result even if it is cached, and cache the new one (default: false)
+        :param priority: The scheduling priority of the call when the Api has a QuotaScheduler (default: zillow.quota.PRIORITY_INTERACTIVE)
         :return:
         Example
             >>> data = api.GetDeepComps("<your key here>", 2100641621, 10)
@@ -154,41 +334,11 @@ class ValuationApi(object):
         if rentzestimate:
             parameters['rentzestimate'] = 'true'
 
-        resp = self._RequestUrl(url, 'GET', data=parameters)
-        data = resp.content.decode('utf-8')
-
-        # transform the data to an dict-like object
-        xmltodict_data = xmltodict.parse(data)
-
-        # get the principal property data
-        principal_place = Place()
-        principal_data = xmltodict_data.get('Comps:comps')['response']['properties']['principal']
-
-        try:
-            principal_place.set_data(principal_data)
-        except:
-            raise ZillowError({'message': 'No principal data found: %s' % data})
+        return self._Call('GetDeepComps', url, parameters, self._ParseComps,
+                          use_cache, refresh_cache, priority)
 
-        # get the comps property_data
-        comps = xmltodict_data.get('Comps:comps')['response']['properties']['comparables']['comp']
-
-        comp_places = []
-        for datum in comps:
-            place = Place()
-            try:
-                place.set_data(datum)
-                comp_places.append(place)
-            except:
-                raise ZillowError({'message': 'No valid comp data found %s' % datum})
-
-        output = {
-            'principal': principal_place,
-            'comps': comp_places
-        }
-
-        return output
-
-    def GetComps(self, zws_id, zpid, count=25, rentzestimate=False):
+    def GetComps(self, zws_id, zpid, count=25, rentzestimate=False,
+                 use_cache=True, refresh_cache=False, priority=None):
         """
         The GetComps API returns a list of comparable recent sales for a specified property.
         The result set returned contains the address, Zillow property identifier,
@@ -196,6 +346,9 @@ class ValuationApi(object):
         :param zpid: The address of the property to search. This string should be URL encoded.
         :param count: The number of comparable recent sales to obtain (integer between 1 and 25)
         :param retnzestimate: Return Rent Zestimate information if available (boolean true/false, default: false)
+        :param use_cache: Look the result up in the Api's cache (default: true)
+        :param refresh_cache: Fetch the result even if it is cached, and cache the new one (default: false)
+        :param priority: The scheduling priority of the call when the Api has a QuotaScheduler (default: zillow.quota.PRIORITY_INTERACTIVE)
         :return:
         """
         url = '%s/GetComps.htm' % (self.base_url)
@@ -205,58 +358,386 @@ class ValuationApi(object):
         if rentzestimate:
             parameters['rentzestimate'] = 'true'
 
-        resp = self._RequestUrl(url, 'GET', data=parameters)
-        data = resp.content.decode('utf-8')
+        return self._Call('GetComps', url, parameters, self._ParseComps,
+                          use_cache, refresh_cache, priority)
+
+    def GetSearchResultsBatch(self, zws_id, addresses, retnzestimate=False, workers=8, ordered=True,
+                              priority=PRIORITY_BATCH):
+        """
+        Run GetSearchResults for many addresses at once on a pool of threads.
+        A failed lookup is reported in its BatchResult rather than ending the batch.
+        Give the Api a pool_maxsize of at least workers so every thread gets a connection.
+        :param zws_id: The Zillow Web Service Identifier.
+        :param addresses: An iterable of (address, citystatezip) pairs.
+        :param retnzestimate: Return Rent Zestimate information if available (boolean true/false, default: false)
+        :param workers: The number of lookups to run at once.
+        :param ordered: Yield results in input order (default). Otherwise yield them as they complete.
+        :param priority: The scheduling priority of the calls when the Api has a QuotaScheduler (default: zillow.quota.PRIORITY_BATCH)
+        :return: An iterator of BatchResult, whose item is the (address, citystatezip) pair and whose result is a Place.
+        Example
+            >>> for r in api.GetSearchResultsBatch("<your key here>", [("<address>", "<zip>"), ...]):
+            ...     print(r.item, r.result.zpid if r.ok else r.error)
+        """
+        def call(address):
+            return self.GetSearchResults(zws_id, address[0], address[1], retnzestimate, priority=priority)
+
+        return run_batch(call, addresses, workers=workers, ordered=ordered)
+
+    def GetZEstimateBatch(self, zws_id, zpids, retnzestimate=False, workers=8, ordered=True,
+                          priority=PRIORITY_BATCH):
+        """
+        Run GetZEstimate for many zpids at once on a pool of threads.
+        A failed lookup is reported in its BatchResult rather than ending the batch.
+        Give the Api a pool_maxsize of at least workers so every thread gets a connection.
+        :param zws_id: The Zillow Web Service Identifier.
+        :param zpids: An iterable of zpids.
+        :param retnzestimate: Return Rent Zestimate information if available (boolean true/false, default: false)
+        :param workers: The number of lookups to run at once.
+        :param ordered: Yield results in input order (default). Otherwise yield them as they complete.
+        :param priority: The scheduling priority of the calls when the Api has a QuotaScheduler (default: zillow.quota.PRIORITY_BATCH)
+        :return: An iterator of BatchResult, whose item is the zpid and whose result is a Place.
+        """
+        def call(zpid):
+            return self.GetZEstimate(zws_id, zpid, retnzestimate, priority=priority)
+
+        return run_batch(call, zpids, workers=workers, ordered=ordered)
+
+    def _Address(self, address, citystatezip):
+        """
+        :return: The address and citystatezip to send: their canonical forms unless the Api sends them as given.
+        """
+        if not self._canonical_addresses:
+            return address, citystatezip
+        return canonical_address(address), canonical_citystatezip(citystatezip)
+
+    def _SideLoaded(self, endpoint, parameters, use_cache, refresh_cache):
+        """
+        :return: A copy of the record store's place for a GetZEstimate call, or None if it has no fresh one.
+        """
+        if endpoint not in SIDELOAD_ENDPOINTS or not use_cache or refresh_cache or 'retnzestimate' in parameters:
+            return None
+        return self._record_store.get(parameters['zpid'])
+
+    def _SideLoading(self, parse, endpoint):
+        """
+        :return: A parse function that also loads the places it returns into the record store.
+        """
+        store = self._record_store
+
+        def load(content, timings=None):
+            result = parse(content, timings)
+            store.load(result, endpoint)
+            return result
 
-        # transform the data to an dict-like object
-        xmltodict_data = xmltodict.parse(data)
+        return load
 
-        # get the principal property data
-        principal_place = Place()
-        principal_data = xmltodict_data.get('Comps:comps')['response']['properties']['principal']
+    def _Learning(self, parse, address, citystatezip):
+        """
+        :return: A parse function that also teaches the address index the zpid the address resolved to.
+        """
+        index = self._address_index
 
+        def learn(content, timings=None):
+            return index.learn(address, citystatezip, parse(content, timings))
+
+        return learn
+
+    def _Call(self, endpoint, url, parameters, parse, use_cache=True, refresh_cache=False, priority=None):
+        """
+        Fetch and parse a response, going through the in-memory cache and
+        then the persistent cache when there are any.
+        :param endpoint: The name of the API method, used in the cache key.
+        :param url: The web service location.
+        :param parameters: The request parameters.
+        :param parse: Turns the response body into the method's result.
+        :param priority: The scheduling priority of the call.
+        :return: The parsed result. Cached results are returned as copies.
+        """
+        if not self._hooks:
+            return self._Resolve(endpoint, url, parameters, parse, use_cache, refresh_cache, priority)
+        info = self._hooks.start(endpoint, parameters, priority)
         try:
-            principal_place.set_data(principal_data)
-        except:
-            raise ZillowError({'message': 'No principal data found: %s' % data})
+            result = self._Resolve(endpoint, url, parameters, parse, use_cache, refresh_cache, priority, info)
+        except ZillowError as e:
+            self._hooks.finish(info, e)
+            raise
+        self._hooks.finish(info)
+        return result
+
+    def _Resolve(self, endpoint, url, parameters, parse, use_cache, refresh_cache, priority, info=None):
+        key, result, body = self._Lookup(endpoint, parameters, use_cache, refresh_cache)
+        if result is not None:
+            if info is not None:
+                info.source = 'memory'
+            return result
+        if body is not None:
+            # not side-loaded: the body was fetched at some earlier time the disk cache does not keep
+            if info is not None:
+                info.source = 'disk'
+            return self._Store(key, self._Parse(parse, body, info), body, False)
+        if self._record_store is not None:
+            result = self._SideLoaded(endpoint, parameters, use_cache, refresh_cache)
+            if result is not None:
+                if info is not None:
+                    info.source = 'records'
+                return result
+            parse = self._SideLoading(parse, endpoint)
+
+        def fetch():
+            return self._Fetch(key, url, parameters, parse, priority, info)
+
+        if self._flights is None:
+            return fetch()
+        return self._flights.do(key or make_key(endpoint, parameters), fetch, copy=_CopyResult)
+
+    def _Fetch(self, key, url, parameters, parse, priority, info=None):
+        """
+        Request, parse and cache a response, retrying with another key when
+        the key pool has one, and after a transient failure when the Api has
+        a RetryPolicy.
+        """
+        retry = self._retry
+        started = None if retry is None else retry.start()
+        attempt = 0
+        while True:
+            zws_id = self._CheckOut(parameters)
+            attempt += 1
+            try:
+                body, result = self._Attempt(url, parameters, parse, zws_id, priority, info, started)
+            except ZillowError as e:
+                if self._CheckIn(zws_id, e):
+                    continue
+                delay = None if retry is None else retry.next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._CheckIn(zws_id)
+                raise
+            self._CheckIn(zws_id)
+            return self._Store(key, result, body, True)
+
+    def _Attempt(self, url, parameters, parse, zws_id, priority, info, started):
+        """
+        Make one try at a call: a request, or two when the first is slow and the RetryPolicy hedges.
+        :return: A tuple of the response body and the parsed result.
+        """
+        if info is not None:
+            info.attempts += 1
+        retry = self._retry
+        if retry is None:
+            return self._Request(url, parameters, parse, zws_id, priority, info)
+        timeout = retry.timeout(started, self._timeout)
+        delay = retry.hedge_delay() if retry.hedging else None
+        if delay is None:
+            return self._Request(url, parameters, parse, zws_id, priority, info, timeout)
+        return self._Hedge(delay, lambda hedge: self._Request(url, parameters, parse, zws_id, priority,
+                                                              None if hedge else info, timeout), info)
+
+    def _Request(self, url, parameters, parse, zws_id, priority, info, timeout=None):
+        """
+        Send one request and parse its response.
+        :return: A tuple of the response body and the parsed result.
+        """
+        if self._scheduler is not None:
+            self._Queue(zws_id, priority, info)
+        start = _clock()
+        response = self._RequestUrl(url, 'GET', data=parameters, info=info, timeout=timeout)
+        if self._retry is not None:
+            self._retry.observe(_clock() - start)
+        body = response.content
+        status = getattr(response, 'status_code', None)
+        if info is not None:
+            info.source = 'network'
+            info.http_status = status
+            info.bytes = len(body)
+        try:
+            return body, self._Parse(parse, body, info)
+        except ZillowError as e:
+            _AddStatus(e, status)
+            raise
 
-        # get the comps property_data
-        comps = xmltodict_data.get('Comps:comps')['response']['properties']['comparables']['comp']
+    def _Hedge(self, delay, request, info):
+        """
+        Run request(False) and, if it has not answered in delay seconds,
+        request(True) alongside it.
+        :return: What the first to succeed returns. If both fail, the first's error is raised.
+        """
+        outcomes = queue.Queue()
 
-        comp_places = []
-        for datum in comps:
-            place = Place()
+        def run(hedge):
             try:
-                place.set_data(datum)
-                comp_places.append(place)
-            except:
-                raise ZillowError({'message': 'No valid comp data found %s' % datum})
+                outcomes.put((hedge, request(hedge), None))
+            except BaseException as e:
+                outcomes.put((hedge, None, e))
+
+        threading.Thread(target=run, args=(False,)).start()
+        try:
+            outcome = outcomes.get(timeout=delay)
+        except queue.Empty:
+            if info is not None:
+                info.attempts += 1
+            threading.Thread(target=run, args=(True,)).start()
+            outcome = outcomes.get()
+            if outcome[2] is not None:
+                # the first to answer failed: wait for the other
+                other = outcomes.get()
+                if other[2] is None or outcome[0]:
+                    outcome = other
+            won = outcome[0] and outcome[2] is None
+            self._retry.hedged(won)
+            if won and info is not None:
+                info.source = 'network'
+        hedge, result, error = outcome
+        if error is not None:
+            raise error
+        return result
+
+    def _Queue(self, zws_id, priority, info):
+        if info is None:
+            return self._scheduler.acquire(zws_id, self._Priority(priority))
+        start = _clock()
+        try:
+            self._scheduler.acquire(zws_id, self._Priority(priority))
+        finally:
+            info.add('queue', _clock() - start)
 
-        output = {
-            'principal': principal_place,
-            'comps': comp_places
-        }
+    @staticmethod
+    def _Parse(parse, body, info):
+        """
+        Parse a response body, timing the XML and the Places apart when there is a RequestInfo.
+        """
+        if info is None:
+            return parse(body)
+        start = _clock()
+        try:
+            return parse(body, info.timings)
+        finally:
+            info.add('parse', _clock() - start - info.timings.get('model', 0.0))
 
-        return output
+    def add_hook(self, before=None, after=None):
+        """
+        Call functions around every call the Api makes.
+        :param before: Called with a zillow.metrics.RequestInfo when a call starts.
+        :param after: Called with the RequestInfo, holding the outcome and phase timings, when the call ends.
+        """
+        self._hooks.add(before, after)
 
-    def _RequestUrl(self, url, verb, data=None):
+    def remove_hook(self, hook):
+        """
+        Stop calling a function added with add_hook.
+        """
+        self._hooks.remove(hook)
+
+    def _CheckOut(self, parameters):
+        """
+        Pick the key to send a request with: the caller's, or one from the key pool.
+        """
+        if self._key_pool is None:
+            return parameters['zws-id']
+        parameters['zws-id'] = self._key_pool.checkout()
+        return parameters['zws-id']
+
+    def _CheckIn(self, zws_id, error=None):
+        """
+        :return: True if the request should be retried with another key from the key pool.
+        """
+        if self._key_pool is None:
+            return False
+        return self._key_pool.checkin(zws_id, error)
+
+    @staticmethod
+    def _NewFlights():
+        return SingleFlight()
+
+    @staticmethod
+    def _Priority(priority):
+        return PRIORITY_INTERACTIVE if priority is None else priority
+
+    def _Lookup(self, endpoint, parameters, use_cache, refresh_cache):
+        """
+        Look a request up in the caches.
+        :return: A tuple of the cache key (None when not caching), a copy of the cached result and the cached response body.
+        """
+        if not use_cache or (self._cache is None and self._persistent_cache is None):
+            return None, None, None
+        key = make_key(endpoint, parameters)
+        if refresh_cache:
+            return key, None, None
+        if self._cache is not None:
+            result = self._cache.get(key)
+            if result is not None:
+                return key, _CopyResult(result), None
+        if self._persistent_cache is not None:
+            return key, None, self._persistent_cache.get(key)
+        return key, None, None
+
+    def _Store(self, key, result, body, fetched):
+        """
+        Cache a parsed result, and its response body if it was just fetched.
+        :return: The result to hand to the caller.
+        """
+        if key is None:
+            return result
+        if fetched and self._persistent_cache is not None:
+            self._persistent_cache.set(key, body)
+        if self._cache is not None:
+            self._cache.set(key, result, size=len(body))
+            return _CopyResult(result)
+        return result
+
+    def _ParseSearchResults(self, content, timings=None):
+        return self._ParsePlace(content, SEARCH_RESULT, False, timings)
+
+    def _ParseDeepSearchResults(self, content, timings=None):
+        return self._ParsePlace(content, SEARCH_RESULT, True, timings)
+
+    def _ParseZEstimate(self, content, timings=None):
+        return self._ParsePlace(content, ZESTIMATE, False, timings)
+
+    def _ParsePlace(self, content, path, has_extended_data, timings):
+        if self._parse_pool is not None:
+            return self._parse_pool.parse_place(content, path, has_extended_data, backend=self._parser)
+        return parse_place(content, path, has_extended_data=has_extended_data, backend=self._parser,
+                           lazy=self._lazy_places, timings=timings)
+
+    def _ParseComps(self, content, timings=None):
+        if self._parse_pool is not None:
+            return self._parse_pool.parse_comps(content, backend=self._parser)
+        return parse_comps(content, backend=self._parser, lazy=self._lazy_places, timings=timings)
+
+    def _RequestUrl(self, url, verb, data=None, info=None, timeout=None):
         """
         Request a url.
         :param url: The web location we want to retrieve.
         :param verb: GET only (for now).
         :param data: A dict of (str, unicode) key/value pairs.
+        :param info: A RequestInfo to record the url and network timings in, or None.
+        :param timeout: The request timeout, if not the Api's.
         :return:A JSON object.
         """
+        if self._session is None:
+            raise ZillowError({'message': "The Api has been closed."})
         if verb == 'GET':
+            if info is not None:
+                start = _clock()
             url = self._BuildUrl(url, extra_params=data)
+            if info is not None:
+                built = _clock()
+                info.add('url', built - start)
             try:
-                return requests.get(
+                return self._session.get(
                     url,
                     auth=self.__auth,
-                    timeout=self._timeout
+                    headers=self._request_headers,
+                    timeout=self._timeout if timeout is None else timeout
                 )
-            except requests.RequestException as e:
-                raise ZillowError(str(e))
+            except _Requests().RequestException as e:
+                raise ZillowError({'message': str(e), 'network': True})
+            finally:
+                if info is not None:
+                    info.add('network', _clock() - built)
         return 0
 
     def _BuildUrl(self, url, path_elements=None, extra_params=None):
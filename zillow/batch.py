@@ -0,0 +1,92 @@
+from collections import deque
+
+from .error import ZillowError
+
+
+class BatchResult(object):
+    """
+    The outcome of one lookup in a batch: either a result or the ZillowError
+    the lookup raised.
+    """
+    def __init__(self, index, item, result=None, error=None):
+        self.index = index
+        self.item = item
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def get(self):
+        """
+        :return: The result of the lookup, raising its ZillowError if it failed.
+        """
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def __repr__(self):
+        return 'BatchResult(index=%r, item=%r, ok=%r)' % (self.index, self.item, self.ok)
+
+
+def _Outcome(future, index, item):
+    try:
+        return BatchResult(index, item, result=future.result())
+    except ZillowError as e:
+        return BatchResult(index, item, error=e)
+
+
+def run_batch(call, items, workers=8, ordered=True, window=None):
+    """
+    Run call(item) for every item on a pool of threads.
+    At most window items are in flight or waiting to be yielded at once, so
+    items may be a generator of any length.
+    :param call: The function to run.
+    :param items: An iterable of arguments for call.
+    :param workers: The number of threads.
+    :param ordered: Yield results in input order. Otherwise yield them as they complete.
+    :param window: The maximum number of items in flight (default: 4 per worker).
+    :return: An iterator of BatchResult.
+    """
+    # imported here: concurrent.futures is slow to import and only batches need it
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    if window is None:
+        window = workers * 4
+    items = enumerate(items)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = {}
+    order = deque()
+
+    def submit():
+        for index, item in items:
+            future = executor.submit(call, item)
+            pending[future] = (index, item)
+            if ordered:
+                order.append(future)
+            return True
+        return False
+
+    try:
+        while len(pending) < window and submit():
+            pass
+        if ordered:
+            while order:
+                future = order.popleft()
+                index, item = pending.pop(future)
+                outcome = _Outcome(future, index, item)
+                submit()
+                yield outcome
+        else:
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, item = pending.pop(future)
+                    submit()
+                    yield _Outcome(future, index, item)
+    finally:
+        # The caller may stop early; drop the work it will never read.
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,410 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+
+# Request parameters that identify the caller rather than the request.
+IGNORED_PARAMETERS = ('zws-id',)
+
+
+def make_key(endpoint, parameters):
+    """
+    Build a cache key for a request.
+    :param endpoint: The name of the API method, e.g. 'GetZEstimate'.
+    :param parameters: The request parameters. The zws-id is left out, and values are compared case and whitespace insensitively.
+    :return: A hashable key.
+    """
+    items = []
+    for name, value in parameters.items():
+        if name in IGNORED_PARAMETERS or value is None:
+            continue
+        items.append((name, ' '.join(str(value).split()).lower()))
+    return (endpoint, tuple(sorted(items)))
+
+
+class CacheStats(object):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_dict(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class ResponseCache(object):
+    """
+    An in-memory cache of parsed responses with a time to live and least
+    recently used eviction, bounded by entry count and by response bytes.
+    Example usage:
+        >>> cache = ResponseCache(ttl=60, ttls={'GetComps': 3600}, max_entries=10000)
+        >>> api = zillow.ValuationApi(cache=cache)
+    """
+    def __init__(self, ttl=60, ttls=None, max_entries=1024, max_bytes=64 * 1024 * 1024, clock=time.time):
+        """
+        :param ttl: Seconds an entry stays fresh.
+        :param ttls: A dict of endpoint name to ttl, overriding ttl for that endpoint.
+        :param max_entries: The maximum number of entries held.
+        :param max_bytes: The maximum total size, in response bytes, of the entries held.
+        :param clock: Returns the current time in seconds.
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        """
+        :param key: A key from make_key.
+        :return: The cached value, or None if it is missing or stale.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            value, size, expires = entry
+            if expires <= self._clock():
+                self._bytes -= size
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries[key] = entry
+            self.stats.hits += 1
+            return value
+
+    def set(self, key, value, size=0):
+        """
+        :param key: A key from make_key.
+        :param value: The parsed response.
+        :param size: The size of the response body in bytes.
+        """
+        ttl = self.ttls.get(key[0], self.ttl)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, self._clock() + ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.stats.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def key_string(key):
+    """
+    :param key: A key from make_key.
+    :return: The key as a string, e.g. 'GetZEstimate?zpid=2100641621'.
+    """
+    endpoint, items = key
+    return '%s?%s' % (endpoint, '&'.join('%s=%s' % item for item in items))
+
+
+# A place held by a RecordStore, the endpoint whose response it was parsed from and when.
+StoredRecord = namedtuple('StoredRecord', ['place', 'endpoint', 'fetched'])
+
+
+class RecordStore(object):
+    """
+    Places keyed by zpid, side-loaded from the responses an Api parses.
+    Every comp of a GetComps or GetDeepComps response carries the address,
+    links and Zestimate a GetZEstimate call would return for it, so an Api
+    with a record store answers GetZEstimate for any zpid it has seen from
+    the store while the record is fresh, without a request.
+    Example usage:
+        >>> records = zillow.RecordStore(ttl=3600, ttls={'GetComps': 600}, max_entries=100000)
+        >>> api = zillow.ValuationApi(record_store=records)
+        >>> comps = api.GetDeepComps("<your key here>", 2100641621)
+        >>> api.GetZEstimate("<your key here>", comps['comps'][0].zpid)  # no request
+
+    A newer record of a zpid replaces an older one, whatever endpoint either
+    came from. The least recently used records are evicted first.
+    """
+    def __init__(self, ttl=3600, ttls=None, max_entries=100000, clock=time.time):
+        """
+        :param ttl: Seconds a record stays fresh.
+        :param ttls: A dict of endpoint name to ttl, overriding ttl for the records parsed from that endpoint.
+        :param max_entries: The maximum number of records held.
+        :param clock: Returns the current time in seconds.
+        """
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self.loaded = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, zpid):
+        return str(zpid) in self._entries
+
+    def load(self, result, endpoint, fetched=None):
+        """
+        Add the places of a parsed response.
+        :param result: A Place, or a dict with the 'principal' and 'comps' of a comps response.
+        :param endpoint: The name of the API method the response came from, e.g. 'GetDeepComps'.
+        :param fetched: When the response was fetched, in seconds (default: now).
+        """
+        if fetched is None:
+            fetched = self._clock()
+        if isinstance(result, dict):
+            self.put(result['principal'], endpoint, fetched)
+            for place in result['comps']:
+                self.put(place, endpoint, fetched)
+        else:
+            self.put(result, endpoint, fetched)
+
+    def put(self, place, endpoint, fetched=None):
+        """
+        Add a place. Places without a zpid are left out.
+        :param place: The Place. The store keeps a copy, without its similarity score.
+        :param endpoint: The name of the API method the place was parsed from.
+        :param fetched: When the place was fetched, in seconds (default: now).
+        """
+        if place.zpid is None:
+            return
+        if fetched is None:
+            fetched = self._clock()
+        zpid = str(place.zpid)
+        place = place.copy()
+        # a comp's score is relative to its principal
+        place.similarity_score = None
+        with self._lock:
+            old = self._entries.pop(zpid, None)
+            if old is not None and old.fetched > fetched:
+                place, endpoint, fetched = old
+            self._entries[zpid] = StoredRecord(place, endpoint, fetched)
+            self.loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def record(self, zpid):
+        """
+        :param zpid: The zpid to look up.
+        :return: The StoredRecord of the zpid, fresh or not, or None. Its place is a copy.
+        """
+        with self._lock:
+            entry = self._entries.get(str(zpid))
+        if entry is None:
+            return None
+        return StoredRecord(entry.place.copy(), entry.endpoint, entry.fetched)
+
+    def get(self, zpid, max_age=None):
+        """
+        :param zpid: The zpid to look up.
+        :param max_age: Seconds a record may be old, overriding the store's ttls.
+        :return: A copy of the place, or None if there is no fresh record of it.
+        """
+        zpid = str(zpid)
+        with self._lock:
+            entry = self._entries.pop(zpid, None)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            # kept when stale: a caller may accept older records, and a fetch will replace it
+            self._entries[zpid] = entry
+            if max_age is None:
+                max_age = self.ttls.get(entry.endpoint, self.ttl)
+            if entry.fetched + max_age <= self._clock():
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+        return entry.place.copy()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PersistentCache(object):
+    """
+    Base class for caches that keep raw response bodies outside the process,
+    so they outlive it and can be shared with other processes.
+    """
+
+    def get(self, key):
+        """
+        :param key: A key from make_key.
+        :return: The response body as bytes, or None if it is missing or stale.
+        """
+        raise NotImplementedError()
+
+    def set(self, key, body):
+        """
+        :param key: A key from make_key.
+        :param body: The response body as bytes.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+
+class SQLiteCache(PersistentCache):
+    """
+    A persistent cache of response bodies in a SQLite database. Any number of
+    processes may open the same file at once.
+    Example usage:
+        >>> cache = SQLiteCache('/var/cache/zillow.db', ttl=7 * 24 * 3600)
+        >>> api = zillow.ValuationApi(persistent_cache=cache)
+    """
+    _SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS responses ('
+        ' key TEXT PRIMARY KEY,'
+        ' body BLOB NOT NULL,'
+        ' size INTEGER NOT NULL,'
+        ' created REAL NOT NULL,'
+        ' expires REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS responses_created ON responses (created)',
+    )
+
+    def __init__(self, path, ttl=24 * 3600, ttls=None, max_bytes=1024 * 1024 * 1024,
+                 warm_start=False, evict_interval=100, timeout=30, clock=time.time):
+        """
+        :param path: The database file.
+        :param ttl: Seconds an entry stays fresh.
+        :param ttls: A dict of endpoint name to ttl, overriding ttl for that endpoint.
+        :param max_bytes: The maximum total size of the bodies held. The oldest entries are evicted first.
+        :param warm_start: Read the index of fresh keys when opening and answer misses from it, reading bodies only on a hit. Entries other processes add later are not seen until reload_index().
+        :param evict_interval: Check the size bound once every this many writes.
+        :param timeout: Seconds to wait for another process to release the database.
+        :param clock: Returns the current time in seconds.
+        """
+        import sqlite3
+
+        self.path = path
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.max_bytes = max_bytes
+        self.evict_interval = evict_interval
+        self.stats = CacheStats()
+        self._clock = clock
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        for statement in self._SCHEMA:
+            self._db.execute(statement)
+        self._index = None
+        if warm_start:
+            self.reload_index()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def reload_index(self):
+        """Read the keys and expiry times of all fresh entries."""
+        with self._lock:
+            rows = self._db.execute('SELECT key, expires FROM responses WHERE expires > ?',
+                                    (self._clock(),))
+            self._index = dict(rows)
+
+    def get(self, key):
+        skey = key_string(key)
+        now = self._clock()
+        with self._lock:
+            if self._index is not None:
+                expires = self._index.get(skey)
+                if expires is None or expires <= now:
+                    self.stats.misses += 1
+                    return None
+            row = self._db.execute('SELECT body FROM responses WHERE key = ? AND expires > ?',
+                                   (skey, now)).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return bytes(row[0])
+
+    def set(self, key, body):
+        ttl = self.ttls.get(key[0], self.ttl)
+        if ttl <= 0:
+            return
+        skey = key_string(key)
+        now = self._clock()
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                             (skey, body, len(body), now, now + ttl))
+            if self._index is not None:
+                self._index[skey] = now + ttl
+            self._writes += 1
+            if self._writes % self.evict_interval == 0:
+                self._Evict(now)
+
+    def evict(self):
+        """Drop stale entries, then the oldest ones until the size bound is met."""
+        with self._lock:
+            self._Evict(self._clock())
+
+    def _Evict(self, now):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            self.stats.expirations += db.execute('DELETE FROM responses WHERE expires <= ?', (now,)).rowcount
+            total = db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                rows = db.execute('SELECT key, size FROM responses ORDER BY created')
+                evicted = []
+                for skey, size in rows:
+                    if excess <= 0:
+                        break
+                    evicted.append((skey,))
+                    excess -= size
+                db.executemany('DELETE FROM responses WHERE key = ?', evicted)
+                self.stats.evictions += len(evicted)
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM responses')
+            if self._index is not None:
+                self._index.clear()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
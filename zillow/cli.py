@@ -0,0 +1,324 @@
+"""
+zillow-bulk: look up many properties from a CSV or JSON lines file.
+
+    zillow-bulk addresses.csv -o places.jsonl --key <your key here> --workers 16
+
+Each input row has a zpid, which is looked up with GetZEstimate, or an
+address and citystatezip, which are looked up with GetSearchResults (or
+GetDeepSearchResults with --deep). Each output line is a JSON object with
+the row's index in the input, the row itself, and either the place's
+get_dict() or the error the lookup ended with.
+
+Rows are read as the lookups need them and at most --window rows are in
+flight or waiting to be written at once, so memory does not grow with the
+size of the input. With --resume the output file is read back to find the
+rows already written, a line cut short by a crash is dropped, and the run
+picks up from there, appending to the file. Rows whose last line is an error
+are looked up again, and their new line is appended after the old one.
+"""
+
+from __future__ import print_function
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+from .batch import run_batch
+from .error import ZillowError
+from .metrics import BUCKETS, _clock, _Histogram
+from .quota import PRIORITY_BATCH
+
+
+def read_rows(stream, format='csv'):
+    """
+    :param stream: A text stream of CSV with a header line, or of JSON objects, one per line.
+    :param format: 'csv' or 'jsonl'.
+    :return: An iterator of dicts, one per row. Blank lines are skipped.
+    """
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    elif format == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ZillowError({'message': "Unknown input format: %r" % format})
+
+
+def lookup(api, zws_id, row, deep=False, priority=PRIORITY_BATCH):
+    """
+    Look up the property of an input row.
+    :param row: A dict with a zpid, or an address and citystatezip.
+    :param deep: Search addresses with GetDeepSearchResults rather than GetSearchResults.
+    :return: The Place.
+    """
+    zpid = row.get('zpid')
+    if zpid:
+        return api.GetZEstimate(zws_id, zpid, priority=priority)
+    address = row.get('address')
+    citystatezip = row.get('citystatezip')
+    if not address or not citystatezip:
+        raise ZillowError({'message': "A row needs a zpid, or an address and a citystatezip"})
+    if deep:
+        return api.GetDeepSearchResults(zws_id, address, citystatezip, priority=priority)
+    return api.GetSearchResults(zws_id, address, citystatezip, priority=priority)
+
+
+def completed(path):
+    """
+    Find the rows an earlier run wrote to an output file, and drop a last line cut short.
+    :param path: The output file.
+    :return: (offset, done, failed): every row before offset was written, as were the rows in the set done;
+             the rows in the set failed were written with an error, and are to be looked up again.
+    """
+    offset = 0
+    done = set()
+    failed = set()
+    if not os.path.exists(path):
+        return offset, done, failed
+    end = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                entry = json.loads(line.decode('utf-8'))
+                index = entry['index']
+            except (ValueError, KeyError):
+                break
+            end += len(line)
+            # a failed row counts as written for the offset, so failed holds the failures and no more
+            if 'error' in entry:
+                failed.add(index)
+            else:
+                failed.discard(index)
+            if index >= offset:
+                done.add(index)
+            # only the rows past the first gap stay in the set: no more than the window of the earlier run
+            while offset in done:
+                done.discard(offset)
+                offset += 1
+    if end < os.path.getsize(path):
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+    return offset, done, failed
+
+
+class Progress(object):
+    """
+    Counts of the rows looked up and a histogram of their latency, reported as a line of text.
+    """
+    def __init__(self, clock=_clock):
+        self._clock = clock
+        self.started = clock()
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self._latency = _Histogram()
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, ok):
+        with self._lock:
+            self._latency.observe(seconds)
+            if ok:
+                self.ok += 1
+            else:
+                self.failed += 1
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def quantile(self, q):
+        """
+        :return: The upper bound of the latency bucket the q quantile falls in, or None before the first lookup.
+        """
+        histogram = self._latency
+        if not histogram.count:
+            return None
+        rank = q * histogram.count
+        seen = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def get_dict(self):
+        with self._lock:
+            elapsed = self._clock() - self.started
+            done = self.ok + self.failed
+            return {
+                'ok': self.ok,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'seconds': elapsed,
+                'rows_per_second': done / elapsed if elapsed > 0 else 0.0,
+                'p50': self.quantile(0.5),
+                'p99': self.quantile(0.99),
+            }
+
+    def line(self):
+        stats = self.get_dict()
+        return '%d ok, %d failed, %d skipped in %.1fs: %.1f rows/s, p50 <= %ss, p99 <= %ss' % (
+            stats['ok'], stats['failed'], stats['skipped'], stats['seconds'], stats['rows_per_second'],
+            stats['p50'], stats['p99'])
+
+
+def bulk(api, zws_id, rows, out, workers=8, window=None, ordered=True, deep=False, resume=None,
+         progress=None, report=None, interval=10.0):
+    """
+    Look up every row and write a JSON line for each.
+    :param api: The ValuationApi to call.
+    :param zws_id: The Zillow Web Service Identifier.
+    :param rows: An iterable of input rows, see lookup.
+    :param out: The text stream to write to.
+    :param workers: The number of lookups run at once.
+    :param window: The maximum number of rows in flight or waiting to be written (default: 4 per worker).
+    :param ordered: Write rows in input order. Otherwise write them as they finish.
+    :param deep: Search addresses with GetDeepSearchResults.
+    :param resume: An (offset, done, failed) triple from completed: the rows to skip, and those to look up again.
+    :param progress: A Progress to count rows in.
+    :param report: Called with the progress line every interval seconds from a background thread, or None.
+    :return: The Progress.
+    """
+    progress = progress or Progress()
+    offset, done, failed = resume or (0, set(), set())
+
+    def pending():
+        for index, row in enumerate(rows):
+            if (index < offset or index in done) and index not in failed:
+                progress.skip()
+                continue
+            yield index, row
+
+    def call(item):
+        start = _clock()
+        try:
+            place = lookup(api, zws_id, item[1], deep)
+        except ZillowError:
+            progress.observe(_clock() - start, False)
+            raise
+        progress.observe(_clock() - start, True)
+        return place
+
+    # reported on a timer rather than as rows are written: in input order, one slow row holds back every write
+    stopped = threading.Event()
+    reporter = None
+    if report is not None:
+        def tick():
+            while not stopped.wait(interval):
+                report(progress.line())
+        reporter = threading.Thread(target=tick, name='zillow-bulk-progress')
+        reporter.daemon = True
+        reporter.start()
+
+    last = time.time()
+    try:
+        for outcome in run_batch(call, pending(), workers=workers, ordered=ordered, window=window):
+            index, row = outcome.item
+            entry = {'index': index, 'input': row}
+            if outcome.ok:
+                entry['place'] = outcome.result.get_dict()
+            else:
+                entry['error'] = outcome.error.message
+            # a unicode line: a text file opened with io.open takes no py2 str
+            out.write(u'%s\n' % json.dumps(entry, sort_keys=True, default=str))
+            if time.time() - last >= interval:
+                last = time.time()
+                out.flush()
+    finally:
+        stopped.set()
+        if reporter is not None:
+            reporter.join()
+    out.flush()
+    return progress
+
+
+def _Parser():
+    parser = argparse.ArgumentParser(
+        prog='zillow-bulk',
+        description='Look up the properties of a CSV or JSON lines file and write them as JSON lines.')
+    parser.add_argument('input', help="A file of rows with a zpid, or an address and citystatezip; '-' for stdin.")
+    parser.add_argument('-o', '--output', default='-', help="The file to write to (default: stdout).")
+    parser.add_argument('--format', choices=['csv', 'jsonl'],
+                        help="The input format (default: from the file name, csv otherwise).")
+    parser.add_argument('--key', action='append', default=[],
+                        help="A zws-id; give several to spread calls over them (default: $ZILLOW_KEY).")
+    parser.add_argument('--deep', action='store_true', help="Search addresses with GetDeepSearchResults.")
+    parser.add_argument('--workers', type=int, default=8, help="The number of lookups run at once.")
+    parser.add_argument('--window', type=int,
+                        help="The rows in flight or waiting to be written (default: 4 per worker).")
+    parser.add_argument('--unordered', action='store_true', help="Write rows as they finish, not in input order.")
+    parser.add_argument('--resume', action='store_true', help="Skip the rows already in the output file and append.")
+    parser.add_argument('--attempts', type=int, default=3, help="Tries per lookup (default: 3).")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds to wait for the server (default: 30).")
+    parser.add_argument('--cache', help="A SQLite file to keep responses in between runs.")
+    parser.add_argument('--stats', type=float, default=10.0,
+                        help="Seconds between progress lines on stderr; 0 for none (default: 10).")
+    return parser
+
+
+def _Open(path, mode):
+    if path == '-':
+        return sys.stdin if mode == 'r' else sys.stdout
+    if mode == 'r' and sys.version_info[0] == 2:
+        # the py2 csv module reads bytes, not unicode
+        return open(path, 'rb')
+    return io.open(path, mode, newline='' if mode == 'r' else None, encoding='utf-8')
+
+
+def main(argv=None, session=None):
+    """
+    The zillow-bulk command.
+    :param argv: The arguments (default: sys.argv[1:]).
+    :param session: A requests.Session for the Api to send requests with.
+    :return: The exit status.
+    """
+    parser = _Parser()
+    args = parser.parse_args(argv)
+    keys = args.key or [key for key in [os.environ.get('ZILLOW_KEY')] if key]
+    if not keys:
+        parser.error("give a zws-id with --key or $ZILLOW_KEY")
+    if args.resume and args.output == '-':
+        parser.error("--resume needs an --output file")
+    format = args.format or ('jsonl' if args.input.endswith(('.jsonl', '.json')) else 'csv')
+
+    # imported here: the Api pulls in requests, which the argument errors above have no need of
+    from .api import ValuationApi
+    from .cache import SQLiteCache
+    from .keys import KeyPool
+    from .retry import RetryPolicy
+
+    resume = completed(args.output) if args.resume else None
+    persistent_cache = SQLiteCache(args.cache) if args.cache else None
+    api = ValuationApi(session=session, pool_maxsize=args.workers, timeout=args.timeout, cache=None,
+                       persistent_cache=persistent_cache, retry=RetryPolicy(attempts=args.attempts),
+                       key_pool=KeyPool(keys) if len(keys) > 1 else None)
+    source = _Open(args.input, 'r')
+    out = _Open(args.output, 'a' if args.resume else 'w')
+    report = (lambda line: print(line, file=sys.stderr)) if args.stats > 0 else None
+    try:
+        progress = bulk(api, keys[0], read_rows(source, format), out, workers=args.workers, window=args.window,
+                        ordered=not args.unordered, deep=args.deep, resume=resume, report=report,
+                        interval=args.stats)
+    finally:
+        api.close()
+        if persistent_cache is not None:
+            persistent_cache.close()
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(progress.line(), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
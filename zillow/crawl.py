@@ -0,0 +1,181 @@
+"""
+Breadth-first crawling of the comparables graph.
+
+Starting from seed zpids, a CompCrawler calls GetDeepComps on each property
+and then on each of its comps, level by level, and streams what it finds:
+a CrawlNode for each property, a CrawlEdge for each principal to comp link
+and a CrawlError for each lookup that failed. Only the set of zpids seen and
+the current level are kept in memory; the places themselves are handed on
+as they arrive.
+
+With a checkpoint file the crawler appends a line for every property it
+finds and every property it has expanded, and picks up from there when run
+again with the same file.
+"""
+
+import json
+import os
+from collections import namedtuple
+
+from .batch import run_batch
+from .quota import PRIORITY_BATCH
+
+
+# A property of the graph and its Place.
+CrawlNode = namedtuple('CrawlNode', ['zpid', 'depth', 'place'])
+
+# A link from a principal zpid to one of its comps, with the comp's similarity score.
+CrawlEdge = namedtuple('CrawlEdge', ['source', 'target', 'similarity_score'])
+
+# A property whose comps could not be looked up, and the ZillowError why.
+CrawlError = namedtuple('CrawlError', ['zpid', 'depth', 'error'])
+
+
+class CompCrawler(object):
+    """
+    Crawls the comparables graph from seed zpids with GetDeepComps.
+    Example usage:
+        >>> crawler = CompCrawler(api, "<your key here>", max_depth=3, max_nodes=100000,
+        ...                       checkpoint='comps.checkpoint')
+        >>> for item in crawler.crawl(['2100641621']):
+        ...     if isinstance(item, CrawlEdge):
+        ...         edges.writerow(item)
+
+    Each property is yielded once as a CrawlNode: properties that are
+    expanded when their own comps come back, the others (at max_depth) when
+    they are found. Edges only join properties within the budget. A
+    property expanded just before a crash is expanded again on resume, so
+    its edges may be yielded twice.
+    """
+    def __init__(self, api, zws_id, max_depth=2, max_nodes=None, count=25, workers=8,
+                 checkpoint=None, priority=PRIORITY_BATCH):
+        """
+        :param api: The ValuationApi to look comps up with.
+        :param zws_id: The Zillow Web Service Identifier.
+        :param max_depth: The number of hops from the seeds to crawl. Properties this far out are not expanded.
+        :param max_nodes: The maximum number of properties to take into the graph, or None for no limit.
+        :param count: The number of comps to ask for per property (1 to 25).
+        :param workers: The number of lookups run at once.
+        :param checkpoint: The path of a file to record progress in and resume from, or None.
+        :param priority: The scheduling priority of the lookups.
+        """
+        self.api = api
+        self.zws_id = zws_id
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.count = count
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.priority = priority
+        # zpid -> depth of every property taken into the graph
+        self._depths = {}
+        self._expanded = set()
+        self._log = None
+
+    @property
+    def seen(self):
+        """The number of properties taken into the graph so far."""
+        return len(self._depths)
+
+    @property
+    def expanded(self):
+        """The number of properties whose comps have been looked up."""
+        return len(self._expanded)
+
+    def crawl(self, seeds):
+        """
+        :param seeds: The zpids to start from. Seeds already in the checkpoint are skipped.
+        :return: An iterator of CrawlNode, CrawlEdge and CrawlError.
+        """
+        self._Resume()
+        try:
+            for seed in seeds:
+                self._Admit(str(seed), 0)
+            self._Flush()
+            frontier = sorted((zpid for zpid, depth in self._depths.items()
+                               if depth < self.max_depth and zpid not in self._expanded),
+                              key=self._depths.get)
+            while frontier:
+                found = []
+                for outcome in run_batch(self._Lookup, frontier, workers=self.workers, ordered=False):
+                    for item in self._Expand(outcome, found):
+                        yield item
+                frontier = found
+        finally:
+            self._Close()
+
+    def _Lookup(self, zpid):
+        return self.api.GetDeepComps(self.zws_id, zpid, count=self.count, priority=self.priority)
+
+    def _Expand(self, outcome, found):
+        zpid = outcome.item
+        depth = self._depths[zpid]
+        if not outcome.ok:
+            yield CrawlError(zpid, depth, outcome.error)
+            return
+        result = outcome.result
+        yield CrawlNode(zpid, depth, result['principal'])
+        for comp in result['comps']:
+            target = comp.zpid
+            if target is None or target == zpid:
+                continue
+            if target not in self._depths:
+                if not self._Admit(target, depth + 1):
+                    continue
+                if depth + 1 < self.max_depth:
+                    found.append(target)
+                else:
+                    yield CrawlNode(target, depth + 1, comp)
+            yield CrawlEdge(zpid, target, comp.similarity_score)
+        self._expanded.add(zpid)
+        self._Write({'expanded': zpid})
+        self._Flush()
+
+    def _Admit(self, zpid, depth):
+        """
+        Take a property into the graph if the budget allows.
+        :return: True if the property is in the graph.
+        """
+        if zpid in self._depths:
+            return True
+        if self.max_nodes is not None and len(self._depths) >= self.max_nodes:
+            return False
+        self._depths[zpid] = depth
+        self._Write({'zpid': zpid, 'depth': depth})
+        return True
+
+    def _Resume(self):
+        self._depths = {}
+        self._expanded = set()
+        if self.checkpoint is None:
+            return
+        complete = True
+        if os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as f:
+                for line in f:
+                    complete = line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line may be cut short by a crash
+                        continue
+                    if 'expanded' in entry:
+                        self._expanded.add(entry['expanded'])
+                    else:
+                        self._depths.setdefault(entry['zpid'], entry['depth'])
+        self._log = open(self.checkpoint, 'a')
+        if not complete:
+            self._log.write('\n')
+
+    def _Write(self, entry):
+        if self._log is not None:
+            self._log.write(json.dumps(entry) + '\n')
+
+    def _Flush(self):
+        if self._log is not None:
+            self._log.flush()
+
+    def _Close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
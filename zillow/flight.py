@@ -0,0 +1,120 @@
+"""
+Coalescing of identical requests in flight.
+
+When several threads ask for the same thing at once, only the first sends
+the request and parses the response; the others wait for it and get the
+same result, or the same ZillowError.
+"""
+
+import threading
+
+
+class FlightStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+
+    def get_dict(self):
+        return {
+            'calls': self.calls,
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+        }
+
+
+class _Flight(object):
+    __slots__ = ('done', 'result', 'error', 'interrupted', 'waiters')
+
+    def __init__(self, done):
+        self.done = done
+        self.result = None
+        self.error = None
+        self.interrupted = False
+        self.waiters = 0
+
+
+class SingleFlight(object):
+    """
+    Runs one call per key at a time and shares its outcome with every
+    caller that asks for the same key while it runs.
+    Example usage:
+        >>> flights = SingleFlight()
+        >>> flights.do(key, lambda: fetch(key), copy=copy.deepcopy)
+    """
+    def __init__(self):
+        self.stats = FlightStats()
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._flights)
+
+    def _Join(self, key, done):
+        """
+        :return: The flight for key and whether the caller leads it.
+        """
+        with self._lock:
+            self.stats.calls += 1
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(done())
+                self.stats.leaders += 1
+                return flight, True
+            flight.waiters += 1
+            self.stats.coalesced += 1
+            return flight, False
+
+    def _Land(self, key, flight, result=None, error=None, interrupted=False):
+        """
+        Record the outcome of a flight and take it off the board.
+        :return: The number of callers waiting on it.
+        """
+        flight.result = result
+        flight.error = error
+        flight.interrupted = interrupted
+        with self._lock:
+            del self._flights[key]
+            return flight.waiters
+
+    @staticmethod
+    def _Outcome(flight, copy):
+        if flight.error is not None:
+            raise flight.error
+        return copy(flight.result) if copy is not None else flight.result
+
+    def do(self, key, call, copy=None):
+        """
+        Run call, unless a call for the same key is already running, in
+        which case wait for it instead.
+        :param key: What identifies the call, e.g. a cache key.
+        :param call: Takes no arguments and returns the result.
+        :param copy: Copies the result for each caller that shares it, so callers can't change each other's.
+        :return: The result of call.
+        :raises: The exception call raised. If the call sharing its outcome was interrupted, the waiters run call themselves.
+        """
+        while True:
+            flight, leader = self._Join(key, threading.Event)
+            if leader:
+                return self._Lead(key, flight, call, copy)
+            flight.done.wait()
+            if not flight.interrupted:
+                return self._Outcome(flight, copy)
+
+    def _Lead(self, key, flight, call, copy):
+        try:
+            result = call()
+        except Exception as e:
+            self._Land(key, flight, error=e)
+            flight.done.set()
+            raise
+        except BaseException:
+            self._Land(key, flight, interrupted=True)
+            flight.done.set()
+            raise
+        waiters = self._Land(key, flight, result)
+        flight.done.set()
+        if waiters and copy is not None:
+            # the waiters copy the result as they wake; keep it unchanged for them
+            return copy(result)
+        return result
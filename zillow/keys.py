@@ -0,0 +1,170 @@
+"""
+Spreading calls over several zws-ids.
+
+A KeyPool hands each call the least loaded of its keys that is still in
+rotation. A key the web service reports as invalid is taken out for good; a
+key that has used up its quota is taken out until its quota starts over.
+"""
+
+import threading
+import time
+
+from .error import ZillowError
+
+
+# Zillow message codes: the zws-id is invalid or missing, or the account may
+# not make the call.
+INVALID_KEY_CODES = frozenset([2, 6])
+# Zillow message code: the account has made its maximum number of calls for today.
+QUOTA_CODES = frozenset([7])
+
+
+class _KeyState(object):
+    """The usage counters and health of one zws-id."""
+    def __init__(self, zws_id):
+        self.zws_id = zws_id
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.ejected = None
+        self.ejected_at = None
+
+    def get_dict(self):
+        return {
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'errors': self.errors,
+            'healthy': self.ejected is None,
+            'ejected': self.ejected,
+        }
+
+
+class KeyPool(object):
+    """
+    A pool of zws-ids to spread calls over. An Api with a key pool sends
+    each call with a key from the pool, whatever zws_id it is passed, and
+    retries it with another key when the web service rejects the first.
+    Example usage:
+        >>> pool = zillow.KeyPool(['<key 1>', '<key 2>', '<key 3>'])
+        >>> api = zillow.ValuationApi(key_pool=pool)
+        >>> api.GetZEstimate(None, '2100641621')
+        >>> pool.stats()
+    """
+    def __init__(self, zws_ids, quota_cooldown=24 * 3600, clock=time.time):
+        """
+        :param zws_ids: The keys to use.
+        :param quota_cooldown: Seconds a key whose quota is used up stays out of rotation, or None for good.
+        :param clock: Returns the current time in seconds.
+        """
+        self._keys = [_KeyState(zws_id) for zws_id in zws_ids]
+        if not self._keys:
+            raise ZillowError({'message': "A KeyPool needs at least one zws-id"})
+        self.quota_cooldown = quota_cooldown
+        self._clock = clock
+        self._by_id = dict((state.zws_id, state) for state in self._keys)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def keys(self):
+        """All keys of the pool, in rotation or not."""
+        return [state.zws_id for state in self._keys]
+
+    def healthy_keys(self):
+        """
+        :return: The keys in rotation.
+        """
+        with self._lock:
+            return [state.zws_id for state in self._Healthy()]
+
+    def _Healthy(self):
+        now = None
+        healthy = []
+        for state in self._keys:
+            if state.ejected == 'quota' and self.quota_cooldown is not None:
+                if now is None:
+                    now = self._clock()
+                if now - state.ejected_at >= self.quota_cooldown:
+                    state.ejected = state.ejected_at = None
+            if state.ejected is None:
+                healthy.append(state)
+        return healthy
+
+    def checkout(self):
+        """
+        Pick the key for a call: the healthy key with the fewest calls in
+        flight, then the fewest calls made. Pair every checkout with a checkin.
+        :return: The zws-id.
+        :raises ZillowError: If every key is out of rotation.
+        """
+        with self._lock:
+            healthy = self._Healthy()
+            if not healthy:
+                raise ZillowError({'message': "No zws-id in the pool is usable: %s"
+                                   % ', '.join('%s (%s)' % (state.zws_id, state.ejected) for state in self._keys)})
+            state = min(healthy, key=lambda state: (state.in_flight, state.calls))
+            state.in_flight += 1
+            state.calls += 1
+            return state.zws_id
+
+    def checkin(self, zws_id, error=None):
+        """
+        Report how a call made with a key went, taking the key out of
+        rotation if the web service rejected it.
+        :param zws_id: The key from checkout.
+        :param error: The ZillowError the call raised, if any.
+        :return: True if the key was taken out of rotation and another key is left to retry the call with.
+        """
+        with self._lock:
+            state = self._by_id[zws_id]
+            state.in_flight -= 1
+            if error is None:
+                return False
+            state.errors += 1
+            reason = self._Reason(error)
+            if reason is None:
+                return False
+            if state.ejected is None:
+                state.ejected = reason
+                state.ejected_at = self._clock()
+            return bool(self._Healthy())
+
+    @staticmethod
+    def _Reason(error):
+        message = error.message if error.args else None
+        if not isinstance(message, dict) or message.get('throttled'):
+            # only the web service's own answers say anything about a key; a local throttle does not
+            return None
+        code = message.get('code')
+        if code in INVALID_KEY_CODES:
+            return 'invalid'
+        if code in QUOTA_CODES:
+            return 'quota'
+        return None
+
+    def eject(self, zws_id, reason='manual'):
+        """
+        Take a key out of rotation until it is restored.
+        """
+        with self._lock:
+            state = self._by_id[zws_id]
+            state.ejected = reason
+            state.ejected_at = self._clock()
+
+    def restore(self, zws_id):
+        """
+        Put a key back into rotation.
+        """
+        with self._lock:
+            state = self._by_id[zws_id]
+            state.ejected = state.ejected_at = None
+
+    def stats(self):
+        """
+        :return: A dict of each key's calls in flight, calls made, errors, health and the reason it was taken out of rotation.
+        """
+        with self._lock:
+            self._Healthy()
+            return dict((state.zws_id, state.get_dict()) for state in self._keys)
@@ -0,0 +1,272 @@
+"""
+Instrumentation of API calls.
+
+Hooks added with ValuationApi.add_hook are called before and after every
+call with a RequestInfo, which records where the result came from, how the
+call ended and how long each phase took:
+
+    url      building the request url
+    queue    waiting on the QuotaScheduler
+    network  sending the request and reading the response
+    parse    reading the XML
+    model    building Places from what was read
+    total    the whole call, cache lookups included
+
+Metrics is a hook that keeps counters and latency histograms per endpoint
+and exports them as Prometheus text or JSON lines; RequestLog writes one
+JSON line per call. An Api without hooks does none of this work.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+PHASES = ('url', 'queue', 'network', 'parse', 'model', 'total')
+
+# time.perf_counter where there is one (python 3)
+_clock = getattr(time, 'perf_counter', time.time)
+_replace = getattr(os, 'replace', os.rename)
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestInfo(object):
+    """
+    What is known about one call. Hooks may read it, and before hooks may
+    keep their own data in extra.
+    """
+    __slots__ = ('endpoint', 'parameters', 'priority', 'zws_id', 'source', 'status', 'error', 'code',
+                 'http_status', 'bytes', 'attempts', 'started', 'timings', 'extra', '_start')
+
+    def __init__(self, endpoint, parameters, priority=None):
+        self.endpoint = endpoint
+        self.parameters = dict((k, v) for k, v in parameters.items() if k != 'zws-id')
+        self.priority = priority
+        self.zws_id = parameters.get('zws-id')
+        # 'network', 'memory' or 'disk' cache, 'records' from a RecordStore, or 'coalesced' with a call in flight
+        self.source = None
+        # 'ok' or 'error'
+        self.status = None
+        self.error = None
+        self.code = None
+        self.http_status = None
+        self.bytes = None
+        # requests sent, retries and hedges included
+        self.attempts = 0
+        self.started = time.time()
+        self.timings = {}
+        self.extra = {}
+        self._start = _clock()
+
+    def add(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def finish(self, error=None):
+        self.timings['total'] = _clock() - self._start
+        if self.source is None:
+            self.source = 'coalesced'
+        if error is None:
+            self.status = 'ok'
+            return
+        self.status = 'error'
+        self.error = error
+        message = error.message if error.args else None
+        if isinstance(message, dict):
+            self.code = message.get('code')
+
+    def get_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'parameters': self.parameters,
+            'priority': self.priority,
+            'source': self.source,
+            'status': self.status,
+            'code': self.code,
+            'http_status': self.http_status,
+            'bytes': self.bytes,
+            'attempts': self.attempts,
+            'started': self.started,
+            'timings': self.timings,
+            'error': None if self.error is None else str(self.error),
+        }
+
+
+class Hooks(object):
+    """The before and after callbacks of an Api."""
+    def __init__(self):
+        self._before = []
+        self._after = []
+
+    def __bool__(self):
+        return bool(self._before or self._after)
+
+    __nonzero__ = __bool__
+
+    def add(self, before=None, after=None):
+        if before is not None:
+            self._before.append(before)
+        if after is not None:
+            self._after.append(after)
+
+    def remove(self, hook):
+        for hooks in (self._before, self._after):
+            while hook in hooks:
+                hooks.remove(hook)
+
+    def start(self, endpoint, parameters, priority):
+        info = RequestInfo(endpoint, parameters, priority)
+        for hook in self._before:
+            hook(info)
+        return info
+
+    def finish(self, info, error=None):
+        info.finish(error)
+        for hook in self._after:
+            hook(info)
+
+
+class _Histogram(object):
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _Labels(labels):
+    return ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in labels)
+
+
+class Metrics(object):
+    """
+    Counters and latency histograms of the calls an Api makes.
+    Example usage:
+        >>> metrics = zillow.metrics.Metrics()
+        >>> metrics.install(api)
+        >>> metrics.write('/var/lib/node_exporter/zillow.prom')
+    """
+    def __init__(self, prefix='zillow'):
+        """
+        :param prefix: The prefix of the exported metric names.
+        """
+        self.prefix = prefix
+        self._requests = {}
+        self._bytes = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def install(self, api):
+        """Record every call the api makes from now on."""
+        api.add_hook(after=self.record)
+
+    def record(self, info):
+        """An after hook: count a finished call and its phase timings."""
+        key = (info.endpoint, info.status, info.source)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if info.bytes:
+                self._bytes[info.endpoint] = self._bytes.get(info.endpoint, 0) + info.bytes
+            for phase, seconds in info.timings.items():
+                histogram = self._latency.get((info.endpoint, phase))
+                if histogram is None:
+                    histogram = self._latency[(info.endpoint, phase)] = _Histogram()
+                histogram.observe(seconds)
+
+    def get_dict(self):
+        """
+        :return: The counters and histograms as plain data, one entry per series.
+        """
+        series = []
+        with self._lock:
+            for (endpoint, status, source), count in sorted(self._requests.items()):
+                series.append({'metric': 'requests', 'endpoint': endpoint, 'status': status,
+                               'source': source, 'value': count})
+            for endpoint, count in sorted(self._bytes.items()):
+                series.append({'metric': 'response_bytes', 'endpoint': endpoint, 'value': count})
+            for (endpoint, phase), histogram in sorted(self._latency.items()):
+                series.append({'metric': 'phase_seconds', 'endpoint': endpoint, 'phase': phase,
+                               'count': histogram.count, 'sum': histogram.sum,
+                               'buckets': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], histogram.counts))})
+        return series
+
+    def json_lines(self):
+        """
+        :return: One JSON object per series, a line each.
+        """
+        now = time.time()
+        return ''.join(json.dumps(dict(series, time=now), sort_keys=True) + '\n' for series in self.get_dict())
+
+    def prometheus(self):
+        """
+        :return: The metrics in the Prometheus text exposition format.
+        """
+        prefix = self.prefix
+        lines = []
+        with self._lock:
+            lines.append('# HELP %s_requests_total Calls made, by endpoint, outcome and where the result came from.'
+                         % prefix)
+            lines.append('# TYPE %s_requests_total counter' % prefix)
+            for (endpoint, status, source), count in sorted(self._requests.items()):
+                lines.append('%s_requests_total{%s} %d' % (
+                    prefix, _Labels((('endpoint', endpoint), ('status', status), ('source', source))), count))
+            lines.append('# HELP %s_response_bytes_total Response bytes read from the network.' % prefix)
+            lines.append('# TYPE %s_response_bytes_total counter' % prefix)
+            for endpoint, count in sorted(self._bytes.items()):
+                lines.append('%s_response_bytes_total{%s} %d' % (prefix, _Labels((('endpoint', endpoint),)), count))
+            lines.append('# HELP %s_phase_seconds Time spent in each phase of a call.' % prefix)
+            lines.append('# TYPE %s_phase_seconds histogram' % prefix)
+            for (endpoint, phase), histogram in sorted(self._latency.items()):
+                labels = (('endpoint', endpoint), ('phase', phase))
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append('%s_phase_seconds_bucket{%s} %d' % (
+                        prefix, _Labels(labels + (('le', bound),)), cumulative))
+                lines.append('%s_phase_seconds_sum{%s} %r' % (prefix, _Labels(labels), histogram.sum))
+                lines.append('%s_phase_seconds_count{%s} %d' % (prefix, _Labels(labels), histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, format='prometheus'):
+        """
+        Write the metrics to a file, replacing it in one step so readers
+        never see half of it.
+        :param format: 'prometheus' or 'json'.
+        """
+        text = self.prometheus() if format == 'prometheus' else self.json_lines()
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(text)
+        _replace(tmp, path)
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+            self._bytes.clear()
+            self._latency.clear()
+
+
+class RequestLog(object):
+    """
+    An after hook that writes every call as a JSON line.
+    Example usage:
+        >>> api.add_hook(after=zillow.metrics.RequestLog(open('calls.jsonl', 'a')))
+    """
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, info):
+        line = u'%s\n' % json.dumps(info.get_dict(), sort_keys=True, default=str)
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
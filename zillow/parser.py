@@ -0,0 +1,440 @@
+"""
+Incremental parsers for web service responses.
+
+Rather than turning a whole response into one nested dict, the parsers only
+build the sections that hold properties (a search result, a principal, each
+comp). Each section is built in the same shape xmltodict gives it, so
+Place.set_data reads it the same whichever parser backend is used, and is
+handed on as soon as its closing tag is read.
+
+Backends: 'expat' and 'etree' from the standard library, 'lxml' if it is
+installed, and 'xmltodict'. The fastest installed one is used unless a
+ValuationApi is given another.
+"""
+
+import io
+from collections import OrderedDict
+from xml.parsers import expat
+
+from .error import ZillowError
+from .metrics import _clock
+from .place import Place
+
+
+SEARCH_RESULT = ('SearchResults:searchresults', 'response', 'results', 'result')
+ZESTIMATE = ('Zestimate:zestimate', 'response')
+COMPS_PRINCIPAL = ('Comps:comps', 'response', 'properties', 'principal')
+COMPS_COMP = ('Comps:comps', 'response', 'properties', 'comparables', 'comp')
+# The status message of each kind of response
+MESSAGES = (
+    ('SearchResults:searchresults', 'message'),
+    ('Zestimate:zestimate', 'message'),
+    ('Comps:comps', 'message'),
+)
+
+# Bytes handed to expat at a time, so records are read out of large bodies
+# as they are completed.
+CHUNK_SIZE = 16 * 1024
+
+
+class _SectionBuilder(object):
+    """
+    expat handlers that build the elements at the wanted paths as
+    xmltodict-style dicts: attributes under '@name', text under '#text' when
+    there are attributes or children, repeated children as lists, and
+    surrounding whitespace stripped.
+    """
+    def __init__(self, paths):
+        self.paths = frozenset(paths)
+        self.depths = frozenset(len(path) for path in paths)
+        self.path = []
+        # (name, item, text parts) for each open element inside a section
+        self.stack = []
+        self.records = []
+
+    def start(self, name, attrs):
+        self.path.append(name)
+        if not self.stack:
+            if len(self.path) not in self.depths or tuple(self.path) not in self.paths:
+                return
+        item = None
+        if attrs:
+            item = dict(('@' + key, value) for key, value in attrs.items())
+        self.stack.append((name, item, []))
+
+    def end(self, name):
+        path = self.path
+        if self.stack:
+            _, item, parts = self.stack.pop()
+            data = (''.join(parts).strip() or None) if parts else None
+            if item is not None:
+                if data:
+                    item['#text'] = data
+            else:
+                item = data
+            if self.stack:
+                parent = self.stack[-1]
+                if parent[1] is None:
+                    self.stack[-1] = (parent[0], {name: item}, parent[2])
+                else:
+                    siblings = parent[1]
+                    if name in siblings:
+                        value = siblings[name]
+                        if isinstance(value, list):
+                            value.append(item)
+                        else:
+                            siblings[name] = [value, item]
+                    else:
+                        siblings[name] = item
+            else:
+                self.records.append((tuple(path), item))
+        path.pop()
+
+    def characters(self, data):
+        if self.stack:
+            self.stack[-1][2].append(data)
+
+
+class ExpatBackend(object):
+    """
+    The standard library backend: feeds the body to expat a chunk at a time
+    and builds only the wanted sections.
+    """
+    name = 'expat'
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        """
+        :param chunk_size: The number of bytes parsed between looking for finished records.
+        """
+        self.chunk_size = chunk_size
+
+    def iter_records(self, content, paths):
+        builder = _SectionBuilder(paths)
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = builder.start
+        parser.EndElementHandler = builder.end
+        parser.CharacterDataHandler = builder.characters
+
+        records = builder.records
+        chunk_size = self.chunk_size
+        try:
+            for start in range(0, len(content), chunk_size):
+                parser.Parse(content[start:start + chunk_size], False)
+                if records:
+                    for record in records:
+                        yield record
+                    del records[:]
+            parser.Parse(b'', True)
+        except expat.ExpatError as e:
+            raise ZillowError({'message': "Zillow did not return a valid response: %s" % e})
+        for record in records:
+            yield record
+
+
+class ElementTreeBackend(object):
+    """
+    A backend for ElementTree-compatible libraries: walks the body with
+    iterparse and converts each wanted element once it is complete.
+    """
+    name = 'etree'
+
+    def __init__(self, etree=None):
+        """
+        :param etree: The module providing iterparse (default: xml.etree.ElementTree).
+        """
+        if etree is None:
+            import xml.etree.ElementTree as etree
+        self.etree = etree
+
+    def iter_records(self, content, paths):
+        paths = frozenset(paths)
+        path = []
+        # ElementTree spells a prefixed name '{uri}name'; map it back to 'prefix:name'.
+        prefixes = {}
+        events = self.etree.iterparse(io.BytesIO(content), events=('start-ns', 'start', 'end'))
+        try:
+            for event, elem in events:
+                if event == 'start':
+                    path.append(self._Name(elem.tag, prefixes))
+                elif event == 'end':
+                    if tuple(path) in paths:
+                        yield tuple(path), self._Record(elem, prefixes)
+                        elem.clear()
+                    path.pop()
+                else:
+                    prefix, uri = elem
+                    prefixes[uri] = prefix
+        except SyntaxError as e:
+            # ElementTree's ParseError and lxml's XMLSyntaxError both derive from SyntaxError
+            raise ZillowError({'message': "Zillow did not return a valid response: %s" % e})
+
+    @staticmethod
+    def _Name(tag, prefixes):
+        if tag[:1] == '{':
+            uri, name = tag[1:].split('}', 1)
+            prefix = prefixes.get(uri)
+            if prefix:
+                return '%s:%s' % (prefix, name)
+            return name
+        return tag
+
+    def _Record(self, elem, prefixes):
+        item = None
+        if elem.attrib:
+            item = dict(('@' + self._Name(key, prefixes), value) for key, value in elem.attrib.items())
+        parts = [elem.text] if elem.text else []
+        for child in elem:
+            if child.tail:
+                parts.append(child.tail)
+            if not isinstance(child.tag, str):
+                # lxml keeps comments and processing instructions as children
+                continue
+            name = self._Name(child.tag, prefixes)
+            value = self._Record(child, prefixes)
+            if item is None:
+                item = {name: value}
+            elif name in item:
+                siblings = item[name]
+                if isinstance(siblings, list):
+                    siblings.append(value)
+                else:
+                    item[name] = [siblings, value]
+            else:
+                item[name] = value
+        data = ''.join(parts).strip() or None
+        if item is None:
+            return data
+        if data:
+            item['#text'] = data
+        return item
+
+
+class LxmlBackend(ElementTreeBackend):
+    """The ElementTree backend running on lxml. Requires lxml."""
+    name = 'lxml'
+
+    def __init__(self):
+        from lxml import etree
+        ElementTreeBackend.__init__(self, etree)
+
+
+class XmltodictBackend(object):
+    """
+    Parses the whole body with xmltodict, as python-zillow did before it had
+    backends. Kept for compatibility.
+    """
+    name = 'xmltodict'
+
+    def __init__(self):
+        import xmltodict
+        self.xmltodict = xmltodict
+
+    def iter_records(self, content, paths):
+        try:
+            data = self.xmltodict.parse(content)
+        except Exception as e:
+            raise ZillowError({'message': "Zillow did not return a valid response: %s" % e})
+        prefixes = frozenset(path[:i] for path in paths for i in range(1, len(path)))
+        return self._Walk(data, (), frozenset(paths), prefixes)
+
+    def _Walk(self, item, path, paths, prefixes):
+        if not isinstance(item, dict):
+            return
+        for name, value in item.items():
+            child_path = path + (name,)
+            wanted = child_path in paths
+            if not wanted and child_path not in prefixes:
+                continue
+            for element in (value if isinstance(value, list) else [value]):
+                if wanted:
+                    yield child_path, element
+                else:
+                    for record in self._Walk(element, child_path, paths, prefixes):
+                        yield record
+
+
+# Backends by name, fastest first, as measured by benchmarks/bench_parse.py.
+# lxml parses faster than expat, but turning its elements into dicts in
+# Python costs more than expat's callbacks save.
+BACKENDS = OrderedDict([
+    ('expat', ExpatBackend),
+    ('lxml', LxmlBackend),
+    ('etree', ElementTreeBackend),
+    ('xmltodict', XmltodictBackend),
+])
+
+
+def available_backends():
+    """
+    :return: The names of the backends whose libraries are installed, fastest first.
+    """
+    names = []
+    for name, backend in BACKENDS.items():
+        try:
+            backend()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(backend=None):
+    """
+    :param backend: A backend name, a backend instance, or None for the fastest available one.
+    :return: A backend instance.
+    """
+    global _default_backend
+    if backend is None:
+        if _default_backend is None:
+            # take the first that imports, without importing the slower ones
+            for cls in BACKENDS.values():
+                try:
+                    _default_backend = cls()
+                    break
+                except ImportError:
+                    continue
+        return _default_backend
+    if not isinstance(backend, str):
+        return backend
+    try:
+        return BACKENDS[backend]()
+    except KeyError:
+        raise ZillowError({'message': "Unknown parser backend: %s" % backend})
+    except ImportError:
+        raise ZillowError({'message': "The %s parser backend is not installed" % backend})
+
+
+_default_backend = None
+
+
+def iter_records(content, paths, backend=None):
+    """
+    Read the elements at the given paths out of a response.
+    :param content: The response body as bytes.
+    :param paths: Tuples of element names from the document root, e.g. COMPS_COMP.
+    :param backend: The parser backend, see get_backend.
+    :return: An iterator of (path, record) in document order, where record is the element as xmltodict would give it.
+    """
+    return get_backend(backend).iter_records(content, paths)
+
+
+def parse_message(content, backend=None):
+    """
+    Read the status message of a response.
+    :param content: The response body as bytes.
+    :param backend: The parser backend, see get_backend.
+    :return: A tuple of the message code as an int (0 on success) and its text, or (None, None) if there is none.
+    """
+    try:
+        for _, record in iter_records(content, MESSAGES, backend):
+            if isinstance(record, dict):
+                try:
+                    code = int(record.get('code'))
+                except (TypeError, ValueError):
+                    code = None
+                return code, record.get('text')
+    except ZillowError:
+        pass
+    return None, None
+
+
+def _Error(message, content, backend=None):
+    """
+    A ZillowError for a response without the expected data, carrying the
+    response's message code when it has one.
+    """
+    error = {'message': message}
+    code, text = parse_message(content, backend)
+    if code is not None:
+        error['code'] = code
+        error['text'] = text
+    return ZillowError(error)
+
+
+def _Invalid(content, backend=None):
+    return _Error("Zillow did not return a valid response: %s" % content.decode('utf-8', 'replace'),
+                  content, backend)
+
+
+def _Build(place, record, timings):
+    """Set a place's data from its record, adding the time taken to timings['model'] if timings is a dict."""
+    if timings is None:
+        place.set_data(record)
+        return
+    start = _clock()
+    try:
+        place.set_data(record)
+    finally:
+        timings['model'] = timings.get('model', 0.0) + _clock() - start
+
+
+def parse_place(content, path, has_extended_data=False, backend=None, lazy=False, timings=None):
+    """
+    Build a Place from the first element at path.
+    :param content: The response body as bytes.
+    :param path: SEARCH_RESULT or ZESTIMATE.
+    :param has_extended_data: Read the deep search fields as well.
+    :param backend: The parser backend, see get_backend.
+    :param lazy: Make a lazy Place, see Place.
+    :param timings: A dict to add the seconds spent building Places to, under 'model', or None.
+    :return: A Place.
+    """
+    for _, record in iter_records(content, (path,), backend):
+        place = Place(has_extended_data=has_extended_data, lazy=lazy)
+        try:
+            _Build(place, record, timings)
+        except Exception:
+            raise _Invalid(content, backend)
+        return place
+    raise _Invalid(content, backend)
+
+
+def iter_comps(content, has_extended_data=False, backend=None, lazy=False, timings=None):
+    """
+    Build Places from a GetComps or GetDeepComps response one at a time.
+    :param content: The response body as bytes.
+    :param has_extended_data: Read the deep comps fields as well.
+    :param backend: The parser backend, see get_backend.
+    :param lazy: Make lazy Places, see Place.
+    :param timings: A dict to add the seconds spent building Places to, as for parse_place.
+    :return: An iterator of ('principal', Place) followed by ('comp', Place) for each comp.
+    """
+    for path, record in iter_records(content, (COMPS_PRINCIPAL, COMPS_COMP), backend):
+        place = Place(has_extended_data=has_extended_data, lazy=lazy)
+        if path == COMPS_PRINCIPAL:
+            try:
+                _Build(place, record, timings)
+            except Exception:
+                raise _Error('No principal data found: %s' % content.decode('utf-8', 'replace'), content, backend)
+            yield 'principal', place
+        else:
+            try:
+                _Build(place, record, timings)
+            except Exception:
+                raise ZillowError({'message': 'No valid comp data found %s' % record})
+            yield 'comp', place
+
+
+def parse_comps(content, has_extended_data=False, backend=None, lazy=False, timings=None):
+    """
+    :param content: The response body of GetComps or GetDeepComps as bytes.
+    :param has_extended_data: Read the deep comps fields as well.
+    :param backend: The parser backend, see get_backend.
+    :param lazy: Make lazy Places, see Place.
+    :param timings: A dict to add the seconds spent building Places to, as for parse_place.
+    :return: A dict of the 'principal' Place and a list of 'comps' Places.
+    """
+    principal = None
+    comps = []
+    for kind, place in iter_comps(content, has_extended_data, backend, lazy, timings):
+        if kind == 'principal':
+            principal = place
+        else:
+            comps.append(place)
+    if principal is None:
+        raise _Error('No principal data found: %s' % content.decode('utf-8', 'replace'), content, backend)
+    return {
+        'principal': principal,
+        'comps': comps,
+    }
@@ -0,0 +1,130 @@
+"""
+Parsing responses in a pool of processes.
+
+An Api's fetch threads spend most of their time holding the GIL in the XML
+parser and Place.set_data, so adding threads stops adding throughput at
+about one core. With ValuationApi(parse_pool=ParsePool(4)) the threads only
+fetch the response bodies and wait, without the GIL, while worker
+processes parse them.
+
+Places cross back from a worker as rows: a tuple of the place's fields and
+one tuple of values per record, which pickle as a handful of strings and
+numbers and are turned back into Places with a setattr per field.
+"""
+
+import threading
+
+from .parser import get_backend, parse_comps, parse_place
+from .place import Place, _shared
+from .snapshot import RECORD_CLASSES, SHARED_FIELDS
+
+
+def to_row(place):
+    """
+    :return: A place as a tuple of plain values: its zpid, similarity_score and has_extended_data, then a tuple per record.
+    """
+    row = [place.zpid, place.similarity_score, place.has_extended_data]
+    for name, record_class in RECORD_CLASSES:
+        record = getattr(place, name)
+        row.append(tuple(getattr(record, field) for field in record_class.__slots__))
+    return tuple(row)
+
+
+def from_row(row):
+    """
+    :return: The Place a row from to_row was made from.
+    """
+    place = Place(has_extended_data=row[2])
+    place.zpid = row[0]
+    place.similarity_score = row[1]
+    for (name, record_class), values in zip(RECORD_CLASSES, row[3:]):
+        record = record_class()
+        for field, value in zip(record_class.__slots__, values):
+            if value is not None and field in SHARED_FIELDS:
+                value = _shared(value)
+            setattr(record, field, value)
+        # the slot behind the record's property
+        setattr(place, '_' + name, record)
+    return place
+
+
+def _ParsePlace(content, path, has_extended_data, backend):
+    """Runs in a worker: parse a single place response into a row."""
+    return to_row(parse_place(content, path, has_extended_data, backend))
+
+
+def _ParseComps(content, has_extended_data, backend):
+    """Runs in a worker: parse a comps response into a row for the principal and a list of rows for the comps."""
+    result = parse_comps(content, has_extended_data, backend)
+    return to_row(result['principal']), [to_row(place) for place in result['comps']]
+
+
+class ParsePool(object):
+    """
+    Worker processes that parse responses for an Api.
+    Example usage:
+        >>> with zillow.pipeline.ParsePool(4) as pool, zillow.ValuationApi(parse_pool=pool) as api:
+        ...     for outcome in api.GetZEstimateBatch(key, zpids, workers=32):
+        ...         ...
+
+    The workers start on first use. A pool may be shared by several Apis and
+    is not closed with them.
+    """
+    def __init__(self, workers=None, mp_context=None):
+        """
+        :param workers: The number of worker processes (default: the number of CPUs).
+        :param mp_context: The multiprocessing context to start workers with, e.g. multiprocessing.get_context('spawn').
+        """
+        self.workers = workers
+        self.mp_context = mp_context
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _Executor(self):
+        with self._lock:
+            if self._executor is None:
+                # imported here: concurrent.futures is slow to import and only pools need it
+                from concurrent.futures import ProcessPoolExecutor
+                if self.mp_context is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.mp_context)
+            return self._executor
+
+    def parse_place(self, content, path, has_extended_data=False, backend=None):
+        """
+        The counterpart of zillow.parser.parse_place, parsing in a worker.
+        :param backend: The parser backend or its name.
+        """
+        row = self._Executor().submit(_ParsePlace, content, path, has_extended_data, _Name(backend)).result()
+        return from_row(row)
+
+    def parse_comps(self, content, has_extended_data=False, backend=None):
+        """
+        The counterpart of zillow.parser.parse_comps, parsing in a worker.
+        :param backend: The parser backend or its name.
+        """
+        principal, comps = self._Executor().submit(_ParseComps, content, has_extended_data,
+                                                   _Name(backend)).result()
+        return {
+            'principal': from_row(principal),
+            'comps': [from_row(row) for row in comps],
+        }
+
+    def close(self):
+        """Stop the workers."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def _Name(backend):
+    """Backends are sent to workers by name."""
+    return get_backend(backend).name
@@ -1,8 +1,58 @@
 from abc import abstractmethod
 import warnings
 
+from .error import ZillowError
 
-class SourceData(classmethod):
+try:
+    from sys import intern
+except ImportError:
+    pass  # python 2: intern is a builtin
+
+
+def _int(value):
+    """Convert a numeric field to int, or None if it is missing or not a number."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+
+def _shared(value):
+    """
+    Intern a field that takes few distinct values (a city, a currency), so
+    that many places hold one copy of it.
+    """
+    if isinstance(value, str):
+        return intern(value)
+    return value
+
+
+def _Has(data, path):
+    """:return: True if the nested dicts of data hold every key of path in turn."""
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return False
+        data = data[key]
+    return True
+
+
+def _float(value):
+    """Convert a numeric field to float, or None if it is missing or not a number."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SourceData(object):
+    """
+    Base class for the records a Place is made of. Records use __slots__
+    rather than a per-instance __dict__, and their fields are the slots.
+    """
+    __slots__ = ()
 
     @abstractmethod
     def set_data(self, source_data):
@@ -13,27 +63,38 @@ class SourceData(classmethod):
 
     @abstractmethod
     def debug(self):
-        for i in self.__dict__.keys():
-            print("%s: %s" % (i, self.__dict__[i]))
+        for i in self.__slots__:
+            print("%s: %s" % (i, getattr(self, i)))
 
     @abstractmethod
     def get_dict(self):
         res = {}
-        for i in self.__dict__.keys():
-            res[i] = self.__dict__[i]
+        for i in self.__slots__:
+            res[i] = getattr(self, i)
         return res
 
+    def copy(self):
+        """
+        :return: A new record holding the same values.
+        """
+        other = self.__class__()
+        for i in self.__slots__:
+            setattr(other, i, getattr(self, i))
+        return other
+
     @abstractmethod
     def set_values_from_dict(self, data_dict):
         """
         @type data_dict: dict
         """
-        for i in self.__dict__.keys():
-            if i in data_dict.keys():
-                self.__dict__[i] = data_dict[i]
+        for i in self.__slots__:
+            if i in data_dict:
+                setattr(self, i, data_dict[i])
 
 
 class Links(SourceData):
+    __slots__ = ('home_details', 'graphs_and_data', 'map_this_home', 'comparables')
+
     def __init__(self, **kwargs):
         self.home_details = None
         self.graphs_and_data = None
@@ -54,6 +115,8 @@ class Links(SourceData):
         self.comparables = source_data['comparables']
 
 class FullAddress(SourceData):
+    __slots__ = ('street', 'zipcode', 'city', 'state', 'latitude', 'longitude')
+
     def __init__(self, **kwargs):
         self.street = None
         self.zipcode = None
@@ -68,13 +131,16 @@ class FullAddress(SourceData):
         :return:
         """
         self.street = source_data['street']
-        self.zipcode = source_data['zipcode']
-        self.city = source_data['city']
-        self.state = source_data['state']
-        self.latitude = source_data['latitude']
-        self.longitude = source_data['longitude']
+        self.zipcode = _shared(source_data['zipcode'])
+        self.city = _shared(source_data['city'])
+        self.state = _shared(source_data['state'])
+        self.latitude = _float(source_data['latitude'])
+        self.longitude = _float(source_data['longitude'])
 
 class ZEstimateData(SourceData):
+    __slots__ = ('amount', 'amount_currency', 'amount_last_updated', 'amount_change_30days',
+                 'valuation_range_low', 'valuation_range_high')
+
     def __init__(self, **kwargs):
         self.amount = None
         self.amount_currency = None
@@ -92,8 +158,8 @@ class ZEstimateData(SourceData):
             self.amount = int(source_data['amount']['#text'])
         except:
             self.amount = None
-        self.amount_currency = source_data['amount']['@currency']
-        self.amount_last_updated = source_data['last-updated']
+        self.amount_currency = _shared(source_data['amount']['@currency'])
+        self.amount_last_updated = _shared(source_data['last-updated'])
         try:
             self.amount_change_30days = int(source_data['valueChange']['#text'])
         except:
@@ -108,6 +174,9 @@ class ZEstimateData(SourceData):
             self.valuation_range_high = None
 
 class LocalRealEstate(SourceData):
+    __slots__ = ('region_name', 'region_id', 'region_type', 'overview_link', 'fsbo_link',
+                 'sale_link', 'zillow_home_value_index')
+
     def __init__(self):
         self.region_name = None
         self.region_id = None
@@ -122,15 +191,19 @@ class LocalRealEstate(SourceData):
         :source_data": Data from data.get('SearchResults:searchresults', None)['response']['results']['result']['localRealEstate']
         :return:
         """
-        self.region_name = source_data['region']['@name']
-        self.region_id = source_data['region']['@id']
-        self.region_type =  source_data['region']['@type']
+        self.region_name = _shared(source_data['region']['@name'])
+        self.region_id = _shared(source_data['region']['@id'])
+        self.region_type = _shared(source_data['region']['@type'])
         self.zillow_home_value_index = source_data.get('zindexValue', None)
-        self.overview_link =  source_data['region']['links']['overview']
-        self.fsbo_link =  source_data['region']['links']['forSaleByOwner']
-        self.sale_link =  source_data['region']['links']['forSale']
+        self.overview_link = _shared(source_data['region']['links']['overview'])
+        self.fsbo_link = _shared(source_data['region']['links']['forSaleByOwner'])
+        self.sale_link = _shared(source_data['region']['links']['forSale'])
 
 class ExtendedData(SourceData):
+    __slots__ = ('fips_county', 'usecode', 'tax_assessment_year', 'tax_assessment', 'year_built',
+                 'lot_size_sqft', 'finished_sqft', 'bathrooms', 'bedrooms', 'last_sold_date',
+                 'last_sold_price', 'complete')
+
     def __init__(self):
         self.fips_county = None
         self.usecode = None
@@ -147,34 +220,118 @@ class ExtendedData(SourceData):
 
     def set_data(self, source_data):
         self.fips_county = source_data.get('FIPScounty', None)
-        self.usecode = source_data['useCode']
-        self.tax_assessment_year = source_data.get('taxAssessmentYear', None)
-        self.tax_assessment = source_data.get('taxAssessment', None)
-        self.year_built = source_data.get('yearBuilt', None)
-        self.lot_size_sqft = source_data.get('lotSizeSqFt', None)
-        self.finished_sqft = source_data.get('finishedSqFt', None)
-        self.bathrooms = source_data.get('bathrooms', None)
-        self.bedrooms = source_data.get('bedrooms', None)
+        self.usecode = _shared(source_data['useCode'])
+        self.tax_assessment_year = _int(source_data.get('taxAssessmentYear', None))
+        self.tax_assessment = _float(source_data.get('taxAssessment', None))
+        self.year_built = _int(source_data.get('yearBuilt', None))
+        self.lot_size_sqft = _int(source_data.get('lotSizeSqFt', None))
+        self.finished_sqft = _int(source_data.get('finishedSqFt', None))
+        self.bathrooms = _float(source_data.get('bathrooms', None))
+        self.bedrooms = _int(source_data.get('bedrooms', None))
         self.last_sold_date = source_data.get('lastSoldDate', None)
         price_element = source_data.get('lastSoldPrice', None)
         if price_element is not None:
-            self.last_sold_price = price_element.get('#text', None)
+            self.last_sold_price = _int(price_element.get('#text', None))
         self.complete = True
 
 
+class RecordSource(object):
+    """
+    Where a lazy Place reads its records from when they don't come from a
+    parsed section, such as a snapshot file.
+    """
+    __slots__ = ()
+
+    @abstractmethod
+    def load(self, name, record):
+        """
+        Fill in one record of the place.
+        :param name: The record's name in Place.RECORDS.
+        :param record: An empty instance of the record's class.
+        """
+        raise NotImplementedError()
+
+
+def _record_property(slot, record_class, key):
+    """
+    A Place attribute holding one of its records. A lazy Place decodes the
+    record from its raw section the first time the attribute is read.
+    :param slot: The slot the record is kept in.
+    :param record_class: The SourceData subclass of the record.
+    :param key: The key of the record's data in the section, or None for the extended data, which is read from the section itself.
+    """
+    def get(self):
+        record = getattr(self, slot)
+        if record is None:
+            record = record_class()
+            source = self._source
+            if source is not None:
+                if isinstance(source, RecordSource):
+                    source.load(slot[1:], record)
+                elif key is not None:
+                    record.set_data(source[key])
+                elif self.has_extended_data:
+                    record.set_data(source)
+            setattr(self, slot, record)
+            if source is not None and None not in (self._links, self._full_address, self._zestimate,
+                                                   self._local_realestate, self._extended_data):
+                # every record is decoded; the section is no longer needed
+                self._source = None
+        return record
+
+    def set(self, record):
+        setattr(self, slot, record)
+
+    return property(get, set)
+
+
 class Place(SourceData):
     """
     A class representing a property and it's details
+
+    A lazy Place keeps the raw section it was given and decodes each record
+    (links, full_address, zestimate, local_realestate, extended_data) the
+    first time it is read, which saves work when only a few fields are used.
+    The zpid and similarity_score are always read at once.
     """
-    def __init__(self, has_extended_data=False):
+    __slots__ = ('zpid', '_links', '_full_address', '_zestimate', '_local_realestate',
+                 'similarity_score', '_extended_data', 'has_extended_data', 'lazy', '_source')
+
+    RECORDS = ('links', 'full_address', 'zestimate', 'local_realestate', 'extended_data')
+
+    # The fields the records' set_data read without a default, checked up front by a lazy Place as an
+    # eager one would fail on them.
+    REQUIRED_FIELDS = (
+        ('links', 'homedetails'), ('links', 'mapthishome'), ('links', 'comparables'),
+        ('address', 'street'), ('address', 'zipcode'), ('address', 'city'), ('address', 'state'),
+        ('address', 'latitude'), ('address', 'longitude'),
+        ('zestimate', 'amount', '@currency'), ('zestimate', 'last-updated'),
+        ('localRealEstate', 'region', '@name'), ('localRealEstate', 'region', '@id'),
+        ('localRealEstate', 'region', '@type'), ('localRealEstate', 'region', 'links', 'overview'),
+        ('localRealEstate', 'region', 'links', 'forSaleByOwner'), ('localRealEstate', 'region', 'links', 'forSale'),
+    )
+
+    links = _record_property('_links', Links, 'links')
+    full_address = _record_property('_full_address', FullAddress, 'address')
+    zestimate = _record_property('_zestimate', ZEstimateData, 'zestimate')
+    local_realestate = _record_property('_local_realestate', LocalRealEstate, 'localRealEstate')
+    extended_data = _record_property('_extended_data', ExtendedData, None)
+
+    def __init__(self, has_extended_data=False, lazy=False):
+        """
+        :param has_extended_data: Read the deep search fields as well.
+        :param lazy: Decode records on first access rather than in set_data.
+        """
         self.zpid = None
-        self.links = Links()
-        self.full_address = FullAddress()
-        self.zestimate = ZEstimateData()
-        self.local_realestate = LocalRealEstate()
         self.similarity_score = None
-        self.extended_data = ExtendedData()
         self.has_extended_data = has_extended_data
+        self.lazy = lazy
+        self._source = None
+        self._links = None
+        self._full_address = None
+        self._zestimate = None
+        self._local_realestate = None
+        self._extended_data = None
 
     @property
     def zestiamte(self):
@@ -195,7 +352,17 @@ class Place(SourceData):
         """
 
         self.zpid = source_data.get('zpid', None)
-        self.similarity_score = source_data.get('@score', None)
+        self.similarity_score = _float(source_data.get('@score', None))
+        if self.lazy:
+            missing = ['.'.join(path) for path in self.REQUIRED_FIELDS if not _Has(source_data, path)]
+            if self.has_extended_data and 'useCode' not in source_data:
+                missing.append('useCode')
+            if missing:
+                raise ZillowError({'message': "Missing %s for zpid %s" % (', '.join(missing), self.zpid)})
+            self._links = self._full_address = self._zestimate = None
+            self._local_realestate = self._extended_data = None
+            self._source = source_data
+            return
         self.links.set_data(source_data['links'])
         self.full_address.set_data(source_data['address'])
         self.zestimate.set_data(source_data['zestimate'])
@@ -203,6 +370,27 @@ class Place(SourceData):
         if self.has_extended_data:
             self.extended_data.set_data(source_data)
 
+    def debug(self):
+        print("zpid: %s" % self.zpid)
+        print("similarity_score: %s" % self.similarity_score)
+        for name in self.RECORDS:
+            print("%s: %s" % (name, getattr(self, name).get_dict()))
+
+    def copy(self):
+        """
+        :return: A copy of the place that shares no records with it.
+        """
+        other = Place(has_extended_data=self.has_extended_data, lazy=self.lazy)
+        other.zpid = self.zpid
+        other.similarity_score = self.similarity_score
+        # the raw section is only read, never changed, so it can be shared
+        other._source = self._source
+        for slot in ('_links', '_full_address', '_zestimate', '_local_realestate', '_extended_data'):
+            record = getattr(self, slot)
+            if record is not None:
+                setattr(other, slot, record.copy())
+        return other
+
     def get_dict(self):
         data = {
             'zpid': self.zpid,
@@ -214,3 +402,18 @@ class Place(SourceData):
             'extended_data': self.extended_data.get_dict()
         }
         return data
+
+    def set_values_from_dict(self, data_dict):
+        """
+        Set the place's values from the output of get_dict.
+        @type data_dict: dict
+        """
+        self.zpid = data_dict.get('zpid', self.zpid)
+        self.similarity_score = data_dict.get('similarity_score', self.similarity_score)
+        for name in self.RECORDS:
+            if data_dict.get(name) is not None:
+                getattr(self, name).set_values_from_dict(data_dict[name])
+        if 'has_extended_data' in data_dict:
+            self.has_extended_data = data_dict['has_extended_data']
+        elif self.extended_data.complete:
+            self.has_extended_data = True
@@ -0,0 +1,242 @@
+"""
+Client-side scheduling of calls against each key's quota.
+
+Zillow limits the number of calls each zws-id may make per day. A
+QuotaScheduler hands out calls per key from a token bucket, which smooths
+the call rate, and from a daily budget. Callers wait in a bounded queue in
+priority order: interactive calls go first, and batch calls only get what
+is left, never the share of the daily budget set aside for interactive use.
+
+A call the scheduler turns away raises a ZillowError whose message dict has
+'throttled' set and no 'code': the web service's message codes, such as 7
+for a used up daily limit, only come from its responses.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from .error import ZillowError
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: 'interactive', PRIORITY_BATCH: 'batch'}
+
+
+class _KeyQuota(object):
+    """The bucket, daily budget and wait queue of one zws-id."""
+    def __init__(self, zws_id, rate, burst, daily_limit, interactive_reserve, now):
+        self.zws_id = zws_id
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.daily_limit = daily_limit
+        self.interactive_reserve = interactive_reserve
+        self.tokens = float(burst)
+        self.updated = now
+        self.period_start = now
+        self.used = 0
+        # (priority, sequence) of the callers waiting, lowest first
+        self.waiting = []
+        self.granted = dict((priority, 0) for priority in PRIORITY_NAMES)
+        self.rejected = 0
+        self.timed_out = 0
+
+    def refill(self, now, period):
+        if now - self.period_start >= period:
+            self.period_start = now - (now - self.period_start) % period
+            self.used = 0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def budget_left(self, priority):
+        if self.daily_limit is None:
+            return True
+        limit = self.daily_limit
+        if priority != PRIORITY_INTERACTIVE:
+            limit -= self.interactive_reserve
+        return self.used < limit
+
+
+class QuotaScheduler(object):
+    """
+    Schedules calls per zws-id with a token bucket, a daily budget and
+    priority classes.
+    Example usage:
+        >>> scheduler = QuotaScheduler(rate=2, burst=5, daily_limit=1000, interactive_reserve=200)
+        >>> api = zillow.ValuationApi(scheduler=scheduler)
+        >>> scheduler.stats("<your key here>")['remaining']
+    """
+    def __init__(self, rate=1.0, burst=1, daily_limit=None, interactive_reserve=0,
+                 max_waiting=1000, timeout=None, period=24 * 3600, limits=None, clock=time.time):
+        """
+        :param rate: Calls per second each key may make.
+        :param burst: The number of calls a key may make at once after being idle.
+        :param daily_limit: The number of calls a key may make per period, or None for no limit.
+        :param interactive_reserve: The part of daily_limit that batch calls may not use.
+        :param max_waiting: The maximum number of callers waiting per key. More are turned away.
+        :param timeout: Seconds a caller waits by default before giving up, or None to wait as long as it takes.
+        :param period: Seconds after which the daily budget starts over.
+        :param limits: A dict of zws-id to a dict of rate, burst, daily_limit and interactive_reserve for that key.
+        :param clock: Returns the current time in seconds.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.daily_limit = daily_limit
+        self.interactive_reserve = interactive_reserve
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.period = period
+        self.limits = dict(limits or {})
+        self._clock = clock
+        self._keys = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _Key(self, zws_id, now):
+        quota = self._keys.get(zws_id)
+        if quota is None:
+            settings = {
+                'rate': self.rate,
+                'burst': self.burst,
+                'daily_limit': self.daily_limit,
+                'interactive_reserve': self.interactive_reserve,
+            }
+            settings.update(self.limits.get(zws_id, {}))
+            quota = self._keys[zws_id] = _KeyQuota(zws_id, now=now, **settings)
+        return quota
+
+    def _Enqueue(self, zws_id, priority):
+        now = self._clock()
+        quota = self._Key(zws_id, now)
+        if len(quota.waiting) >= self.max_waiting:
+            quota.rejected += 1
+            raise ZillowError({'message': "Too many calls waiting for quota on %s" % zws_id, 'throttled': True})
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(quota.waiting, ticket)
+        return quota, ticket
+
+    def _TryGrant(self, quota, ticket):
+        """
+        :return: 0 if the call may go ahead, otherwise seconds until it is worth asking again.
+        """
+        now = self._clock()
+        quota.refill(now, self.period)
+        if quota.waiting[0] != ticket:
+            return None
+        priority = ticket[0]
+        if not quota.budget_left(priority):
+            raise ZillowError({'message': "The daily quota for %s is used up for %s calls"
+                               % (quota.zws_id, PRIORITY_NAMES.get(priority, priority)),
+                               'throttled': True})
+        if quota.tokens < 1:
+            return (1 - quota.tokens) / quota.rate if quota.rate > 0 else None
+        quota.tokens -= 1
+        quota.used += 1
+        quota.granted[priority] = quota.granted.get(priority, 0) + 1
+        heapq.heappop(quota.waiting)
+        return 0
+
+    def _Leave(self, quota, ticket):
+        quota.waiting.remove(ticket)
+        heapq.heapify(quota.waiting)
+
+    def _Deadline(self, timeout):
+        if timeout is None:
+            timeout = self.timeout
+        return None if timeout is None else self._clock() + timeout
+
+    def acquire(self, zws_id, priority=PRIORITY_INTERACTIVE, timeout=None):
+        """
+        Wait for the right to make one call with a key.
+        :param zws_id: The key the call is made with.
+        :param priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH.
+        :param timeout: Seconds to wait before giving up (default: the scheduler's timeout).
+        :raises ZillowError: If the queue is full, the wait times out or the key's daily budget is used up.
+        """
+        deadline = self._Deadline(timeout)
+        with self._changed:
+            quota, ticket = self._Enqueue(zws_id, priority)
+            try:
+                while True:
+                    wait = self._TryGrant(quota, ticket)
+                    if wait == 0:
+                        self._changed.notify_all()
+                        return
+                    if deadline is not None:
+                        left = deadline - self._clock()
+                        if left <= 0:
+                            quota.timed_out += 1
+                            raise ZillowError({'message': "Timed out waiting for quota on %s" % zws_id,
+                                               'throttled': True})
+                        wait = left if wait is None else min(wait, left)
+                    self._changed.wait(wait)
+            except ZillowError:
+                self._Leave(quota, ticket)
+                self._changed.notify_all()
+                raise
+
+    def try_acquire(self, zws_id, priority=PRIORITY_INTERACTIVE, ticket=None):
+        """
+        Take a place in the queue, or check on one, without blocking. Used
+        by callers that cannot block, such as AsyncValuationApi.
+        :param ticket: The ticket from an earlier call, or None to join the queue.
+        :return: A tuple of the ticket and 0 if the call may go ahead, or else the seconds until it is worth asking again (None if unknown).
+        :raises ZillowError: If the queue is full or the key's daily budget is used up.
+        """
+        with self._changed:
+            if ticket is None:
+                ticket = self._Enqueue(zws_id, priority)
+            quota, position = ticket
+            try:
+                wait = self._TryGrant(quota, position)
+            except ZillowError:
+                self._Leave(quota, position)
+                self._changed.notify_all()
+                raise
+            if wait == 0:
+                self._changed.notify_all()
+            return ticket, wait
+
+    def release(self, ticket, timed_out=False):
+        """
+        Leave the queue without making the call.
+        :param ticket: The ticket from try_acquire.
+        :param timed_out: Count the caller as timed out.
+        """
+        with self._changed:
+            quota, position = ticket
+            if position in quota.waiting:
+                self._Leave(quota, position)
+                if timed_out:
+                    quota.timed_out += 1
+                self._changed.notify_all()
+
+    def stats(self, zws_id=None):
+        """
+        :param zws_id: A key, or None for every key seen so far.
+        :return: A dict of the key's remaining daily budget, available tokens, waiting callers by priority and call counts; or a dict of such dicts by key.
+        """
+        with self._lock:
+            if zws_id is None:
+                return dict((key, self._Stats(quota)) for key, quota in self._keys.items())
+            return self._Stats(self._Key(zws_id, self._clock()))
+
+    def _Stats(self, quota):
+        quota.refill(self._clock(), self.period)
+        waiting = dict((name, 0) for name in PRIORITY_NAMES.values())
+        for priority, _ in quota.waiting:
+            name = PRIORITY_NAMES.get(priority, priority)
+            waiting[name] = waiting.get(name, 0) + 1
+        return {
+            'remaining': None if quota.daily_limit is None else max(0, quota.daily_limit - quota.used),
+            'used': quota.used,
+            'tokens': quota.tokens,
+            'waiting': waiting,
+            'granted': dict((PRIORITY_NAMES.get(p, p), n) for p, n in quota.granted.items()),
+            'rejected': quota.rejected,
+            'timed_out': quota.timed_out,
+        }
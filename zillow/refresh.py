@@ -0,0 +1,236 @@
+"""
+Incremental re-valuation of a portfolio of places.
+
+Zillow recomputes a Zestimate every so often, and amount_last_updated says
+when it last did. A Revaluer goes through the places of an earlier run (a
+Snapshot, or any iterable of Places), picks out the ones whose Zestimate is
+due for a refresh under a StalenessPolicy, calls GetZEstimate for those
+only, and yields a Change for each one whose amount, valuation range or 30
+day change moved, and an Unchanged for each one that did not. Writing
+either back with apply_changes carries the new amount_last_updated into the
+next run, so a refreshed place is not due again until its Zestimate ages.
+Reading the earlier run costs a decode of each place's zestimate record;
+calls, and the changeset, grow with the number of places due and changed.
+
+With a state file the Revaluer remembers when it last checked each zpid,
+so a Zestimate that is due but came back unchanged is not asked for again
+until the policy's recheck interval has passed.
+"""
+
+import json
+import os
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from .batch import run_batch
+from .quota import PRIORITY_BATCH
+
+
+# The Zestimate fields compared between runs.
+CHANGE_FIELDS = ('amount', 'valuation_range_low', 'valuation_range_high', 'amount_change_30days')
+
+# A Zestimate that moved: a dict of field name to (old, new) value, and the place of the earlier run with its
+# new zestimate record.
+Change = namedtuple('Change', ['zpid', 'changes', 'place'])
+
+# A Zestimate that was refetched and did not move: the place of the earlier run with its new zestimate record,
+# which may carry a newer amount_last_updated.
+Unchanged = namedtuple('Unchanged', ['zpid', 'place'])
+
+# A place whose Zestimate could not be refreshed, and the ZillowError why.
+RefreshError = namedtuple('RefreshError', ['zpid', 'error'])
+
+
+def parse_date(text):
+    """
+    :param text: A date as Zillow writes it, e.g. '01/03/2016'.
+    :return: A datetime.date, or None if there is none.
+    """
+    if not text:
+        return None
+    try:
+        return datetime.strptime(text.strip(), '%m/%d/%Y').date()
+    except ValueError:
+        return None
+
+
+class StalenessPolicy(object):
+    """
+    When a Zestimate is due for a refresh.
+    Example usage:
+        >>> policy = StalenessPolicy(max_age=7, recheck=1,
+        ...                          rules=[(lambda place: place.zestimate.amount > 2000000, 3)])
+
+    A Zestimate is due once max_age days have passed since its
+    amount_last_updated date, or if it has none, unless it was checked less
+    than recheck days ago.
+    """
+    def __init__(self, max_age=7, recheck=1, rules=None):
+        """
+        :param max_age: Days after its last update a Zestimate is due.
+        :param recheck: Days to wait before asking again for a due Zestimate that was checked.
+        :param rules: A list of (predicate, max_age): the max_age of the first whose predicate(place) is true applies instead.
+        """
+        self.max_age = max_age
+        self.recheck = recheck
+        self.rules = list(rules or [])
+
+    def max_age_of(self, place):
+        for predicate, max_age in self.rules:
+            if predicate(place):
+                return max_age
+        return self.max_age
+
+    def due(self, place, today, checked=None):
+        """
+        :param place: A Place of the earlier run.
+        :param today: The date of this run.
+        :param checked: The date the place's Zestimate was last checked, or None.
+        :return: True if the Zestimate should be fetched again.
+        """
+        if checked is not None and today - checked < timedelta(days=self.recheck):
+            return False
+        updated = parse_date(place.zestimate.amount_last_updated)
+        if updated is None:
+            return True
+        return today - updated >= timedelta(days=self.max_age_of(place))
+
+
+def diff(old, new, fields=CHANGE_FIELDS):
+    """
+    :param old: The zestimate record of the earlier run.
+    :param new: The zestimate record just fetched.
+    :return: A dict of field name to (old, new) value for the fields that differ.
+    """
+    changes = {}
+    for name in fields:
+        before = getattr(old, name)
+        after = getattr(new, name)
+        if before != after:
+            changes[name] = (before, after)
+    return changes
+
+
+class Revaluer(object):
+    """
+    Refreshes the Zestimates of a portfolio that are due, and reports what moved.
+    Example usage:
+        >>> revaluer = Revaluer(api, "<your key here>", state='revalue.state')
+        >>> with Snapshot('portfolio.zsnp') as places, open('changes.jsonl', 'w') as out:
+        ...     refreshed = {}
+        ...     for item in revaluer.refresh(places):
+        ...         if isinstance(item, RefreshError):
+        ...             continue
+        ...         refreshed[item.zpid] = item
+        ...         if isinstance(item, Change):
+        ...             write_change(out, item)
+        ...     write_snapshot('portfolio-new.zsnp', apply_changes(places, refreshed))
+    """
+    def __init__(self, api, zws_id, policy=None, workers=8, state=None, fields=CHANGE_FIELDS,
+                 priority=PRIORITY_BATCH):
+        """
+        :param api: The ValuationApi to call GetZEstimate with.
+        :param zws_id: The Zillow Web Service Identifier.
+        :param policy: The StalenessPolicy (default: a Zestimate is due a week after its last update).
+        :param workers: The number of lookups run at once.
+        :param state: The path of a file to remember when each zpid was checked in, or None.
+        :param fields: The zestimate fields compared.
+        :param priority: The scheduling priority of the lookups.
+        """
+        self.api = api
+        self.zws_id = zws_id
+        self.policy = policy or StalenessPolicy()
+        self.workers = workers
+        self.state = state
+        self.fields = fields
+        self.priority = priority
+        self._checked = {}
+        self.stats = {'places': 0, 'due': 0, 'changed': 0, 'failed': 0}
+
+    def due(self, places, today=None):
+        """
+        :return: An iterator of the places whose Zestimate is due.
+        """
+        today = today or date.today()
+        checked = self._checked
+        policy = self.policy
+        for place in places:
+            self.stats['places'] += 1
+            if place.zpid is None:
+                continue
+            if policy.due(place, today, checked.get(str(place.zpid))):
+                self.stats['due'] += 1
+                yield place
+
+    def refresh(self, places, today=None):
+        """
+        :param places: The places of the earlier run.
+        :param today: The date of this run (default: today).
+        :return: An iterator of Change, Unchanged and RefreshError, in the order the lookups finish.
+        """
+        today = today or date.today()
+        self.stats = dict((name, 0) for name in self.stats)
+        self._Load()
+        log = open(self.state, 'a') if self.state is not None else None
+        try:
+            for outcome in run_batch(self._Lookup, self.due(places, today), workers=self.workers, ordered=False):
+                old = outcome.item
+                zpid = str(old.zpid)
+                if not outcome.ok:
+                    self.stats['failed'] += 1
+                    yield RefreshError(zpid, outcome.error)
+                    continue
+                self._checked[zpid] = today
+                if log is not None:
+                    log.write(json.dumps({'zpid': zpid, 'checked': today.isoformat()}) + '\n')
+                new = outcome.result.zestimate
+                changes = diff(old.zestimate, new, self.fields)
+                place = old.copy()
+                place.zestimate = new
+                if changes:
+                    self.stats['changed'] += 1
+                    yield Change(zpid, changes, place)
+                else:
+                    yield Unchanged(zpid, place)
+        finally:
+            if log is not None:
+                log.close()
+
+    def _Lookup(self, place):
+        return self.api.GetZEstimate(self.zws_id, place.zpid, refresh_cache=True, priority=self.priority)
+
+    def _Load(self):
+        self._checked = {}
+        if self.state is None or not os.path.exists(self.state):
+            return
+        with open(self.state) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line may be cut short by a crash
+                    continue
+                self._checked[entry['zpid']] = datetime.strptime(entry['checked'], '%Y-%m-%d').date()
+
+
+def write_change(stream, change):
+    """
+    Write a Change as a JSON line: the zpid, the amount_last_updated and each changed field's old and new value.
+    """
+    # unicode, which an io text stream needs on python 2
+    stream.write(u'%s\n' % json.dumps({
+        'zpid': change.zpid,
+        'amount_last_updated': change.place.zestimate.amount_last_updated,
+        'changes': dict((name, list(values)) for name, values in change.changes.items()),
+    }, sort_keys=True))
+
+
+def apply_changes(places, changes):
+    """
+    :param places: The places of the earlier run.
+    :param changes: A dict of zpid to Change or Unchanged.
+    :return: An iterator of the places, with the refreshed ones replaced, e.g. to write the next snapshot.
+    """
+    for place in places:
+        change = changes.get(str(place.zpid))
+        yield place if change is None else change.place
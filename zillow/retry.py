@@ -0,0 +1,180 @@
+"""
+Retrying failed calls and hedging slow ones.
+
+A RetryPolicy decides which failures are worth another try: network
+errors, HTTP 429 and 5xx responses without data, and Zillow message codes
+that report a passing problem on the server. It waits between tries with
+capped exponential backoff and full jitter, and gives up rather than let a
+call run past its deadline.
+
+With hedging on, a call still waiting for its response after a threshold,
+fixed or a percentile of recent response times, sends a second request and
+uses whichever answers first. The second request counts against the quota
+like any other.
+"""
+
+import random
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+
+from .metrics import _clock
+
+
+# Zillow message codes: a server-side error, the web services or the API
+# call being unavailable for now, and the request timing out.
+TRANSIENT_CODES = frozenset([1, 3, 4, 505])
+# HTTP statuses worth retrying.
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class RetryPolicy(object):
+    """
+    When and how often an Api retries a call.
+    Example usage:
+        >>> policy = zillow.RetryPolicy(attempts=4, deadline=10, hedge_percentile=95)
+        >>> api = zillow.ValuationApi(retry=policy)
+        >>> policy.stats()
+    """
+    def __init__(self, attempts=3, backoff=0.1, max_backoff=5.0, multiplier=2.0, jitter=True, deadline=None,
+                 codes=TRANSIENT_CODES, statuses=RETRY_STATUSES, network=True, hedge_after=None,
+                 hedge_percentile=None, hedge_window=1000, hedge_min_samples=20, clock=_clock,
+                 random=random.random):
+        """
+        :param attempts: The most requests a call may make in turn, the first included.
+        :param backoff: Seconds to wait before the first retry, doubled (by multiplier) for each one after.
+        :param max_backoff: The longest wait between two tries.
+        :param multiplier: The growth of the wait from one retry to the next.
+        :param jitter: Wait a random time between nothing and the backoff, so clients that failed together don't retry together (default: True).
+        :param deadline: Seconds a call may take, retries included, or None for no limit.
+        :param codes: The Zillow message codes to retry.
+        :param statuses: The HTTP statuses to retry, when the response holds no data.
+        :param network: Retry connection errors and timeouts (default: True).
+        :param hedge_after: Send a second request when the first has not answered in this many seconds.
+        :param hedge_percentile: Send a second request when the first has taken longer than this percentile of recent response times.
+        :param hedge_window: The number of recent response times the percentile is taken over.
+        :param hedge_min_samples: The number of response times to see before hedging by percentile.
+        :param clock: Returns the current time in seconds.
+        :param random: Returns a random float in [0, 1).
+        """
+        self.attempts = max(1, attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.deadline = deadline
+        self.codes = frozenset(codes)
+        self.statuses = frozenset(statuses)
+        self.network = network
+        self.hedge_after = hedge_after
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self._clock = clock
+        self._random = random
+        self._lock = threading.Lock()
+        # recent response times, in arrival order and sorted
+        self._recent = deque(maxlen=hedge_window)
+        self._sorted = []
+        self._counts = {'retries': 0, 'gave_up': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    @property
+    def hedging(self):
+        return self.hedge_after is not None or self.hedge_percentile is not None
+
+    def retryable(self, error):
+        """
+        :param error: A ZillowError.
+        :return: True if the error may go away when the request is sent again.
+        """
+        message = error.message if error.args else None
+        if not isinstance(message, dict):
+            return False
+        if message.get('network'):
+            return self.network
+        if message.get('code') in self.codes:
+            return True
+        return message.get('http_status') in self.statuses
+
+    def delay(self, retry):
+        """
+        :param retry: The number of the retry, from 1.
+        :return: Seconds to wait before it.
+        """
+        delay = min(self.max_backoff, self.backoff * self.multiplier ** (retry - 1))
+        if self.jitter:
+            delay *= self._random()
+        return delay
+
+    def start(self):
+        """
+        :return: The time a call starts, to pass to next_delay and timeout.
+        """
+        return self._clock()
+
+    def next_delay(self, attempt, error, started):
+        """
+        :param attempt: The number of requests the call has made.
+        :param error: The ZillowError the last one failed with.
+        :param started: When the call started, from start.
+        :return: Seconds to wait before trying again, or None to give up.
+        """
+        if attempt >= self.attempts or not self.retryable(error):
+            return None
+        delay = self.delay(attempt)
+        if self.deadline is not None and self._clock() + delay >= started + self.deadline:
+            self._Count('gave_up')
+            return None
+        self._Count('retries')
+        return delay
+
+    def timeout(self, started, timeout):
+        """
+        :param started: When the call started, from start.
+        :param timeout: The Api's request timeout.
+        :return: The timeout of the next request, cut short to end by the deadline.
+        """
+        if self.deadline is None or isinstance(timeout, tuple):
+            return timeout
+        # requests refuses a timeout of 0
+        left = max(0.001, started + self.deadline - self._clock())
+        return left if timeout is None else min(timeout, left)
+
+    def observe(self, seconds):
+        """Record the response time of a request."""
+        if self.hedge_percentile is None:
+            return
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                del self._sorted[bisect_left(self._sorted, self._recent[0])]
+            self._recent.append(seconds)
+            insort(self._sorted, seconds)
+
+    def hedge_delay(self):
+        """
+        :return: Seconds to wait for a response before sending a second request, or None not to hedge.
+        """
+        if self.hedge_percentile is None:
+            return self.hedge_after
+        with self._lock:
+            count = len(self._sorted)
+            if count < self.hedge_min_samples:
+                return self.hedge_after
+            index = min(count - 1, int(count * self.hedge_percentile / 100.0))
+            return self._sorted[index]
+
+    def hedged(self, won):
+        """Count a hedged request, and whether it answered first."""
+        self._Count('hedges')
+        if won:
+            self._Count('hedge_wins')
+
+    def _Count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self):
+        """
+        :return: A dict of the retries made, the calls given up at their deadline, the hedged requests sent and those that answered first.
+        """
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,458 @@
+"""
+A compact binary file format for sequences of Places.
+
+A snapshot is written one place at a time and read back through mmap, so
+opening one costs the same whatever its size: only the header and footer
+are read. Places are decoded when they are asked for, by position or by
+zpid, and with lazy=True each of their records is decoded the first time
+it is read.
+
+Layout, little-endian:
+
+    header          b'ZSNP', format version (uint16), schema length (uint32),
+                    schema (JSON: the field names of each record, in order)
+    records         one per place, see below
+    strings         the shared strings, each a uint32 length and UTF-8
+    offsets         uint64 start of each record, then the end of the last
+    string offsets  uint64 start of each shared string
+    zpid index      (int64 zpid, uint32 position) sorted by zpid
+    footer          the counts and starts of the sections above, b'ZSNP'
+
+A record holds the place's zpid, similarity_score and has_extended_data,
+then for each of Place.RECORDS a uint32 length and the record's fields.
+Each value is a type byte followed by its data. Strings of fields that
+take few distinct values (a city, a region) are written once, in the
+strings section, and referred to by number.
+"""
+
+import json
+import mmap
+import struct
+from array import array
+
+from .error import ZillowError
+from .place import (ExtendedData, FullAddress, LocalRealEstate, Links, Place, RecordSource,
+                    ZEstimateData, _shared)
+
+
+MAGIC = b'ZSNP'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sHI')
+_FOOTER = struct.Struct('<QQQQQQ4s')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_INT = struct.Struct('<q')
+_FLOAT = struct.Struct('<d')
+_ZPID_ENTRY = struct.Struct('<qI')
+
+_NONE, _FALSE, _TRUE, _INT_TAG, _FLOAT_TAG, _STR, _SHARED, _BIGINT = range(8)
+
+# python 2: indexing the mmap gives a 1 character str rather than an int, and large ints are longs
+_BYTES_ARE_STR = bytes is str
+try:
+    _INTEGERS = (int, long)
+except NameError:
+    _INTEGERS = int
+
+RECORD_CLASSES = (
+    ('links', Links),
+    ('full_address', FullAddress),
+    ('zestimate', ZEstimateData),
+    ('local_realestate', LocalRealEstate),
+    ('extended_data', ExtendedData),
+)
+
+PLACE_FIELDS = ('zpid', 'similarity_score', 'has_extended_data')
+
+# Fields whose strings are written once and referred to by number.
+SHARED_FIELDS = frozenset(['zipcode', 'city', 'state', 'amount_currency', 'amount_last_updated',
+                           'region_name', 'region_id', 'region_type', 'overview_link', 'fsbo_link',
+                           'sale_link', 'usecode'])
+
+
+def _Schema():
+    schema = {'place': list(PLACE_FIELDS)}
+    for name, record_class in RECORD_CLASSES:
+        schema[name] = list(record_class.__slots__)
+    return schema
+
+
+class SnapshotWriter(object):
+    """
+    Writes places to a snapshot file as they come.
+    Example usage:
+        >>> with SnapshotWriter('places.snap') as writer:
+        ...     for place in places:
+        ...         writer.write(place)
+    """
+    def __init__(self, path):
+        """
+        :param path: The file to write. It is replaced if it exists.
+        """
+        self.path = path
+        self._file = open(path, 'wb')
+        schema = json.dumps(_Schema(), sort_keys=True).encode('utf-8')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(schema)) + schema)
+        self._position = _HEADER.size + len(schema)
+        self._count = 0
+        self._offsets = _Int64s('Q')
+        self._zpids = _Int64s('q')
+        self._rows = array('I')
+        self._shared = {}
+        self._fields = [(name, record_class.__slots__) for name, record_class in RECORD_CLASSES]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def write(self, place):
+        """
+        Append a place.
+        """
+        out = bytearray()
+        encode = self._Encode
+        for field in PLACE_FIELDS:
+            encode(getattr(place, field), False, out)
+        for name, fields in self._fields:
+            record = getattr(place, name)
+            block = bytearray()
+            for field in fields:
+                encode(getattr(record, field), field in SHARED_FIELDS, block)
+            out += _U32.pack(len(block))
+            out += block
+
+        row = self._count
+        self._count += 1
+        self._offsets.append(self._position)
+        try:
+            zpid = int(place.zpid)
+        except (TypeError, ValueError):
+            zpid = None
+        if zpid is not None and -2 ** 63 <= zpid < 2 ** 63:
+            self._zpids.append(zpid)
+            self._rows.append(row)
+        self._file.write(out)
+        self._position += len(out)
+
+    def extend(self, places):
+        for place in places:
+            self.write(place)
+
+    def _Encode(self, value, shared, out):
+        if value is None:
+            out.append(_NONE)
+        elif value is True:
+            out.append(_TRUE)
+        elif value is False:
+            out.append(_FALSE)
+        elif isinstance(value, _INTEGERS):
+            if -2 ** 63 <= value < 2 ** 63:
+                out.append(_INT_TAG)
+                out += _INT.pack(value)
+            else:
+                data = str(value).encode('ascii')
+                out.append(_BIGINT)
+                out += _U32.pack(len(data))
+                out += data
+        elif isinstance(value, float):
+            out.append(_FLOAT_TAG)
+            out += _FLOAT.pack(value)
+        elif shared:
+            number = self._shared.get(value)
+            if number is None:
+                number = self._shared[value] = len(self._shared)
+            out.append(_SHARED)
+            out += _U32.pack(number)
+        else:
+            data = value.encode('utf-8')
+            out.append(_STR)
+            out += _U32.pack(len(data))
+            out += data
+
+    def close(self):
+        """
+        Write the indexes and footer. The snapshot can't be read before this.
+        """
+        if self._file is None:
+            return
+        f = self._file
+        position = self._position
+
+        string_offsets = _Int64s('Q')
+        for value in sorted(self._shared, key=self._shared.get):
+            data = value.encode('utf-8')
+            string_offsets.append(position)
+            f.write(_U32.pack(len(data)) + data)
+            position += 4 + len(data)
+
+        offsets_start = position
+        self._offsets.append(self._position)
+        f.write(_Pack(self._offsets))
+        position += 8 * len(self._offsets)
+
+        string_offsets_start = position
+        f.write(_Pack(string_offsets))
+        position += 8 * len(string_offsets)
+
+        zpid_index_start = position
+        zpids = self._zpids
+        rows = self._rows
+        entries = bytearray()
+        for i in sorted(range(len(zpids)), key=zpids.__getitem__):
+            entries += _ZPID_ENTRY.pack(zpids[i], rows[i])
+        f.write(entries)
+
+        f.write(_FOOTER.pack(self._count, offsets_start, len(string_offsets), string_offsets_start,
+                             len(zpids), zpid_index_start, MAGIC))
+        f.close()
+        self._file = None
+
+
+def _Int64s(typecode):
+    """
+    :param typecode: 'q' for signed, 'Q' for unsigned.
+    :return: An empty array of 64 bit integers, or a list on a python 2 build whose array has none.
+    """
+    # python 2 has no 'q' or 'Q', but its long is 64 bits on LP64 platforms
+    for code in (typecode, typecode.replace('q', 'l').replace('Q', 'L')):
+        try:
+            values = array(code)
+        except ValueError:
+            continue
+        if values.itemsize == 8:
+            return values
+    return []
+
+
+def _Pack(values):
+    """The little-endian bytes of a sequence of uint64 from _Int64s."""
+    if not isinstance(values, array):
+        return struct.pack('<%dQ' % len(values), *values)
+    if struct.pack('=H', 1) != struct.pack('<H', 1):
+        values = array(values.typecode, values)
+        values.byteswap()
+    # tostring is the python 2 name
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
+
+
+def write_snapshot(path, places):
+    """
+    Write places to a snapshot file.
+    :param path: The file to write.
+    :param places: An iterable of Places, read one at a time.
+    :return: The number of places written.
+    """
+    with SnapshotWriter(path) as writer:
+        writer.extend(places)
+        return len(writer)
+
+
+class _SnapshotRecords(RecordSource):
+    """The records of one place in a snapshot, decoded as a lazy Place reads them."""
+    __slots__ = ('snapshot', 'blocks')
+
+    def __init__(self, snapshot, blocks):
+        self.snapshot = snapshot
+        self.blocks = blocks
+
+    def load(self, name, record):
+        self.snapshot._Fill(name, record, self.blocks[name])
+
+
+class Snapshot(object):
+    """
+    A snapshot file opened for reading. Behaves as a read-only sequence of Places.
+    Example usage:
+        >>> with Snapshot('places.snap') as places:
+        ...     print(len(places), places[0].zpid, places.get('2100641621').zestimate.amount)
+    """
+    def __init__(self, path, lazy=True):
+        """
+        :param path: The snapshot file.
+        :param lazy: Return lazy Places, whose records are decoded the first time they are read. Read them before closing the snapshot.
+        """
+        self.path = path
+        self.lazy = lazy
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ZillowError({'message': "%s is not a snapshot" % path})
+        data = self._map
+        if len(data) < _HEADER.size + _FOOTER.size:
+            self.close()
+            raise ZillowError({'message': "%s is not a snapshot" % path})
+        magic, version, schema_length = _HEADER.unpack_from(data, 0)
+        footer = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)
+        if magic != MAGIC or footer[-1] != MAGIC:
+            self.close()
+            raise ZillowError({'message': "%s is not a snapshot, or was not closed" % path})
+        if version > VERSION:
+            self.close()
+            raise ZillowError({'message': "%s is a version %d snapshot; this python-zillow reads up to %d"
+                               % (path, version, VERSION)})
+        schema = json.loads(data[_HEADER.size:_HEADER.size + schema_length].decode('utf-8'))
+        (self._count, self._offsets, self._string_count, self._string_offsets,
+         self._zpid_count, self._zpid_index, _) = footer
+        self._place_fields = schema['place']
+        # for each record: its name and, per stored field, the slot to set or None if it is gone
+        self._records = []
+        for name, record_class in RECORD_CLASSES:
+            slots = frozenset(record_class.__slots__)
+            self._records.append((name, [field if field in slots else None for field in schema.get(name, [])]))
+        self._record_fields = dict(self._records)
+        self._strings = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError('snapshot index out of range')
+        start, = _U64.unpack_from(self._map, self._offsets + 8 * i)
+        return self._Place(start)
+
+    def get(self, zpid, default=None):
+        """
+        :param zpid: The zpid of a place.
+        :return: The place with that zpid, or default if there is none.
+        """
+        row = self.position(zpid)
+        return default if row is None else self[row]
+
+    def position(self, zpid):
+        """
+        :return: The position of the place with the zpid, or None.
+        """
+        try:
+            zpid = int(zpid)
+        except (TypeError, ValueError):
+            return None
+        data = self._map
+        base = self._zpid_index
+        low, high = 0, self._zpid_count
+        while low < high:
+            middle = (low + high) // 2
+            key, row = _ZPID_ENTRY.unpack_from(data, base + _ZPID_ENTRY.size * middle)
+            if key < zpid:
+                low = middle + 1
+            elif key > zpid:
+                high = middle
+            else:
+                return row
+        return None
+
+    def __contains__(self, zpid):
+        return self.position(zpid) is not None
+
+    def _Place(self, position):
+        fields = self._place_fields
+        values, position = self._Values(position, len(fields))
+        values = dict(zip(fields, values))
+        place = Place(has_extended_data=bool(values.get('has_extended_data')), lazy=self.lazy)
+        place.zpid = values.get('zpid')
+        place.similarity_score = values.get('similarity_score')
+
+        data = self._map
+        blocks = {}
+        for name, _ in self._records:
+            length, = _U32.unpack_from(data, position)
+            blocks[name] = position + 4
+            position += 4 + length
+        if self.lazy:
+            place._source = _SnapshotRecords(self, blocks)
+            return place
+        for name, record_class in RECORD_CLASSES:
+            record = record_class()
+            self._Fill(name, record, blocks[name])
+            # the slot behind the record's property
+            setattr(place, '_' + name, record)
+        return place
+
+    def _Fill(self, name, record, position):
+        fields = self._record_fields[name]
+        values, _ = self._Values(position, len(fields))
+        for field, value in zip(fields, values):
+            if field is not None:
+                setattr(record, field, value)
+
+    def _Values(self, position, count):
+        """
+        :return: A list of the count values starting at position, and the position after them.
+        """
+        data = self._map
+        int_from = _INT.unpack_from
+        u32_from = _U32.unpack_from
+        to_int = _BYTES_ARE_STR
+        values = []
+        append = values.append
+        for _ in range(count):
+            tag = data[position]
+            if to_int:
+                tag = ord(tag)
+            position += 1
+            if tag == _STR:
+                length, = u32_from(data, position)
+                position += 4 + length
+                append(data[position - length:position].decode('utf-8'))
+            elif tag == _SHARED:
+                number, = u32_from(data, position)
+                position += 4
+                value = self._strings.get(number)
+                append(value if value is not None else self._String(number))
+            elif tag == _INT_TAG:
+                append(int_from(data, position)[0])
+                position += 8
+            elif tag == _NONE:
+                append(None)
+            elif tag == _FLOAT_TAG:
+                append(_FLOAT.unpack_from(data, position)[0])
+                position += 8
+            elif tag == _TRUE:
+                append(True)
+            elif tag == _FALSE:
+                append(False)
+            elif tag == _BIGINT:
+                length, = u32_from(data, position)
+                position += 4 + length
+                append(int(data[position - length:position]))
+            else:
+                raise ZillowError({'message': "%s is damaged: unknown value type %d" % (self.path, tag)})
+        return values, position
+
+    def _String(self, number):
+        value = self._strings.get(number)
+        if value is None:
+            start, = _U64.unpack_from(self._map, self._string_offsets + 8 * number)
+            length, = _U32.unpack_from(self._map, start)
+            value = self._strings[number] = _shared(self._map[start + 4:start + 4 + length].decode('utf-8'))
+        return value
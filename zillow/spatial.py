@@ -0,0 +1,262 @@
+"""
+An in-memory spatial index over the coordinates of places.
+
+A SpatialIndex files places in a grid of cells by latitude and longitude,
+so nearest-neighbour and radius queries only look at the cells around the
+point asked about instead of every place. Distances are great-circle
+distances in kilometres.
+"""
+
+import heapq
+import math
+from array import array
+
+
+EARTH_RADIUS_KM = 6371.0088
+# Kilometres per degree of latitude.
+KM_PER_DEGREE = 111.195
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """
+    :return: The great-circle (haversine) distance between two points, in kilometres.
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _Coordinates(place):
+    address = place.full_address
+    if address.latitude is None or address.longitude is None:
+        return None
+    return float(address.latitude), float(address.longitude)
+
+
+class SpatialIndex(object):
+    """
+    Places filed by location, for k-nearest and radius queries.
+    Example usage:
+        >>> index = SpatialIndex(places)
+        >>> index.nearest(33.978, -118.464, k=5, min_bedrooms=2)
+        >>> index.within(33.978, -118.464, 1.0, max_amount=2000000)
+        >>> index.insert(api.GetZEstimate(key, zpid))
+
+    Queries take the same filters, checked before any distance is worked out:
+    min_amount and max_amount on the Zestimate, min_bedrooms and
+    max_bedrooms, and where, a function of the Place returning True to keep it.
+    """
+    def __init__(self, places=None, cell_km=1.0):
+        """
+        :param places: Places to add.
+        :param cell_km: The height of a grid cell in kilometres. About the radius of a typical query works well.
+        """
+        self.cell_km = cell_km
+        self._cell = cell_km / KM_PER_DEGREE
+        self._cells = {}
+        # one entry per place, by entry number; a replaced place leaves a None behind
+        self._places = []
+        self._lats = array('d')
+        self._lons = array('d')
+        self._amounts = []
+        self._bedrooms = []
+        self._by_zpid = {}
+        self._size = 0
+        self._bounds = None
+        if places is not None:
+            self.extend(places)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, zpid):
+        return str(zpid) in self._by_zpid
+
+    def _Key(self, lat, lon):
+        return int(math.floor(lat / self._cell)), int(math.floor(lon / self._cell))
+
+    def insert(self, place):
+        """
+        Add a place, replacing the one with the same zpid if there is one.
+        :return: True if the place was added, False if it has no coordinates.
+        """
+        point = _Coordinates(place)
+        if point is None:
+            return False
+        if place.zpid is not None:
+            self.remove(place.zpid)
+        lat, lon = point
+        entry = len(self._places)
+        self._places.append(place)
+        self._lats.append(lat)
+        self._lons.append(lon)
+        self._amounts.append(place.zestimate.amount)
+        self._bedrooms.append(place.extended_data.bedrooms)
+        key = self._Key(lat, lon)
+        self._cells.setdefault(key, []).append(entry)
+        if place.zpid is not None:
+            self._by_zpid[str(place.zpid)] = entry
+        self._size += 1
+        if self._bounds is None:
+            self._bounds = [key[0], key[0], key[1], key[1]]
+        else:
+            bounds = self._bounds
+            bounds[0] = min(bounds[0], key[0])
+            bounds[1] = max(bounds[1], key[0])
+            bounds[2] = min(bounds[2], key[1])
+            bounds[3] = max(bounds[3], key[1])
+        return True
+
+    def extend(self, places):
+        """
+        Add many places.
+        :return: The number added.
+        """
+        added = 0
+        for place in places:
+            if self.insert(place):
+                added += 1
+        return added
+
+    def remove(self, zpid):
+        """
+        Remove the place with a zpid.
+        :return: True if there was one.
+        """
+        entry = self._by_zpid.pop(str(zpid), None)
+        if entry is None:
+            return False
+        self._cells[self._Key(self._lats[entry], self._lons[entry])].remove(entry)
+        self._places[entry] = None
+        self._size -= 1
+        return True
+
+    def get(self, zpid):
+        entry = self._by_zpid.get(str(zpid))
+        return None if entry is None else self._places[entry]
+
+    def _Filter(self, min_amount=None, max_amount=None, min_bedrooms=None, max_bedrooms=None, where=None):
+        """
+        :return: A function of an entry number that is True for entries passing the filters, or None if there are none.
+        """
+        tests = []
+        amounts = self._amounts
+        bedrooms = self._bedrooms
+        if min_amount is not None:
+            tests.append(lambda e: amounts[e] is not None and amounts[e] >= min_amount)
+        if max_amount is not None:
+            tests.append(lambda e: amounts[e] is not None and amounts[e] <= max_amount)
+        if min_bedrooms is not None:
+            tests.append(lambda e: bedrooms[e] is not None and bedrooms[e] >= min_bedrooms)
+        if max_bedrooms is not None:
+            tests.append(lambda e: bedrooms[e] is not None and bedrooms[e] <= max_bedrooms)
+        if where is not None:
+            places = self._places
+            tests.append(lambda e: where(places[e]))
+        if not tests:
+            return None
+        return lambda e: all(test(e) for test in tests)
+
+    def _Ring(self, key, ring):
+        """The cell keys on the square ring at distance ring from key."""
+        x, y = key
+        if ring == 0:
+            yield key
+            return
+        for dx in range(-ring, ring + 1):
+            yield x + dx, y - ring
+            yield x + dx, y + ring
+        for dy in range(-ring + 1, ring):
+            yield x - ring, y + dy
+            yield x + ring, y + dy
+
+    def _Scan(self, cells, lat, lon, keep, exclude):
+        lats = self._lats
+        lons = self._lons
+        for cell in cells:
+            entries = self._cells.get(cell)
+            if not entries:
+                continue
+            for entry in entries:
+                if entry == exclude or (keep is not None and not keep(entry)):
+                    continue
+                yield distance_km(lat, lon, lats[entry], lons[entry]), entry
+
+    def within(self, lat, lon, radius_km, exclude=None, **filters):
+        """
+        :param lat: The latitude of the centre.
+        :param lon: The longitude of the centre.
+        :param radius_km: The radius in kilometres.
+        :param exclude: A zpid to leave out, e.g. the place the query is about.
+        :return: A list of (distance in km, Place) within the radius, nearest first.
+        """
+        keep = self._Filter(**filters)
+        exclude = self._by_zpid.get(str(exclude)) if exclude is not None else None
+        lat_span = radius_km / KM_PER_DEGREE
+        lon_span = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(min(89.9, abs(lat) + lat_span))), 1e-6))
+        low = self._Key(lat - lat_span, lon - lon_span)
+        high = self._Key(lat + lat_span, lon + lon_span)
+        if (high[0] - low[0] + 1) * (high[1] - low[1] + 1) > len(self._cells):
+            cells = [cell for cell in self._cells
+                     if low[0] <= cell[0] <= high[0] and low[1] <= cell[1] <= high[1]]
+        else:
+            cells = ((x, y) for x in range(low[0], high[0] + 1) for y in range(low[1], high[1] + 1))
+        found = [(d, e) for d, e in self._Scan(cells, lat, lon, keep, exclude) if d <= radius_km]
+        found.sort()
+        return [(d, self._places[e]) for d, e in found]
+
+    def nearest(self, lat, lon, k=10, max_km=None, exclude=None, **filters):
+        """
+        :param lat: The latitude of the point.
+        :param lon: The longitude of the point.
+        :param k: The number of places to find.
+        :param max_km: Leave out places further than this, or None.
+        :param exclude: A zpid to leave out, e.g. the place the query is about.
+        :return: A list of up to k (distance in km, Place), nearest first.
+        """
+        if not self._size or k <= 0:
+            return []
+        keep = self._Filter(**filters)
+        exclude = self._by_zpid.get(str(exclude)) if exclude is not None else None
+        key = self._Key(lat, lon)
+        x_low, x_high, y_low, y_high = self._bounds
+        # the furthest ring that still holds any cell with places
+        last = max(key[0] - x_low, x_high - key[0], key[1] - y_low, y_high - key[1], 0)
+        best = []
+        ring = 0
+        while ring <= last:
+            if 8 * ring > len(self._cells):
+                # sparse data far apart: looking at every remaining occupied cell is cheaper than more rings
+                cells = [cell for cell in self._cells
+                         if max(abs(cell[0] - key[0]), abs(cell[1] - key[1])) >= ring]
+                last = ring
+            else:
+                cells = self._Ring(key, ring)
+            for d, entry in self._Scan(cells, lat, lon, keep, exclude):
+                if max_km is not None and d > max_km:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-d, entry))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, entry))
+            # every place not scanned yet is at least ring cells away; cells narrow towards the poles
+            width = self.cell_km * min(1.0, math.cos(math.radians(min(89.9, abs(lat) + (ring + 1) * self._cell))))
+            covered = ring * width
+            if len(best) == k and -best[0][0] <= covered:
+                break
+            if max_km is not None and covered >= max_km:
+                break
+            ring += 1
+        return [(d, self._places[e]) for d, e in sorted((-d, e) for d, e in best)]
+
+    def near(self, place, k=10, max_km=None, **filters):
+        """
+        The places nearest to a place, leaving the place itself out.
+        :return: A list of up to k (distance in km, Place), nearest first, as for nearest.
+        """
+        point = _Coordinates(place)
+        if point is None:
+            return []
+        return self.nearest(point[0], point[1], k=k, max_km=max_km, exclude=place.zpid, **filters)
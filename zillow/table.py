@@ -0,0 +1,468 @@
+"""
+A columnar container for many places.
+
+A PlaceTable keeps each field of its places in one typed array instead of
+one attribute per Place, so analytics over thousands of results don't walk
+thousands of objects. Numeric columns are array.array buffers with a
+validity mask marking missing values; they can be handed to NumPy without
+copying.
+
+Comparisons and arithmetic run over whole columns with map() and the
+operator module, and masks are combined as big integers, so the per-row
+work stays in C rather than in a Python function per row. This is a
+columnar layout, not SIMD: for that, use to_numpy().
+"""
+
+import binascii
+import math
+import operator
+from array import array
+from collections import OrderedDict
+from itertools import repeat
+
+from .error import ZillowError
+from .parser import COMPS_COMP, COMPS_PRINCIPAL, SEARCH_RESULT, ZESTIMATE, _Invalid, iter_records
+from .place import Place, _int
+
+
+INT = 'int'
+FLOAT = 'float'
+STR = 'str'
+
+try:
+    array('q')
+    _INT64 = 'q'
+except ValueError:
+    # python 2 has no 'q', but its long is 64 bits on LP64 platforms
+    _INT64 = 'l'
+
+_TYPECODES = {INT: _INT64, FLOAT: 'd'}
+_NUMPY_DTYPES = {INT: 'int%d' % (8 * array(_INT64).itemsize), FLOAT: 'float64'}
+
+# Column name, type and how to read it from a Place.
+COLUMNS = OrderedDict([
+    ('zpid', (INT, lambda p: _int(p.zpid))),
+    ('similarity_score', (FLOAT, lambda p: p.similarity_score)),
+    ('street', (STR, lambda p: p.full_address.street)),
+    ('zipcode', (STR, lambda p: p.full_address.zipcode)),
+    ('city', (STR, lambda p: p.full_address.city)),
+    ('state', (STR, lambda p: p.full_address.state)),
+    ('latitude', (FLOAT, lambda p: p.full_address.latitude)),
+    ('longitude', (FLOAT, lambda p: p.full_address.longitude)),
+    ('amount', (INT, lambda p: p.zestimate.amount)),
+    ('amount_last_updated', (STR, lambda p: p.zestimate.amount_last_updated)),
+    ('amount_change_30days', (INT, lambda p: p.zestimate.amount_change_30days)),
+    ('valuation_range_low', (INT, lambda p: p.zestimate.valuation_range_low)),
+    ('valuation_range_high', (INT, lambda p: p.zestimate.valuation_range_high)),
+    ('region_id', (STR, lambda p: p.local_realestate.region_id)),
+    ('region_name', (STR, lambda p: p.local_realestate.region_name)),
+    ('tax_assessment', (FLOAT, lambda p: p.extended_data.tax_assessment)),
+    ('year_built', (INT, lambda p: p.extended_data.year_built)),
+    ('lot_size_sqft', (INT, lambda p: p.extended_data.lot_size_sqft)),
+    ('finished_sqft', (INT, lambda p: p.extended_data.finished_sqft)),
+    ('bathrooms', (FLOAT, lambda p: p.extended_data.bathrooms)),
+    ('bedrooms', (INT, lambda p: p.extended_data.bedrooms)),
+    ('last_sold_price', (INT, lambda p: p.extended_data.last_sold_price)),
+])
+
+
+def _Bits(data):
+    """A mask as one big integer, a byte per row (int.from_bytes is python 3 only)."""
+    if not data:
+        return 0
+    return int(binascii.hexlify(bytes(data)), 16)
+
+
+def _Mask(bits, length):
+    """The Mask of length rows a big integer from _Bits stands for."""
+    if not length:
+        return Mask()
+    return Mask(binascii.unhexlify('%0*x' % (2 * length, bits)))
+
+
+class Mask(bytearray):
+    """
+    A row selection: one byte per row, 1 where the row is selected. Combine
+    masks with &, | and ~.
+    """
+
+    def __and__(self, other):
+        return _Mask(_Bits(self) & _Bits(other), len(self))
+
+    def __or__(self, other):
+        return _Mask(_Bits(self) | _Bits(other), len(self))
+
+    def __invert__(self):
+        # a 1 in every row's byte
+        ones = _Bits(b'\x01' * len(self))
+        return _Mask(_Bits(self) ^ ones, len(self))
+
+    def indices(self):
+        """:return: The selected row numbers."""
+        find = self.find
+        result = []
+        i = find(b'\x01')
+        while i != -1:
+            result.append(i)
+            i = find(b'\x01', i + 1)
+        return result
+
+
+class Column(object):
+    """
+    The values of one field. Numeric values live in an array.array, with 0 or
+    NaN standing in for missing values, and a mask of the rows that hold a
+    value. Comparisons give a Mask that never selects a missing value;
+    arithmetic gives a float Column that is missing where either side is.
+    """
+    def __init__(self, name, kind, values=None, valid=None):
+        self.name = name
+        self.kind = kind
+        if values is None:
+            values = array(_TYPECODES[kind]) if kind in _TYPECODES else []
+        self.values = values
+        self.valid = Mask() if valid is None else valid
+
+    def __len__(self):
+        return len(self.valid)
+
+    def __getitem__(self, i):
+        if self.valid[i]:
+            return self.values[i]
+        return None
+
+    def __iter__(self):
+        for value, valid in zip(self.values, self.valid):
+            yield value if valid else None
+
+    def __repr__(self):
+        return 'Column(%r, %r, %d rows)' % (self.name, self.kind, len(self))
+
+    def append(self, value):
+        if value is None:
+            self.values.append(0 if self.kind == INT else (float('nan') if self.kind == FLOAT else None))
+            self.valid.append(0)
+        else:
+            self.values.append(value)
+            self.valid.append(1)
+
+    def to_list(self):
+        """:return: The values, with None where a value is missing."""
+        return list(self)
+
+    def take(self, indices):
+        """:return: A new Column of the given rows."""
+        values = self.values
+        if self.kind in _TYPECODES:
+            taken = array(values.typecode, [values[i] for i in indices])
+        else:
+            taken = [values[i] for i in indices]
+        valid = self.valid
+        return Column(self.name, self.kind, taken, Mask(valid[i] for i in indices))
+
+    def present(self):
+        """:return: The values that are not missing."""
+        if self.valid.find(b'\x00') == -1:
+            return list(self.values)
+        return [value for value, valid in zip(self.values, self.valid) if valid]
+
+    def isnull(self):
+        return ~self.valid
+
+    def notnull(self):
+        return Mask(self.valid)
+
+    def isin(self, values):
+        values = frozenset(values)
+        return Mask(map(values.__contains__, self.values)) & self.valid
+
+    def _Others(self, other):
+        """The values to pair with this column's: another column's, or a scalar repeated."""
+        if isinstance(other, Column):
+            return other.values, self.valid & other.valid
+        return repeat(other, len(self)), self.valid
+
+    def _Compare(self, other, op):
+        if self.kind == STR:
+            # missing strings are None, which does not order against a str
+            if isinstance(other, Column):
+                valid = self.valid & other.valid
+                return Mask(bool(ok and op(a, b)) for a, b, ok in zip(self.values, other.values, valid))
+            return Mask(bool(ok and op(a, other)) for a, ok in zip(self.values, self.valid))
+        others, valid = self._Others(other)
+        # missing numbers are 0 or NaN placeholders: whatever they compare to, the valid mask drops them
+        return Mask(map(op, self.values, others)) & valid
+
+    def __lt__(self, other):
+        return self._Compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._Compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._Compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._Compare(other, operator.ge)
+
+    def __eq__(self, other):
+        return self._Compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self._Compare(other, operator.ne)
+
+    __hash__ = None
+
+    def _Arithmetic(self, other, op, name):
+        if self.kind == STR:
+            raise ZillowError({'message': "Column %s is not numeric" % self.name})
+        others, valid = self._Others(other)
+        try:
+            values = array('d', map(op, self.values, others))
+        except ZeroDivisionError:
+            # a zero divisor, or a missing one: only then go row by row
+            others, valid = self._Others(other)
+            values = array('d', map(_SafeDivide, self.values, others))
+        # NaN placeholders, and NaN from division by zero, are missing; NaN is the one value != itself
+        valid = valid & Mask(map(operator.eq, values, values))
+        return Column(name, FLOAT, values, valid)
+
+    def __add__(self, other):
+        return self._Arithmetic(other, operator.add, self.name)
+
+    def __sub__(self, other):
+        return self._Arithmetic(other, operator.sub, self.name)
+
+    def __mul__(self, other):
+        return self._Arithmetic(other, operator.mul, self.name)
+
+    def __truediv__(self, other):
+        return self._Arithmetic(other, operator.truediv, self.name)
+
+    __div__ = __truediv__
+
+    def count(self):
+        """:return: The number of values that are not missing."""
+        return self.valid.count(b'\x01')
+
+    def sum(self):
+        return sum(self.present())
+
+    def mean(self):
+        values = self.present()
+        if not values:
+            return None
+        return sum(values) / float(len(values))
+
+    def min(self):
+        values = self.present()
+        return min(values) if values else None
+
+    def max(self):
+        values = self.present()
+        return max(values) if values else None
+
+    def quantile(self, q):
+        """
+        :param q: A number between 0 and 1.
+        :return: The q-th quantile of the values that are not missing, interpolating between the closest two.
+        """
+        values = sorted(self.present())
+        if not values:
+            return None
+        position = (len(values) - 1) * q
+        low = int(math.floor(position))
+        high = int(math.ceil(position))
+        if low == high:
+            return values[low]
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def std(self):
+        """:return: The population standard deviation of the values that are not missing."""
+        values = self.present()
+        if not values:
+            return None
+        mean = sum(values) / float(len(values))
+        return math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+
+    def to_numpy(self, masked=False):
+        """
+        :param masked: Return a numpy.ma.MaskedArray that masks the missing values.
+        :return: A NumPy array. Numeric columns share memory with the Column, so don't append to it while the array is in use.
+        """
+        try:
+            import numpy
+        except ImportError:
+            raise ZillowError({'message': "to_numpy requires numpy"})
+        if self.kind in _NUMPY_DTYPES:
+            data = numpy.frombuffer(self.values, dtype=_NUMPY_DTYPES[self.kind])
+        else:
+            data = numpy.array(self.values, dtype=object)
+        if not masked:
+            return data
+        missing = numpy.frombuffer(bytes(self.valid), dtype=numpy.uint8) == 0
+        return numpy.ma.masked_array(data, mask=missing)
+
+
+def _SafeDivide(a, b):
+    return a / float(b) if b else float('nan')
+
+
+# The aggregations GroupBy.agg accepts by name.
+AGGREGATIONS = ('count', 'sum', 'mean', 'median', 'min', 'max', 'std')
+
+
+class GroupBy(object):
+    """Rows of a PlaceTable grouped by the value of one column."""
+    def __init__(self, table, key):
+        self.table = table
+        self.key = key
+        self.groups = OrderedDict()
+        for i, value in enumerate(table[key]):
+            self.groups.setdefault(value, []).append(i)
+
+    def __iter__(self):
+        """:return: An iterator of (key value, PlaceTable of the group's rows)."""
+        for value, indices in self.groups.items():
+            yield value, self.table.take(indices)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def size(self):
+        """:return: An OrderedDict of key value to number of rows."""
+        return OrderedDict((value, len(indices)) for value, indices in self.groups.items())
+
+    def agg(self, column, how='mean'):
+        """
+        :param column: The column to aggregate.
+        :param how: One of AGGREGATIONS, or a function of a Column.
+        :return: An OrderedDict of key value to the aggregate of the group's values.
+        """
+        if not callable(how):
+            if how not in AGGREGATIONS:
+                raise ZillowError({'message': "Unknown aggregation: %s" % how})
+            how = getattr(Column, how)
+        values = self.table[column]
+        return OrderedDict((value, how(values.take(indices)))
+                           for value, indices in self.groups.items())
+
+
+class PlaceTable(object):
+    """
+    Many places stored as columns.
+    Example usage:
+        >>> table = PlaceTable(places)
+        >>> big = table.filter(table['finished_sqft'] > 2000)
+        >>> price_per_sqft = big['amount'] / big['finished_sqft']
+        >>> price_per_sqft.median()
+        >>> table.group_by('zipcode').agg('amount', 'median')
+    """
+    def __init__(self, places=None, columns=None):
+        """
+        :param places: Places to add.
+        :param columns: The names of the columns to keep (default: all of COLUMNS).
+        """
+        names = list(COLUMNS) if columns is None else list(columns)
+        for name in names:
+            if name not in COLUMNS:
+                raise ZillowError({'message': "Unknown column: %s" % name})
+        self._readers = [(name, COLUMNS[name][1]) for name in names]
+        self._columns = OrderedDict((name, Column(name, COLUMNS[name][0])) for name in names)
+        self._length = 0
+        if places is not None:
+            self.extend(places)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name):
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise ZillowError({'message': "Unknown column: %s" % name})
+
+    def __contains__(self, name):
+        return name in self._columns
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    def append(self, place):
+        columns = self._columns
+        for name, read in self._readers:
+            columns[name].append(read(place))
+        self._length += 1
+
+    def extend(self, places):
+        for place in places:
+            self.append(place)
+
+    def add_response(self, content, has_extended_data=False, backend=None):
+        """
+        Add every property in a web service response: a search result, a
+        Zestimate, or the principal and comps of GetComps/GetDeepComps.
+        Each property goes through a Place that is dropped once its values
+        are in the columns.
+        :param content: The response body as bytes.
+        :param has_extended_data: Read the deep search fields as well.
+        :param backend: The parser backend, see zillow.parser.get_backend.
+        :return: The number of rows added.
+        """
+        added = 0
+        paths = (SEARCH_RESULT, ZESTIMATE, COMPS_PRINCIPAL, COMPS_COMP)
+        for _, record in iter_records(content, paths, backend):
+            place = Place(has_extended_data=has_extended_data)
+            try:
+                place.set_data(record)
+            except Exception:
+                raise _Invalid(content, backend)
+            self.append(place)
+            added += 1
+        return added
+
+    def _From(self, columns, length):
+        table = PlaceTable.__new__(PlaceTable)
+        table._readers = self._readers
+        table._columns = columns
+        table._length = length
+        return table
+
+    def take(self, indices):
+        """:return: A new PlaceTable of the given rows."""
+        indices = list(indices)
+        columns = OrderedDict((name, column.take(indices)) for name, column in self._columns.items())
+        return self._From(columns, len(indices))
+
+    def filter(self, mask):
+        """
+        :param mask: A Mask from comparing columns, e.g. table['bedrooms'] >= 3.
+        :return: A new PlaceTable of the selected rows.
+        """
+        return self.take(mask.indices())
+
+    def group_by(self, key):
+        """
+        :param key: The column to group by, e.g. 'zipcode' or 'region_id'.
+        :return: A GroupBy.
+        """
+        return GroupBy(self, key)
+
+    def row(self, i):
+        """:return: A dict of column name to the value in row i."""
+        return dict((name, column[i]) for name, column in self._columns.items())
+
+    def rows(self):
+        for i in range(self._length):
+            yield self.row(i)
+
+    def to_numpy(self, masked=False):
+        """
+        :param masked: Return masked arrays that mask the missing values.
+        :return: An OrderedDict of column name to NumPy array, see Column.to_numpy.
+        """
+        return OrderedDict((name, column.to_numpy(masked)) for name, column in self._columns.items())